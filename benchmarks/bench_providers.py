@@ -0,0 +1,111 @@
+"""Compare Faker's en_US address/phone/email generation with fast_providers
+
+For each value kind, times stock Faker against FastContactProvider (and the
+original six-f-string email helper against name_based_email), then compares
+output diversity: share of distinct values and the share of each structural
+feature (military addresses, secondary units, phone extensions, ...).
+
+Usage: python benchmarks/bench_providers.py [--count N] [--seed S]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from faker import Faker
+
+from fast_providers import FastContactProvider, name_based_email
+
+EMAIL_DOMAINS = ['gmail.com', 'outlook.com', 'yahoo.com', 'hotmail.com', 'icloud.com', 'aol.com']
+
+# Structural features whose frequencies should match between implementations
+ADDRESS_FEATURES = {
+    'military': lambda value: bool(re.search(r'\n(APO|FPO|DPO) ', value)),
+    'secondary unit': lambda value: 'Apt.' in value or 'Suite' in value,
+    'territory/freely associated state': lambda value: bool(re.search(r', (AS|GU|MP|PR|VI|FM|MH|PW) \d{5}$', value)),
+    '5-digit building number': lambda value: bool(re.match(r'\d{5} ', value)),
+}
+PHONE_FEATURES = {
+    'extension': lambda value: 'x' in value,
+    'country code': lambda value: value.startswith(('+1', '001')),
+    'parenthesised area code': lambda value: value.startswith('('),
+    'dotted': lambda value: '.' in value,
+    'bare digits': lambda value: value.isdigit(),
+}
+EMAIL_FEATURES = {
+    'dotted name': lambda value: bool(re.match(r'[a-z]+\.[a-z]+@', value)),
+    'numbered': lambda value: bool(re.search(r'\d@', value)),
+}
+
+def original_email(fake, first_name, last_name):
+    """The pre-existing helper: builds all six usernames, then picks one"""
+    domain = fake.random_element(EMAIL_DOMAINS)
+    formats = [
+        f"{first_name.lower()}.{last_name.lower()}",
+        f"{first_name.lower()}{last_name.lower()}",
+        f"{first_name[0].lower()}{last_name.lower()}",
+        f"{first_name.lower()}{last_name[0].lower()}",
+        f"{first_name.lower()}.{last_name.lower()}{fake.random_int(1, 999)}",
+        f"{first_name.lower()}{fake.random_int(1, 999)}"
+    ]
+    username = fake.random_element(formats)
+    return f"{username}@{domain}"
+
+def build_faker(seed, fast):
+    fake = Faker(providers=['faker.providers.person', 'faker.providers.address', 'faker.providers.phone_number'])
+    if fast:
+        fake.add_provider(FastContactProvider)
+    fake.seed_instance(seed)
+    return fake
+
+def run(make_value, count):
+    """Return (values, seconds)"""
+    start = time.perf_counter()
+    values = [make_value() for _ in range(count)]
+    return values, time.perf_counter() - start
+
+def describe(values, features):
+    shares = {name: sum(1 for value in values if check(value)) / len(values) for name, check in features.items()}
+    return len(set(values)) / len(values), shares
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    stock = build_faker(args.seed, fast=False)
+    fast = build_faker(args.seed, fast=True)
+    names = [(stock.first_name(), stock.last_name()) for _ in range(args.count)]
+    name_iter = iter(names)
+    fast_name_iter = iter(names)
+
+    cases = [
+        ('address', stock.address, fast.address, ADDRESS_FEATURES),
+        ('phone_number', stock.phone_number, fast.phone_number, PHONE_FEATURES),
+        ('email',
+         lambda: original_email(stock, *next(name_iter)),
+         lambda: name_based_email(fast.random, *next(fast_name_iter), fast.random_element(EMAIL_DOMAINS)),
+         EMAIL_FEATURES),
+    ]
+
+    print(f"{args.count} values per kind\n")
+    for kind, stock_call, fast_call, features in cases:
+        stock_values, stock_seconds = run(stock_call, args.count)
+        fast_values, fast_seconds = run(fast_call, args.count)
+        stock_distinct, stock_shares = describe(stock_values, features)
+        fast_distinct, fast_shares = describe(fast_values, features)
+
+        print(f"{kind}:")
+        print(f"  Faker    {stock_seconds / args.count * 1e6:7.2f} us/value")
+        print(f"  fast     {fast_seconds / args.count * 1e6:7.2f} us/value  ({stock_seconds / fast_seconds:.1f}x)")
+        print(f"  {'distinct values':<36} {stock_distinct:7.1%} {fast_distinct:7.1%}")
+        for name in features:
+            print(f"  {name:<36} {stock_shares[name]:7.1%} {fast_shares[name]:7.1%}")
+        print(f"  sample: {fast_values[0]!r}\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Measure cold-start time of the dataset generators against a startup budget
+
+Each measurement runs in a fresh interpreter and times everything from the
+first import to the first generated record, which is the cost paid by every
+short orchestration run. For reference, the bare ``import pandas`` time is
+measured the same way.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--budget SECONDS]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Maximum median time from interpreter start to first record, in seconds
+STARTUP_BUDGET_SECONDS = 0.25
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_SNIPPETS = {
+    'medical': "from create_dataset import MedicalDatasetGenerator as G; G(seed=42).generate_patient_record()",
+    'financial': "from create_financial_dataset import FinancialDatasetGenerator as G; G(seed=42).generate_customer_record()",
+    'legal': "from create_legal_dataset import LegalDatasetGenerator as G; G(seed=42).generate_legal_record()",
+    'education': "from create_education_dataset import EducationDatasetGenerator as G; G(seed=42).generate_student_record()",
+    'legal_prompts': "from create_legal_prompt_dataset import LegalPromptGenerator as G; G(seed=42).generate_prompt_record(True)",
+    'education_prompts': "from create_education_prompt_dataset import EducationPromptGenerator as G; G(seed=42).generate_prompt_record(True)",
+}
+
+TIMED_TEMPLATE = """
+import time
+_start = time.perf_counter()
+{snippet}
+_elapsed = time.perf_counter() - _start
+import sys
+print(_elapsed, 'pandas' in sys.modules)
+"""
+
+def time_snippet(snippet, runs):
+    """Run a snippet in fresh interpreters and return (timings, pandas_loaded)"""
+    timings = []
+    pandas_loaded = False
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', TIMED_TEMPLATE.format(snippet=snippet)],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        )
+        elapsed, loaded = result.stdout.split()[-2:]
+        timings.append(float(elapsed))
+        pandas_loaded = pandas_loaded or loaded == 'True'
+    return timings, pandas_loaded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=STARTUP_BUDGET_SECONDS)
+    args = parser.parse_args()
+    
+    reference, _ = time_snippet("import pandas", args.runs)
+    reference_median = statistics.median(reference)
+    print(f"Reference: import pandas = {reference_median * 1000:.0f} ms (median of {args.runs})")
+    print("-" * 60)
+    
+    over_budget = []
+    for name, snippet in STARTUP_SNIPPETS.items():
+        timings, pandas_loaded = time_snippet(snippet, args.runs)
+        median = statistics.median(timings)
+        status = 'OK' if median <= args.budget and not pandas_loaded else 'OVER BUDGET'
+        if status != 'OK':
+            over_budget.append(name)
+        print(f"{name:<18} first record after {median * 1000:6.0f} ms "
+              f"({median / reference_median:.2f}x pandas import, pandas loaded: {pandas_loaded}) {status}")
+    
+    print("-" * 60)
+    print(f"Budget: {args.budget * 1000:.0f} ms to first record, pandas not imported")
+    if over_budget:
+        print(f"Over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Field constraints for the record builders
+
+A constraint fixes a record field to one value or restricts it to a set of
+allowed values, e.g. ``{'department': 'Oncology', 'condition_severity':
+'Critical'}``. For list fields (account types, case types, courses) the
+values are members every record must contain. Constrained fields are drawn
+directly from their allowed values, and the fields they depend on are
+narrowed up front, so a targeted dataset costs exactly one record per record
+requested instead of generating and filtering.
+"""
+from distributions import DISTRIBUTIONS, restricted_distribution
+
+def compile_constraints(constraints, options):
+    """Validate constraints against the allowed ``options`` of each field
+
+    Returns ``{field: tuple_of_values}``. Unknown fields, unknown values and
+    empty value sets raise ValueError.
+    """
+    compiled = {}
+    for field, value in (constraints or {}).items():
+        if field not in options:
+            raise ValueError(f"Cannot constrain '{field}'; constrainable fields: {', '.join(sorted(options))}")
+        values = (value,) if isinstance(value, str) else tuple(dict.fromkeys(value))
+        if not values:
+            raise ValueError(f"Constraint on '{field}' allows no values")
+        unknown = [item for item in values if item not in options[field]]
+        if unknown:
+            raise ValueError(f"Unknown {field} value(s) {unknown}; expected one of {list(options[field])}")
+        compiled[field] = values
+    return compiled
+
+def narrow(compiled, field, candidates, reason):
+    """Restrict ``field`` to the ``candidates`` that can satisfy a dependent constraint"""
+    allowed = tuple(value for value in compiled.get(field, candidates) if value in candidates)
+    if not allowed:
+        raise ValueError(f"No {field} satisfies the constraint on {reason}")
+    compiled[field] = allowed
+
+def choose_from(values, rng, distribution_name=None):
+    """Draw one of ``values``, keeping their relative weights in the named distribution"""
+    if len(values) == 1:
+        return values[0]
+    if distribution_name in DISTRIBUTIONS:
+        return restricted_distribution(distribution_name, tuple(values)).sample(rng)
+    return values[rng.randrange(len(values))]
+
+def choose(compiled, field, sample, rng, distribution_name=None):
+    """Draw ``field``: ``sample()`` when unconstrained, otherwise one of its allowed values"""
+    allowed = compiled.get(field)
+    if allowed is None:
+        return sample()
+    return choose_from(allowed, rng, distribution_name)
@@ -0,0 +1,170 @@
+"""Coverage plans for prompt generation: exact quotas per template, PII type and context
+
+Prompt generators pick templates with ``random.choice`` and ``pii_ratio``
+only splits PII from non-PII prompts, so the templates and PII types few
+templates carry come out under-sampled, and reaching a coverage target
+takes heavy overgeneration. A CoveragePlan fixes, before any prompt is
+generated, how many prompts every template and every context value (the
+role or practice area a legal prompt is attributed to, ...) gets:
+
+- template quotas start from the template targets and are raised until each
+  PII type target is met by the templates built to contain that type; the
+  remaining prompts are shared in proportion to the template weights (their
+  probability under the generator's own random choice);
+- context quotas start from their targets and the rest is shared evenly.
+
+Prompts are then ordered by jittered stratification: occurrence k of a value
+with quota q is placed at (k + u) / q, u uniform in [0, 1), so every
+template and context value is spread evenly over the dataset (and over any
+prefix or split of it) without a periodic pattern. The plan replaces the
+final shuffle: slot i of the plan is prompt i of the dataset, and every
+generated prompt counts toward a target.
+"""
+import numpy as np
+
+# Target kinds besides the generator's context fields (see parse_targets)
+TARGET_KINDS = ['template', 'pii_type']
+
+def parse_targets(items):
+    """Turn ``KIND:NAME=COUNT`` arguments into {kind: {name: count}}
+
+    KIND is 'template', 'pii_type' or a context field of the domain's prompt
+    records, e.g. ``template:pii-3=500``, ``pii_type:SSN=2000`` or
+    ``role_context:Paralegal=300``.
+    """
+    targets = {}
+    for item in items or []:
+        key, separator, count = item.rpartition('=')
+        kind, _, name = key.partition(':')
+        if not separator or not kind.strip() or not name.strip() or not count.strip().isdigit():
+            raise ValueError(f"Invalid coverage target '{item}', expected KIND:NAME=COUNT")
+        targets.setdefault(kind.strip(), {})[name.strip()] = int(count)
+    return targets
+
+def allocate(total, weights, floors, rng):
+    """Integer quotas summing to ``total``: at least ``floors``, the rest in proportion to ``weights``
+
+    Finds the scale s with sum(max(floor, s * weight)) == total, rounds down
+    and hands the remaining units to the largest fractional parts (ties
+    broken by ``rng``).
+    """
+    keys = list(weights)
+    weight = np.array([weights[key] for key in keys], dtype=float)
+    floor = np.array([floors.get(key, 0) for key in keys], dtype=float)
+    if floor.sum() > total:
+        raise ValueError(f"The coverage targets need {int(floor.sum())} prompts but only {total} are planned")
+    if total and not (weight > 0).any():
+        raise ValueError("Cannot allocate prompts: no template or value has a positive weight")
+    low, high = 0.0, total / weight[weight > 0].min() if total else 0.0
+    for _ in range(100):
+        scale = (low + high) / 2
+        if np.maximum(floor, scale * weight).sum() > total:
+            high = scale
+        else:
+            low = scale
+    share = np.maximum(floor, low * weight)
+    quotas = np.floor(share).astype(np.int64)
+    remainder = share - quotas
+    leftover = total - int(quotas.sum())
+    # Largest fractional parts first; the random key breaks ties between equal parts
+    order = np.lexsort((rng.random(len(keys)), -remainder))
+    quotas[order[:leftover]] += 1
+    return dict(zip(keys, quotas.tolist()))
+
+def interleave(counts, rng):
+    """Owner index of every slot: owner i appears counts[i] times, spread by jittered stratification"""
+    counts = np.asarray(counts, dtype=np.int64)
+    owners = np.repeat(np.arange(len(counts)), counts)
+    occurrence = np.arange(len(owners)) - np.repeat(np.cumsum(counts) - counts, counts)
+    keys = (occurrence + rng.random(len(owners))) / np.repeat(np.maximum(counts, 1), counts)
+    return owners[np.argsort(keys, kind='stable')]
+
+class CoveragePlan:
+    """Template and context values of every prompt of a run, in dataset order"""
+
+    def __init__(self, templates, template_slots, contexts):
+        self.templates = templates
+        self.template_slots = template_slots
+        self.contexts = contexts
+        is_pii = np.array([template['contains_pii'] for template in templates], dtype=bool)[template_slots]
+        # PII and non-PII prompts are numbered separately (pii_0001, nopii_0001, ...)
+        self.numbers = np.where(is_pii, np.cumsum(is_pii), np.cumsum(~is_pii))
+        # Source row draws before each prompt, for generators reading a run-wide row stream
+        rows = np.array([template.get('source_rows', 0) for template in templates], dtype=np.int64)[template_slots]
+        self.row_offsets = np.concatenate([[0], np.cumsum(rows)])
+
+    def __len__(self):
+        return len(self.template_slots)
+
+    def quotas(self):
+        """Prompts per template id"""
+        counts = np.bincount(self.template_slots, minlength=len(self.templates))
+        return {template['template_id']: int(count) for template, count in zip(self.templates, counts)}
+
+    def row_offset(self, position):
+        """Source row draws of the prompts before ``position``"""
+        return int(self.row_offsets[position])
+
+    def slots(self, start=0, stop=None):
+        """(position, number, template_id, contexts) of the prompts in [start, stop)"""
+        stop = len(self) if stop is None else stop
+        return [(position, int(self.numbers[position]),
+                 self.templates[self.template_slots[position]]['template_id'],
+                 {field: values[owners[position]] for field, (values, owners) in self.contexts.items()})
+                for position in range(start, stop)]
+
+def plan_coverage(templates, total, pii_ratio=0.5, targets=None, contexts=None, seed=42):
+    """CoveragePlan of ``total`` prompts
+
+    ``templates`` is the generator's catalog: dicts with 'template_id',
+    'contains_pii', 'pii_types', 'weight' and optionally 'source_rows' (row
+    draws per prompt, see CoveragePlan.row_offset). ``contexts`` maps record
+    context fields to their values. ``targets`` ({kind: {name: count}}, see
+    parse_targets) are minimum prompt counts. Raises ValueError for targets
+    that name nothing in the catalog or cannot fit in ``total`` prompts.
+    """
+    targets = targets or {}
+    contexts = contexts or {}
+    unknown = [kind for kind in targets if kind not in TARGET_KINDS and kind not in contexts]
+    if unknown:
+        raise ValueError(f"Unknown coverage target kind(s) {', '.join(unknown)}; "
+                         f"choose from {', '.join(TARGET_KINDS + list(contexts))}")
+    rng = np.random.default_rng(seed)
+    by_id = {template['template_id']: template for template in templates}
+    template_targets = targets.get('template', {})
+    missing = [template_id for template_id in template_targets if template_id not in by_id]
+    if missing:
+        raise ValueError(f"Unknown template id(s) in the coverage targets: {', '.join(missing)}")
+
+    num_pii_prompts = int(total * pii_ratio)
+    quotas = {}
+    for contains_pii, count in ((True, num_pii_prompts), (False, total - num_pii_prompts)):
+        group = [template for template in templates if template['contains_pii'] == contains_pii]
+        floors = {template['template_id']: template_targets.get(template['template_id'], 0) for template in group}
+        weights = {template['template_id']: template['weight'] for template in group}
+        if contains_pii:
+            pii_type_targets = targets.get('pii_type', {})
+            covering = {pii_type: [template['template_id'] for template in group if pii_type in template['pii_types']]
+                        for pii_type in pii_type_targets}
+            # Types carried by the fewest templates are served first
+            for pii_type in sorted(pii_type_targets, key=lambda pii_type: len(covering[pii_type])):
+                if not covering[pii_type]:
+                    raise ValueError(f"No template is built to contain PII type {pii_type}")
+                deficit = pii_type_targets[pii_type] - sum(floors[template_id] for template_id in covering[pii_type])
+                if deficit > 0:
+                    extra = allocate(deficit, {template_id: weights[template_id]
+                                               for template_id in covering[pii_type]}, {}, rng)
+                    for template_id, quota in extra.items():
+                        floors[template_id] += quota
+        quotas.update(allocate(count, weights, floors, rng))
+    template_slots = interleave([quotas[template['template_id']] for template in templates], rng)
+
+    planned_contexts = {}
+    for field, values in contexts.items():
+        value_targets = targets.get(field, {})
+        missing = [value for value in value_targets if value not in values]
+        if missing:
+            raise ValueError(f"Unknown {field} value(s) in the coverage targets: {', '.join(missing)}")
+        value_quotas = allocate(total, dict.fromkeys(values, 1.0), value_targets, rng)
+        planned_contexts[field] = (list(values), interleave([value_quotas[value] for value in values], rng))
+    return CoveragePlan(templates, template_slots, planned_contexts)
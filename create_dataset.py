@@ -1,10 +1,15 @@
-import json
 import re
-from faker import Faker
 from faker.providers import BaseProvider
-import pandas as pd
 from datetime import datetime, timedelta
 import random
+from constraints import choose, choose_from, compile_constraints, narrow
+from distributions import DISTRIBUTIONS, conditional_distribution, distribution
+from domain_engine import RecordEngine
+from fast_providers import name_based_email
+from identifiers import IdAllocator
+from lazy_loading import LazyFaker
+from locales import LOCALES
+from shared_tables import shared_table
 
 # Custom provider for medical-specific data
 class MedicalProvider(BaseProvider):
@@ -14,7 +19,7 @@ class MedicalProvider(BaseProvider):
         super().__init__(generator)
         
         # Department-specific medications mapping for realistic relationships
-        self.dept_medications = {
+        self.dept_medications = shared_table('dept_medications') or {
             'Cardiology': ['Lisinopril', 'Metoprolol', 'Atorvastatin', 'Amlodipine', 'Losartan', 'Carvedilol', 'Warfarin', 'Clopidogrel'],
             'Neurology': ['Levetiracetam', 'Gabapentin', 'Donepezil', 'Carbidopa-Levodopa', 'Topiramate', 'Lamotrigine', 'Phenytoin'],
             'Orthopedics': ['Ibuprofen', 'Naproxen', 'Celecoxib', 'Tramadol', 'Meloxicam', 'Diclofenac', 'Prednisone'],
@@ -30,7 +35,7 @@ class MedicalProvider(BaseProvider):
         }
         
         # Department-specific diagnosis codes
-        self.dept_diagnoses = {
+        self.dept_diagnoses = shared_table('dept_diagnoses') or {
             'Cardiology': ['I21.9', 'I25.10', 'I50.9', 'I10', 'I48.91', 'I35.0', 'I42.9'],
             'Neurology': ['G93.1', 'G40.909', 'F03.90', 'G20', 'G35', 'G43.909', 'G47.00'],
             'Orthopedics': ['M79.18', 'S72.001A', 'M25.511', 'M17.12', 'M48.06', 'S83.511A'],
@@ -70,7 +75,10 @@ class MedicalProvider(BaseProvider):
         return self.random_element(self.departments)
     
     def medication_for_department(self, department):
-        """Generate medication based on department"""
+        """Generate medication based on department, weighted by how commonly it is prescribed"""
+        weighted = conditional_distribution('medication_for_department', department)
+        if weighted is not None:
+            return weighted.sample(self.generator.random)
         if department in self.dept_medications:
             return self.random_element(self.dept_medications[department])
         return self.random_element(self.dept_medications['Internal Medicine'])
@@ -84,27 +92,19 @@ class MedicalProvider(BaseProvider):
     def create_realistic_email(self, first_name, last_name):
         """Create realistic email based on person's name"""
         domain = self.random_element(self.email_domains)
-        
-        # Different email formats
-        formats = [
-            f"{first_name.lower()}.{last_name.lower()}",
-            f"{first_name.lower()}{last_name.lower()}",
-            f"{first_name[0].lower()}{last_name.lower()}",
-            f"{first_name.lower()}{last_name[0].lower()}",
-            f"{first_name.lower()}.{last_name.lower()}{self.random_int(1, 999)}",
-            f"{first_name.lower()}{self.random_int(1, 999)}"
-        ]
-        
-        username = self.random_element(formats)
-        return f"{username}@{domain}"
+        return name_based_email(self.generator.random, first_name, last_name, domain)
     
     def ethnicity(self):
-        """Generate ethnicity"""
-        return self.random_element(self.ethnicities)
+        """Generate ethnicity (weighted by US population share)"""
+        return distribution('ethnicity').sample(self.generator.random)
     
     def insurance_provider(self):
-        """Generate insurance provider"""
-        return self.random_element(self.insurance_providers)
+        """Generate insurance provider (weighted by market share)"""
+        return distribution('insurance_provider').sample(self.generator.random)
+    
+    def blood_type(self):
+        """Generate blood type (weighted by US prevalence)"""
+        return distribution('blood_type').sample(self.generator.random)
     
     def emergency_contact_relationship(self):
         """Generate emergency contact relationship"""
@@ -113,26 +113,40 @@ class MedicalProvider(BaseProvider):
     
     def severity_level(self):
         """Generate condition severity"""
-        levels = ['Mild', 'Moderate', 'Severe', 'Critical']
-        return self.random_element(levels)
+        return distribution('severity_level').sample(self.generator.random)
     
     def hospital_type(self):
         """Generate hospital types for variety"""
         types = ['Medical Center', 'General Hospital', 'Regional Hospital', 'University Hospital', 'Community Hospital', 'Specialty Center']
         return self.random_element(types)
 
-class MedicalDatasetGenerator:
-    def __init__(self, seed=42):
-        """Initialize the medical dataset generator"""
-        self.fake = Faker()
-        self.fake.add_provider(MedicalProvider)
-        Faker.seed(seed)
+class MedicalDatasetGenerator(RecordEngine):
+    record_method = 'generate_patient_record'
+    record_label = 'medical organization records'
+    dataset_prefix = 'medical_org_dataset'
+    list_fields = ['unique_pii_types']
+    
+    # Faker (with MedicalProvider) is only built on first use
+    fake = LazyFaker(MedicalProvider)
+    
+    def __init__(self, seed=42, population=None, population_offset=0, id_allocator=None):
+        """Initialize the medical dataset generator
+        
+        With a PopulationStore, patients are drawn from the shared population
+        starting at ``population_offset`` instead of being generated by Faker.
+        MRNs and insurance IDs come from ``id_allocator`` (an IdAllocator), which
+        never hands out the same value twice.
+        """
+        self.seed = seed
+        self.people = population.iter_from(population_offset) if population is not None else None
+        self.ids = id_allocator if id_allocator is not None else IdAllocator(seed)
         
         # Build dynamic medication pattern from all department medications
+        provider = [p for p in self.fake.providers if isinstance(p, MedicalProvider)][0]
         all_medications = []
-        for dept_meds in self.fake.dept_medications.values():
+        for dept_meds in provider.dept_medications.values():
             all_medications.extend(dept_meds)
-        unique_medications = list(set(all_medications))
+        unique_medications = sorted(set(all_medications))
         medication_pattern = r'\b(' + '|'.join(re.escape(med) for med in unique_medications) + r')\b'
         
         # PII type definitions
@@ -157,52 +171,78 @@ class MedicalDatasetGenerator:
             'RELATIONSHIP': r'\b(Spouse|Parent|Child|Sibling|Friend|Other Family)\b'
         }
     
-    def find_pii_in_text(self, text):
-        """Find PII types and their indices in a text"""
-        pii_findings = []
-        
-        for pii_type, pattern in self.pii_types.items():
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                pii_findings.append({
-                    'pii_type': pii_type,
-                    'value': match.group(),
-                    'start_index': match.start(),
-                    'end_index': match.end(),
-                    'length': len(match.group())
-                })
-        
-        return pii_findings
+    def compile_constraints(self, constraints):
+        """Validate record constraints and narrow the departments they allow"""
+        provider = [p for p in self.fake.providers if isinstance(p, MedicalProvider)][0]
+        options = {
+            'department': provider.departments,
+            'medication': sorted({med for meds in provider.dept_medications.values() for med in meds}),
+            'diagnosis_code': sorted({code for codes in provider.dept_diagnoses.values() for code in codes}),
+            'condition_severity': list(DISTRIBUTIONS['severity_level']),
+            'ethnicity': list(DISTRIBUTIONS['ethnicity']),
+            'insurance_provider': list(DISTRIBUTIONS['insurance_provider']),
+            'blood_type': list(DISTRIBUTIONS['blood_type']),
+        }
+        compiled = compile_constraints(constraints, options)
+        
+        # A required medication or diagnosis limits the departments that can produce it
+        for field, table in [('medication', provider.dept_medications), ('diagnosis_code', provider.dept_diagnoses)]:
+            if field in compiled:
+                departments = [dept for dept in options['department'] if set(table[dept]) & set(compiled[field])]
+                narrow(compiled, 'department', departments, field)
+        return compiled, provider
     
-    def generate_patient_record(self):
-        """Generate a single patient record with medical organization data"""
+    def generate_patient_record(self, constraints=None):
+        """Generate a single patient record with medical organization data
+        
+        ``constraints`` maps record fields (department, medication,
+        diagnosis_code, condition_severity, ethnicity, insurance_provider,
+        blood_type) to a value or a list of allowed values.
+        """
+        compiled, provider = self.compiled_constraints(constraints) if constraints else ({}, None)
+        rng = self.fake.random
+        
+        # Draw the patient from the shared population when one is attached
+        person = next(self.people) if self.people is not None else None
+        
         # Generate basic patient information
-        first_name = self.fake.first_name()
-        last_name = self.fake.last_name()
+        first_name = person['first_name'] if person else self.fake.first_name()
+        last_name = person['last_name'] if person else self.fake.last_name()
         full_name = f"{first_name} {last_name}"
         
         # Generate dates
-        birth_date = self.fake.date_of_birth(minimum_age=18, maximum_age=90)
+        birth_date = person['date_of_birth'] if person else self.fake.date_of_birth(minimum_age=18, maximum_age=90)
         admission_date = self.fake.date_between(start_date='-2y', end_date='today')
         
         # Generate contact information with realistic email
-        email = self.fake.create_realistic_email(first_name, last_name)
-        phone = self.fake.phone_number()
-        address = self.fake.address().replace('\n', ', ')
+        email = person['email'] if person else self.fake.create_realistic_email(first_name, last_name)
+        phone = person['phone'] if person else self.fake.phone_number()
+        address = person['address'] if person else self.fake.address().replace('\n', ', ')
         
         # Generate diverse patient data
-        ethnicity = self.fake.ethnicity()
-        insurance_provider = self.fake.insurance_provider()
+        ethnicity = choose(compiled, 'ethnicity', self.fake.ethnicity, rng, 'ethnicity')
+        insurance_provider = choose(compiled, 'insurance_provider', self.fake.insurance_provider, rng, 'insurance_provider')
         
         # Generate medical information with department relationships
-        department = self.fake.department_name()
-        medication = self.fake.medication_for_department(department)
-        diagnosis = self.fake.diagnosis_for_department(department)
-        severity = self.fake.severity_level()
+        department = choose(compiled, 'department', self.fake.department_name, rng)
+        if 'medication' in compiled:
+            medication = choose_from([med for med in compiled['medication'] if med in provider.dept_medications[department]], rng)
+        else:
+            medication = self.fake.medication_for_department(department)
+        if 'diagnosis_code' in compiled:
+            diagnosis = choose_from([code for code in compiled['diagnosis_code'] if code in provider.dept_diagnoses[department]], rng)
+        else:
+            diagnosis = self.fake.diagnosis_for_department(department)
+        severity = choose(compiled, 'condition_severity', self.fake.severity_level, rng, 'severity_level')
         
         # Generate medical IDs
-        mrn = self.fake.medical_record_number()
-        insurance_id = self.fake.insurance_id()
+        mrn = self.ids.next('medical_record_number')
+        insurance_id = self.ids.next('insurance_id')
+        
+        # Locales with a national health number (e.g. the NHS number) record it next to the MRN
+        health_id = LOCALES[self.locale]['health_id']
+        health_number = getattr(self.fake, health_id[1])() if health_id else None
+        health_line = f"\n{health_id[0]}: {health_number}" if health_id else ''
         
         # Generate provider information with realistic email
         provider_first = self.fake.first_name()
@@ -226,7 +266,10 @@ class MedicalDatasetGenerator:
         
         # Additional medical details
         allergies = self.fake.random_elements(['Penicillin', 'Peanuts', 'Shellfish', 'Latex', 'Iodine', 'None Known'], length=self.fake.random_int(0, 2))
-        blood_type = self.fake.random_element(['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-'])
+        blood_type = choose(compiled, 'blood_type', self.fake.blood_type, rng, 'blood_type')
+        
+        # The same SSN is used in the record text and the structured record
+        ssn = person['ssn'] if person else self.fake.ssn()
         
         # Create comprehensive medical record text
         record_text = f"""
@@ -236,13 +279,13 @@ Hospital Phone: {hospital_phone}
 PATIENT INFORMATION:
 Name: {full_name}
 Date of Birth: {birth_date.strftime('%m/%d/%Y')}
-SSN: {self.fake.ssn()}
+SSN: {ssn}
 Ethnicity: {ethnicity}
 Blood Type: {blood_type}
 Address: {address}
 Phone: {phone}
 Email: {email}
-Medical Record Number: {mrn}
+Medical Record Number: {mrn}{health_line}
 
 INSURANCE INFORMATION:
 Provider: {insurance_provider}
@@ -285,6 +328,7 @@ Known allergies: {', '.join(allergies) if allergies else 'None'}.
         # Create structured record
         record = {
             'record_id': self.fake.uuid4(),
+            'person_index': person['person_index'] if person else None,
             'patient_name': full_name,
             'first_name': first_name,
             'last_name': last_name,
@@ -292,7 +336,7 @@ Known allergies: {', '.join(allergies) if allergies else 'None'}.
             'age': (datetime.now().date() - birth_date).days // 365,
             'ethnicity': ethnicity,
             'blood_type': blood_type,
-            'ssn': self.fake.ssn(),
+            'ssn': ssn,
             'address': address,
             'phone': phone,
             'email': email,
@@ -318,54 +362,13 @@ Known allergies: {', '.join(allergies) if allergies else 'None'}.
             'full_record_text': record_text,
             'pii_findings': pii_findings,
             'pii_count': len(pii_findings),
-            'unique_pii_types': list(set([finding['pii_type'] for finding in pii_findings]))
+            'unique_pii_types': list(dict.fromkeys(finding['pii_type'] for finding in pii_findings))
         }
+        if health_id:
+            record['national_health_number'] = health_number
         
         return record
     
-    def generate_dataset(self, num_records=1000):
-        """Generate a complete medical organization dataset"""
-        print(f"Generating {num_records} medical organization records...")
-        
-        records = []
-        for i in range(num_records):
-            if (i + 1) % 100 == 0:
-                print(f"Generated {i + 1}/{num_records} records...")
-            
-            record = self.generate_patient_record()
-            records.append(record)
-        
-        return records
-    
-    def save_dataset(self, records, filename_prefix='medical_org_dataset'):
-        """Save the dataset in multiple formats"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        # Save as JSON
-        json_filename = f"{filename_prefix}_{timestamp}.json"
-        with open(json_filename, 'w') as f:
-            json.dump(records, f, indent=2, default=str)
-        print(f"Dataset saved as JSON: {json_filename}")
-        
-        # Save as CSV (flattened version)
-        csv_records = []
-        for record in records:
-            csv_record = record.copy()
-            # Convert PII findings to summary
-            csv_record['pii_findings'] = json.dumps(record['pii_findings'])
-            csv_record['unique_pii_types'] = ', '.join(record['unique_pii_types'])
-            csv_records.append(csv_record)
-        
-        df = pd.DataFrame(csv_records)
-        csv_filename = f"{filename_prefix}_{timestamp}.csv"
-        df.to_csv(csv_filename, index=False)
-        print(f"Dataset saved as CSV: {csv_filename}")
-        
-        # Generate summary statistics
-        self.generate_summary_report(records, f"{filename_prefix}_summary_{timestamp}.txt")
-        
-        return json_filename, csv_filename
-    
     def generate_summary_report(self, records, filename):
         """Generate a summary report of PII findings"""
         pii_type_counts = {}
@@ -1,11 +1,15 @@
-import json
 import re
-from faker import Faker
 from faker.providers import BaseProvider
-import pandas as pd
 from datetime import datetime, timedelta
 import random
 from decimal import Decimal
+from constraints import choose, compile_constraints, narrow
+from distributions import distribution
+from domain_engine import RecordEngine
+from fast_providers import name_based_email
+from identifiers import IdAllocator
+from lazy_loading import LazyFaker
+from shared_tables import shared_table
 
 # Custom provider for education services data
 class EducationProvider(BaseProvider):
@@ -15,7 +19,7 @@ class EducationProvider(BaseProvider):
         super().__init__(generator)
         
         # Grade level specific course offerings
-        self.grade_level_courses = {
+        self.grade_level_courses = shared_table('grade_level_courses') or {
             'Elementary (K-5)': ['Mathematics', 'Reading', 'Science', 'Social Studies', 'Art', 'Physical Education', 'Music'],
             'Middle School (6-8)': ['Pre-Algebra', 'Algebra I', 'English Language Arts', 'Life Science', 'World History', 'Spanish', 'Band', 'Physical Education'],
             'High School (9-12)': ['Algebra II', 'Geometry', 'Biology', 'Chemistry', 'Physics', 'AP English', 'AP History', 'Calculus', 'Foreign Languages', 'Computer Science'],
@@ -24,7 +28,7 @@ class EducationProvider(BaseProvider):
         }
         
         # Academic performance to intervention mapping
-        self.performance_interventions = {
+        self.performance_interventions = shared_table('performance_interventions') or {
             'Excellent (3.8-4.0)': ['Gifted Program', 'Advanced Placement', 'Honor Society', 'Academic Scholarships'],
             'Good (3.0-3.7)': ['Study Groups', 'Academic Clubs', 'College Prep', 'Tutoring'],
             'Average (2.5-2.9)': ['Study Skills Training', 'Academic Support', 'Progress Monitoring', 'Peer Tutoring'],
@@ -33,7 +37,7 @@ class EducationProvider(BaseProvider):
         }
         
         # Student type to services mapping
-        self.student_services = {
+        self.student_services = shared_table('student_services') or {
             'Regular Education': ['Standard Curriculum', 'Extracurricular Activities', 'College Counseling', 'Career Guidance'],
             'Special Education': ['IEP Services', 'Resource Room', 'Speech Therapy', 'Occupational Therapy', 'Behavioral Support'],
             'Gifted and Talented': ['Enrichment Programs', 'Advanced Courses', 'Independent Study', 'Academic Competitions'],
@@ -42,7 +46,7 @@ class EducationProvider(BaseProvider):
         }
         
         # Educational institutions by level
-        self.institution_types = {
+        self.institution_types = shared_table('institution_types') or {
             'Elementary School': ['Lincoln Elementary', 'Washington Elementary', 'Roosevelt Elementary', 'Jefferson Elementary'],
             'Middle School': ['Central Middle School', 'Eastside Middle School', 'Westfield Middle School', 'Riverside Middle School'],
             'High School': ['Central High School', 'North High School', 'South High School', 'West High School'],
@@ -51,7 +55,7 @@ class EducationProvider(BaseProvider):
         }
         
         # Academic departments by institution level
-        self.academic_departments = {
+        self.academic_departments = shared_table('academic_departments') or {
             'Elementary School': ['Primary Education', 'Special Education', 'Art & Music', 'Physical Education'],
             'Middle School': ['Mathematics', 'Language Arts', 'Science', 'Social Studies', 'Special Education', 'Arts'],
             'High School': ['Mathematics', 'English', 'Science', 'Social Studies', 'Foreign Languages', 'Arts', 'Physical Education', 'Special Education'],
@@ -60,7 +64,7 @@ class EducationProvider(BaseProvider):
         }
         
         # Assessment types by grade level
-        self.assessments = {
+        self.assessments = shared_table('assessments') or {
             'Elementary (K-5)': ['Reading Assessment', 'Math Benchmark', 'State Testing', 'Portfolio Review'],
             'Middle School (6-8)': ['Standardized Tests', 'Course Exams', 'Project Assessments', 'State Testing'],
             'High School (9-12)': ['SAT', 'ACT', 'AP Exams', 'Final Exams', 'State Testing', 'College Placement'],
@@ -69,7 +73,7 @@ class EducationProvider(BaseProvider):
         }
         
         # Extracurricular activities by level
-        self.extracurriculars = {
+        self.extracurriculars = shared_table('extracurriculars') or {
             'Elementary (K-5)': ['Art Club', 'Chess Club', 'Student Council', 'Safety Patrol', 'Choir'],
             'Middle School (6-8)': ['Drama Club', 'Science Club', 'Student Government', 'Sports Teams', 'Band'],
             'High School (9-12)': ['Football', 'Basketball', 'Drama Club', 'National Honor Society', 'Debate Team', 'Band', 'Student Government'],
@@ -119,8 +123,8 @@ class EducationProvider(BaseProvider):
         return self.random_element(self.grade_levels)
     
     def performance_level(self):
-        """Generate academic performance level"""
-        return self.random_element(self.performance_levels)
+        """Generate academic performance level (weighted towards the middle of the GPA range)"""
+        return distribution('performance_level').sample(self.generator.random)
     
     def student_type(self):
         """Generate student type"""
@@ -142,11 +146,16 @@ class EducationProvider(BaseProvider):
             return self.random_element(self.academic_departments[level])
         return self.random_element(self.academic_departments['High School'])
     
-    def courses_for_grade_level(self, grade_level):
-        """Generate courses based on grade level"""
+    def courses_for_grade_level(self, grade_level, required=()):
+        """Generate courses based on grade level (always including ``required``)"""
         if grade_level in self.grade_level_courses:
             available_courses = self.grade_level_courses[grade_level]
-            num_courses = self.random_int(3, min(7, len(available_courses)))
+            num_courses = self.random_int(max(3, len(required)), min(7, len(available_courses)))
+            if required:
+                remaining = [course for course in available_courses if course not in required]
+                courses = list(required) + self.random_elements(remaining, length=num_courses - len(required), unique=True)
+                self.generator.random.shuffle(courses)
+                return courses
             return self.random_elements(available_courses, length=num_courses, unique=True)
         return ['General Studies']
     
@@ -214,17 +223,7 @@ class EducationProvider(BaseProvider):
         else:
             domain = self.random_element(self.parent_email_domains)
         
-        formats = [
-            f"{first_name.lower()}.{last_name.lower()}",
-            f"{first_name.lower()}{last_name.lower()}",
-            f"{first_name[0].lower()}{last_name.lower()}",
-            f"{first_name.lower()}{last_name[0].lower()}",
-            f"{first_name.lower()}.{last_name.lower()}{self.random_int(1, 99)}",
-            f"{first_name.lower()}{self.random_int(1, 999)}"
-        ]
-        
-        username = self.random_element(formats)
-        return f"{username}@{domain}"
+        return name_based_email(self.generator.random, first_name, last_name, domain, dotted_number_max=99)
     
     def academic_year(self):
         """Generate academic year"""
@@ -235,12 +234,28 @@ class EducationProvider(BaseProvider):
         """Generate semester"""
         return random.choice(['Fall', 'Spring', 'Summer'])
 
-class EducationDatasetGenerator:
-    def __init__(self, seed=42):
-        """Initialize the education dataset generator"""
-        self.fake = Faker()
-        self.fake.add_provider(EducationProvider)
-        Faker.seed(seed)
+class EducationDatasetGenerator(RecordEngine):
+    record_method = 'generate_student_record'
+    record_label = 'student education records'
+    dataset_prefix = 'education_dataset'
+    output_dir = 'education'
+    list_fields = ['unique_pii_types', 'courses', 'interventions', 'services']
+    
+    # Faker (with EducationProvider) is only built on first use
+    fake = LazyFaker(EducationProvider)
+    
+    def __init__(self, seed=42, population=None, population_offset=0, id_allocator=None):
+        """Initialize the education dataset generator
+        
+        With a PopulationStore, the first parent/guardian is drawn from the
+        shared population starting at ``population_offset``; the student then
+        shares that parent's last name and household address.
+        Student IDs come from ``id_allocator`` (an IdAllocator), which
+        never hands out the same value twice.
+        """
+        self.seed = seed
+        self.people = population.iter_from(population_offset) if population is not None else None
+        self.ids = id_allocator if id_allocator is not None else IdAllocator(seed)
         
         # Build dynamic patterns for PII detection
         provider = [p for p in self.fake.providers if isinstance(p, EducationProvider)][0]
@@ -276,33 +291,47 @@ class EducationDatasetGenerator:
             'UNAVAILABLE_FIELD': r'\bNot Available\b'
         }
     
-    def find_pii_in_text(self, text):
-        """Find PII types and their indices in a text"""
-        pii_findings = []
-        
-        for pii_type, pattern in self.pii_types.items():
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                pii_findings.append({
-                    'pii_type': pii_type,
-                    'value': match.group(),
-                    'start_index': match.start(),
-                    'end_index': match.end(),
-                    'length': len(match.group())
-                })
-        
-        return pii_findings
-    
-    def generate_student_record(self):
-        """Generate a single student record with educational data"""
+    def compile_constraints(self, constraints):
+        """Validate record constraints and narrow the grade levels they allow"""
+        provider = [p for p in self.fake.providers if isinstance(p, EducationProvider)][0]
+        options = {
+            'grade_level': provider.grade_levels,
+            'performance_level': list(distribution('performance_level').values),
+            'student_type': provider.student_types,
+            'institution_level': provider.institution_levels,
+            'courses': sorted({course for courses in provider.grade_level_courses.values() for course in courses}),
+        }
+        compiled = compile_constraints(constraints, options)
+        
+        # Required courses limit the grade levels that offer them
+        if 'courses' in compiled:
+            required = set(compiled['courses'])
+            grades = [grade for grade, courses in provider.grade_level_courses.items()
+                      if required <= set(courses) and len(required) <= 7]
+            narrow(compiled, 'grade_level', grades, 'courses')
+        return compiled
+    
+    def generate_student_record(self, constraints=None):
+        """Generate a single student record with educational data
+        
+        ``constraints`` maps record fields (grade_level, performance_level,
+        student_type, institution_level) to a value or a list of allowed
+        values; ``courses`` lists courses every student must take.
+        """
+        compiled = self.compiled_constraints(constraints) if constraints else {}
+        rng = self.fake.random
+        
+        # Draw the first parent/guardian from the shared population when one is attached
+        person = next(self.people) if self.people is not None else None
+        
         # Generate basic student information
         student_first_name = self.fake.first_name()
-        student_last_name = self.fake.last_name()
+        student_last_name = person['last_name'] if person else self.fake.last_name()
         student_full_name = f"{student_first_name} {student_last_name}"
         
         # Generate parent/guardian information
-        parent1_first_name = self.fake.first_name()
-        parent1_last_name = self.fake.last_name()
+        parent1_first_name = person['first_name'] if person else self.fake.first_name()
+        parent1_last_name = person['last_name'] if person else self.fake.last_name()
         parent1_full_name = f"{parent1_first_name} {parent1_last_name}"
         parent1_relationship = self.fake.guardian_relationship()
         
@@ -319,28 +348,28 @@ class EducationDatasetGenerator:
         # Generate student demographics
         student_birth_date = self.fake.date_of_birth(minimum_age=5, maximum_age=25)
         student_ssn = self.fake.ssn() if random.random() > 0.7 else None  # Not always available
-        student_address = self.fake.address().replace('\n', ', ')
-        parent1_phone = self.fake.phone_number()
+        student_address = person['address'] if person else self.fake.address().replace('\n', ', ')
+        parent1_phone = person['phone'] if person else self.fake.phone_number()
         parent2_phone = self.fake.phone_number()
-        parent1_email = self.fake.create_educational_email(parent1_first_name, parent1_last_name, is_staff=False)
+        parent1_email = person['email'] if person else self.fake.create_educational_email(parent1_first_name, parent1_last_name, is_staff=False)
         parent2_email = self.fake.create_educational_email(parent2_first_name, parent2_last_name, is_staff=False)
         
         # Generate academic profile
-        grade_level = self.fake.grade_level()
-        performance_level = self.fake.performance_level()
-        student_type = self.fake.student_type()
-        institution_level = self.fake.institution_level()
+        grade_level = choose(compiled, 'grade_level', self.fake.grade_level, rng)
+        performance_level = choose(compiled, 'performance_level', self.fake.performance_level, rng, 'performance_level')
+        student_type = choose(compiled, 'student_type', self.fake.student_type, rng)
+        institution_level = choose(compiled, 'institution_level', self.fake.institution_level, rng)
         institution_name = self.fake.institution_name(institution_level)
         academic_department = self.fake.academic_department(institution_level)
         
         # Generate educational IDs
-        student_id = self.fake.student_id()
+        student_id = self.ids.next('student_id')
         parent1_id = self.fake.parent_id()
         parent2_id = self.fake.parent_id()
         teacher_id = self.fake.teacher_id()
         
         # Generate academic details
-        courses = self.fake.courses_for_grade_level(grade_level)
+        courses = self.fake.courses_for_grade_level(grade_level, compiled.get('courses', ()))
         primary_course = courses[0] if courses else 'General Studies'
         gpa = self.fake.gpa(performance_level)
         academic_year = self.fake.academic_year()
@@ -457,6 +486,7 @@ Emergency contact: {emergency_contact} ({emergency_phone})
         # Create structured record
         record = {
             'student_record_id': self.fake.uuid4(),
+            'person_index': person['person_index'] if person else None,
             'student_id': student_id,
             'student_name': student_full_name,
             'student_first_name': student_first_name,
@@ -512,61 +542,11 @@ Emergency contact: {emergency_contact} ({emergency_phone})
             'full_record_text': record_text,
             'pii_findings': pii_findings,
             'pii_count': len(pii_findings),
-            'unique_pii_types': list(set([finding['pii_type'] for finding in pii_findings]))
+            'unique_pii_types': list(dict.fromkeys(finding['pii_type'] for finding in pii_findings))
         }
         
         return record
     
-    def generate_dataset(self, num_records=1000):
-        """Generate a complete education services dataset"""
-        print(f"Generating {num_records} student education records...")
-        
-        records = []
-        for i in range(num_records):
-            if (i + 1) % 100 == 0:
-                print(f"Generated {i + 1}/{num_records} records...")
-            
-            record = self.generate_student_record()
-            records.append(record)
-        
-        return records
-    
-    def save_dataset(self, records, filename_prefix='education_dataset'):
-        """Save the dataset in multiple formats"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        # Create education directory if it doesn't exist
-        import os
-        if not os.path.exists('education'):
-            os.makedirs('education')
-        
-        # Save as JSON
-        json_filename = f"education/{filename_prefix}_{timestamp}.json"
-        with open(json_filename, 'w') as f:
-            json.dump(records, f, indent=2, default=str)
-        print(f"Dataset saved as JSON: {json_filename}")
-        
-        # Save as CSV (flattened version)
-        csv_records = []
-        for record in records:
-            csv_record = record.copy()
-            csv_record['pii_findings'] = json.dumps(record['pii_findings'])
-            csv_record['unique_pii_types'] = ', '.join(record['unique_pii_types'])
-            csv_record['courses'] = ', '.join(record['courses'])
-            csv_record['interventions'] = ', '.join(record['interventions'])
-            csv_record['services'] = ', '.join(record['services'])
-            csv_records.append(csv_record)
-        
-        df = pd.DataFrame(csv_records)
-        csv_filename = f"education/{filename_prefix}_{timestamp}.csv"
-        df.to_csv(csv_filename, index=False)
-        print(f"Dataset saved as CSV: {csv_filename}")
-        
-        # Generate summary statistics
-        self.generate_summary_report(records, f"education/{filename_prefix}_summary_{timestamp}.txt")
-        
-        return json_filename, csv_filename
-    
     def generate_summary_report(self, records, filename):
         """Generate a comprehensive summary report"""
         pii_type_counts = {}
@@ -1,15 +1,21 @@
 import json
 import re
 import random
-import pandas as pd
 from datetime import datetime, timedelta
-from faker import Faker
+from detection_cache import DetectionCache, PromptAnalysis
+from domain_engine import compile_pii_types
+from lazy_loading import LazyFaker, reseed_fakers
+from prompt_templates import compile_templates
 
 class EducationPromptGenerator:
+    # Faker is only built on first use
+    fake = LazyFaker()
+    # Persistent detection results shared across runs (detection_cache.DetectionStore), if any
+    detection_store = None
+    
     def __init__(self, seed=42):
         """Initialize the education prompt generator"""
-        self.fake = Faker()
-        Faker.seed(seed)
+        self.seed = seed
         
         # PII type definitions for education prompts
         self.pii_types = {
@@ -246,76 +252,110 @@ class EducationPromptGenerator:
             "Review special education legal requirements",
             "Update policies for student discipline procedures"
         ]
+        
+        # Templates are parsed once; a prompt generates only the fake fields its template uses
+        self.all_courses = [course for courses in self.courses.values() for course in courses]
+        self.fake_fields = self.fake_field_providers()
+        # PII type each field is built to carry (the label detection gives its values), for the coverage planner
+        self.field_pii_types = {
+            **dict.fromkeys(['student_name', 'parent_name', 'teacher_name', 'counselor_name', 'principal_name',
+                             'department_head', 'special_ed_teacher', 'therapist_name', 'special_ed_coordinator',
+                             'service_provider', 'current_teacher', 'next_teacher', 'emergency_contact',
+                             'old_contact', 'new_contact'], 'PERSON_NAME'),
+            'student_id': 'STUDENT_ID',
+            'parent_id': 'PARENT_ID',
+            'teacher_id': 'TEACHER_ID',
+            'phone': 'PHONE',
+            'emergency_phone': 'PHONE',
+            'parent_email': 'EMAIL',
+            'teacher_email': 'EMAIL',
+            'address': 'ADDRESS',
+            'date': 'DATE_OF_BIRTH',
+            'test_date': 'DATE_OF_BIRTH',
+            'date_of_birth': 'DATE_OF_BIRTH',
+            'gpa': 'GPA',
+            'academic_year': 'ACADEMIC_YEAR',
+            'semester': 'SEMESTER',
+            'score': 'ASSESSMENT_SCORE',
+            'attendance_rate': 'ATTENDANCE_RATE',
+        }
+        self.compiled_templates = compile_templates(self.pii_prompt_templates, self.fake_fields, self.field_pii_types,
+                                                    id_prefix='pii')
+        self.pii_templates = {template.template_id: template for template in self.compiled_templates}
+        
+        # Detection results by prompt text; the fixed non-PII templates are scanned once
+        self.detection_cache = DetectionCache(self.scan_prompt)
     
-    def generate_fake_education_data(self):
-        """Generate fake education data for use in prompts"""
+    def fake_field_providers(self):
+        """Zero-argument providers of the fake education data the PII templates can reference"""
         return {
-            'student_name': self.fake.name(),
-            'parent_name': self.fake.name(),
-            'teacher_name': self.fake.name(),
-            'counselor_name': self.fake.name(),
-            'principal_name': self.fake.name(),
-            'department_head': self.fake.name(),
-            'special_ed_teacher': self.fake.name(),
-            'therapist_name': self.fake.name(),
-            'special_ed_coordinator': self.fake.name(),
-            'service_provider': self.fake.name(),
-            'current_teacher': self.fake.name(),
-            'next_teacher': self.fake.name(),
-            'emergency_contact': self.fake.name(),
-            'old_contact': self.fake.name(),
-            'new_contact': self.fake.name(),
-            'student_id': f"STU{random.randint(100000, 999999)}",
-            'parent_id': f"PAR{random.randint(100000, 999999)}",
-            'teacher_id': f"TCH{random.randint(10000, 99999)}",
-            'phone': self.fake.phone_number(),
-            'emergency_phone': self.fake.phone_number(),
-            'parent_email': self.fake.email(),
-            'teacher_email': f"{self.fake.first_name().lower()}.{self.fake.last_name().lower()}@university.edu",
-            'address': self.fake.address().replace('\n', ', '),
-            'date': self.fake.date_between(start_date='today', end_date='+30d').strftime('%m/%d/%Y'),
-            'test_date': self.fake.date_between(start_date='today', end_date='+60d').strftime('%m/%d/%Y'),
-            'date_of_birth': self.fake.date_of_birth(minimum_age=5, maximum_age=25).strftime('%m/%d/%Y'),
-            'course': random.choice([course for courses in self.courses.values() for course in courses]),
-            'grade_level': random.choice(self.grade_levels),
-            'student_type': random.choice(self.student_types),
-            'performance_level': random.choice(self.performance_levels),
-            'institution_level': random.choice(self.institution_levels),
-            'staff_role': random.choice(self.staff_roles),
-            'assessment_type': random.choice(self.assessments),
-            'intervention': random.choice(self.interventions),
-            'gpa': f"{random.uniform(1.0, 4.0):.2f}",
-            'score': random.randint(60, 100),
-            'attendance_rate': f"{random.randint(75, 100)}%",
-            'academic_year': f"{random.randint(2023, 2025)}-{random.randint(2024, 2026)}",
-            'semester': random.choice(['Fall', 'Spring', 'Summer']),
-            'classroom': f"Room {random.randint(100, 999)}",
-            'incident_type': random.choice(['Tardiness', 'Absence', 'Behavioral Issue', 'Academic Concern']),
-            'academic_performance': random.choice(['Excellent', 'Good', 'Needs Improvement'])
+            'student_name': lambda: self.fake.name(),
+            'parent_name': lambda: self.fake.name(),
+            'teacher_name': lambda: self.fake.name(),
+            'counselor_name': lambda: self.fake.name(),
+            'principal_name': lambda: self.fake.name(),
+            'department_head': lambda: self.fake.name(),
+            'special_ed_teacher': lambda: self.fake.name(),
+            'therapist_name': lambda: self.fake.name(),
+            'special_ed_coordinator': lambda: self.fake.name(),
+            'service_provider': lambda: self.fake.name(),
+            'current_teacher': lambda: self.fake.name(),
+            'next_teacher': lambda: self.fake.name(),
+            'emergency_contact': lambda: self.fake.name(),
+            'old_contact': lambda: self.fake.name(),
+            'new_contact': lambda: self.fake.name(),
+            'student_id': lambda: f"STU{random.randint(100000, 999999)}",
+            'parent_id': lambda: f"PAR{random.randint(100000, 999999)}",
+            'teacher_id': lambda: f"TCH{random.randint(10000, 99999)}",
+            'phone': lambda: self.fake.phone_number(),
+            'emergency_phone': lambda: self.fake.phone_number(),
+            'parent_email': lambda: self.fake.email(),
+            'teacher_email': lambda: f"{self.fake.first_name().lower()}.{self.fake.last_name().lower()}@university.edu",
+            'address': lambda: self.fake.address().replace('\n', ', '),
+            'date': lambda: self.fake.date_between(start_date='today', end_date='+30d').strftime('%m/%d/%Y'),
+            'test_date': lambda: self.fake.date_between(start_date='today', end_date='+60d').strftime('%m/%d/%Y'),
+            'date_of_birth': lambda: self.fake.date_of_birth(minimum_age=5, maximum_age=25).strftime('%m/%d/%Y'),
+            'course': lambda: random.choice(self.all_courses),
+            'grade_level': lambda: random.choice(self.grade_levels),
+            'student_type': lambda: random.choice(self.student_types),
+            'performance_level': lambda: random.choice(self.performance_levels),
+            'institution_level': lambda: random.choice(self.institution_levels),
+            'staff_role': lambda: random.choice(self.staff_roles),
+            'assessment_type': lambda: random.choice(self.assessments),
+            'intervention': lambda: random.choice(self.interventions),
+            'gpa': lambda: f"{random.uniform(1.0, 4.0):.2f}",
+            'score': lambda: random.randint(60, 100),
+            'attendance_rate': lambda: f"{random.randint(75, 100)}%",
+            'academic_year': lambda: f"{random.randint(2023, 2025)}-{random.randint(2024, 2026)}",
+            'semester': lambda: random.choice(['Fall', 'Spring', 'Summer']),
+            'classroom': lambda: f"Room {random.randint(100, 999)}",
+            'incident_type': lambda: random.choice(['Tardiness', 'Absence', 'Behavioral Issue', 'Academic Concern']),
+            'academic_performance': lambda: random.choice(['Excellent', 'Good', 'Needs Improvement'])
         }
     
-    def create_pii_prompt(self):
-        """Create a prompt that contains PII"""
-        template = random.choice(self.pii_prompt_templates)
-        fake_data = self.generate_fake_education_data()
-        
-        # Fill in the template with fake data
-        try:
-            prompt = template.format(**fake_data)
-        except KeyError as e:
-            # If a key is missing, use a fallback
-            missing_key = str(e).strip("'")
-            fake_data[missing_key] = "PLACEHOLDER"
-            prompt = template.format(**fake_data)
-        
-        return prompt
+    def create_pii_prompt(self, template_id=None):
+        """Create a prompt that contains PII (from ``template_id`` when given); returns (prompt, template_id)"""
+        if template_id is not None:
+            template = self.pii_templates[template_id]
+        else:
+            template = random.choice(self.compiled_templates)
+        return template.fill(), template.template_id
     
-    def create_non_pii_prompt(self):
-        """Create a prompt that does not contain PII"""
-        return random.choice(self.non_pii_prompt_templates)
+    def create_non_pii_prompt(self, template_id=None):
+        """Create a prompt that does not contain PII (from ``template_id`` when given); returns (prompt, template_id)"""
+        if template_id is not None:
+            index = int(template_id.rpartition('-')[2]) - 1
+        else:
+            index = random.randrange(len(self.non_pii_prompt_templates))
+        return self.non_pii_prompt_templates[index], f"nopii-{index + 1}"
     
     def find_pii_in_prompt(self, prompt_text):
         """Find PII types and their indices in a prompt"""
+        if self.detection_store is not None:
+            patterns = compile_pii_types(self.pii_types)
+            return [{'pii_type': pii_type, 'value': prompt_text[start:end], 'start_index': start, 'end_index': end}
+                    for pii_type, start, end in self.detection_store.scan(patterns, prompt_text)]
+        
         pii_findings = []
         
         for pii_type, pattern in self.pii_types.items():
@@ -330,16 +370,24 @@ class EducationPromptGenerator:
         
         return pii_findings
     
-    def verify_pii_presence(self, prompt_text, expected_contains_pii):
-        """Verify that PII detection matches expected result"""
-        pii_findings = self.find_pii_in_prompt(prompt_text)
-        actual_contains_pii = len(pii_findings) > 0
+    def scan_prompt(self, prompt_text):
+        """PromptAnalysis of a prompt (uncached; use analyze_prompt)"""
+        return PromptAnalysis(prompt_text, self.find_pii_in_prompt(prompt_text))
+    
+    def analyze_prompt(self, prompt_text):
+        """PromptAnalysis of a prompt, from the detection cache"""
+        return self.detection_cache.get(prompt_text)
+    
+    def verify_pii_presence(self, prompt_text, expected_contains_pii, analysis=None):
+        """Verify that PII detection matches expected result (reusing ``analysis`` when given)"""
+        analysis = analysis or self.analyze_prompt(prompt_text)
+        actual_contains_pii = analysis.contains_pii
         
         return {
             'matches_expectation': actual_contains_pii == expected_contains_pii,
             'expected': expected_contains_pii,
             'actual': actual_contains_pii,
-            'pii_findings': pii_findings
+            'pii_findings': analysis.pii_findings()
         }
     
     def extract_source_entities(self, prompt_text, pii_findings):
@@ -375,35 +423,46 @@ class EducationPromptGenerator:
         
         return entities
     
-    def generate_prompt_record(self, target_contains_pii=None):
-        """Generate a single prompt record with educational context"""
+    def generate_prompt_record(self, target_contains_pii=None, template_id=None, contexts=None):
+        """Generate a single prompt record with educational context
+        
+        ``template_id`` and ``contexts`` ({context field: value}) fix what is otherwise drawn at random
+        (see template_catalog and coverage_contexts).
+        """
         # Decide if this prompt should contain PII
-        if target_contains_pii is None:
+        if template_id is not None:
+            contains_pii = not template_id.startswith('nopii')
+        elif target_contains_pii is None:
             contains_pii = random.choice([True, False])
         else:
             contains_pii = target_contains_pii
         
         # Generate the appropriate type of prompt
         if contains_pii:
-            prompt_text = self.create_pii_prompt()
+            prompt_text, template_id = self.create_pii_prompt(template_id)
             prompt_category = "Educational Professional Query with PII"
         else:
-            prompt_text = self.create_non_pii_prompt()
+            prompt_text, template_id = self.create_non_pii_prompt(template_id)
             prompt_category = "Educational Professional Query without PII"
         
-        # Find PII in the prompt
-        pii_findings = self.find_pii_in_prompt(prompt_text)
-        actual_contains_pii = len(pii_findings) > 0
+        # Find PII in the prompt (one cached analysis serves every step below)
+        analysis = self.analyze_prompt(prompt_text)
+        pii_findings = analysis.pii_findings()
+        actual_contains_pii = analysis.contains_pii
         
         # Verify PII detection
-        verification = self.verify_pii_presence(prompt_text, contains_pii)
+        verification = self.verify_pii_presence(prompt_text, contains_pii, analysis)
         
         # Extract source entities
         source_entities = self.extract_source_entities(prompt_text, pii_findings)
         
         # Determine professional context
-        role_context = random.choice(self.educational_roles)
-        grade_level_context = random.choice(self.grade_levels)
+        if contexts is not None:
+            role_context = contexts['role_context']
+            grade_level_context = contexts['grade_level_context']
+        else:
+            role_context = random.choice(self.educational_roles)
+            grade_level_context = random.choice(self.grade_levels)
         
         # Create record
         record = {
@@ -413,11 +472,12 @@ class EducationPromptGenerator:
             'intended_pii': contains_pii,
             'verification_passed': verification['matches_expectation'],
             'prompt_category': prompt_category,
+            'template_id': template_id,
             'role_context': role_context,
             'grade_level_context': grade_level_context,
             'pii_findings': pii_findings,
             'pii_count': len(pii_findings),
-            'unique_pii_types': list(set([finding['pii_type'] for finding in pii_findings])),
+            'unique_pii_types': list(dict.fromkeys(finding['pii_type'] for finding in pii_findings)),
             'source_entities': source_entities,
             'entity_count': len(source_entities),
             'prompt_length': len(prompt_text),
@@ -426,41 +486,73 @@ class EducationPromptGenerator:
         
         return record
     
+    def reseed(self, seed, row_offset=0):
+        """Restart the generator's random streams from ``seed`` (one chunk of a parallel run, see pipeline.py)
+        
+        ``row_offset`` is unused: these prompts are not filled from source rows.
+        """
+        reseed_fakers(self, seed)
+        random.seed(seed)
+    
+    def generate_prompt_records(self, contains_pii, count, start=0, progress=False):
+        """Generate ``count`` prompt records with or without PII
+        
+        ``start`` only offsets the progress count; education prompts are numbered
+        after the shuffle (finalize_dataset).
+        """
+        records = []
+        for i in range(start, start + count):
+            if progress and (i + 1) % 100 == 0:
+                print(f"Generated {i + 1}/{start + count} {'PII' if contains_pii else 'non-PII'} prompts...")
+            
+            records.append(self.generate_prompt_record(target_contains_pii=contains_pii))
+        return records
+    
+    def template_catalog(self):
+        """Templates the coverage planner allocates prompts to (see coverage.py), all equally weighted"""
+        return ([{'template_id': template.template_id, 'contains_pii': True, 'pii_types': template.pii_types,
+                  'weight': 1.0} for template in self.compiled_templates]
+                + [{'template_id': f"nopii-{index}", 'contains_pii': False, 'pii_types': [], 'weight': 1.0}
+                   for index in range(1, len(self.non_pii_prompt_templates) + 1)])
+    
+    def coverage_contexts(self):
+        """Record context fields the coverage planner balances, with their values"""
+        return {'role_context': self.educational_roles, 'grade_level_context': self.grade_levels}
+    
+    def generate_planned_records(self, slots):
+        """Prompt records of coverage plan slots ((position, number, template_id, contexts), see coverage.py)"""
+        records = []
+        for position, number, template_id, contexts in slots:
+            record = self.generate_prompt_record(template_id=template_id, contexts=contexts)
+            record['prompt_number'] = position + 1
+            records.append(record)
+        return records
+    
+    def finalize_dataset(self, records, rng=random):
+        """Shuffle the records with ``rng`` and add final numbering"""
+        rng.shuffle(records)
+        for i, record in enumerate(records):
+            record['prompt_number'] = i + 1
+        return records
+    
     def generate_dataset(self, num_prompts=1000, pii_ratio=0.5):
         """Generate a complete education prompt dataset"""
         print(f"Generating {num_prompts} educational professional prompts...")
         print(f"Target PII ratio: {pii_ratio*100}% with PII, {(1-pii_ratio)*100}% without PII")
         
-        records = []
         num_pii_prompts = int(num_prompts * pii_ratio)
         num_non_pii_prompts = num_prompts - num_pii_prompts
         
         # Generate PII-containing prompts
         print(f"Generating {num_pii_prompts} prompts with PII...")
-        for i in range(num_pii_prompts):
-            if (i + 1) % 100 == 0:
-                print(f"Generated {i + 1}/{num_pii_prompts} PII prompts...")
-            
-            record = self.generate_prompt_record(target_contains_pii=True)
-            records.append(record)
+        records = self.generate_prompt_records(True, num_pii_prompts, progress=True)
         
         # Generate non-PII prompts
         print(f"Generating {num_non_pii_prompts} prompts without PII...")
-        for i in range(num_non_pii_prompts):
-            if (i + 1) % 100 == 0:
-                print(f"Generated {i + 1}/{num_non_pii_prompts} non-PII prompts...")
-            
-            record = self.generate_prompt_record(target_contains_pii=False)
-            records.append(record)
-        
-        # Shuffle the records
-        random.shuffle(records)
+        records.extend(self.generate_prompt_records(False, num_non_pii_prompts, progress=True))
         
-        # Add final numbering
-        for i, record in enumerate(records):
-            record['prompt_number'] = i + 1
-        
-        return records
+        # Shuffle the records and add final numbering
+        return self.finalize_dataset(records)
     
     def save_dataset(self, records, filename_prefix='employer_prompts_education'):
         """Save the prompt dataset in multiple formats"""
@@ -486,6 +578,7 @@ class EducationPromptGenerator:
             csv_record['source_entities'] = json.dumps(record['source_entities'])
             csv_records.append(csv_record)
         
+        import pandas as pd
         df = pd.DataFrame(csv_records)
         csv_filename = f"prompts_for_llm/{filename_prefix}_{timestamp}.csv"
         df.to_csv(csv_filename, index=False)
@@ -1,11 +1,15 @@
-import json
-import re
-from faker import Faker
 from faker.providers import BaseProvider
-import pandas as pd
 from datetime import datetime, timedelta
 import random
 from decimal import Decimal
+from constraints import choose, choose_from, compile_constraints, narrow
+from distributions import conditional_distribution, distribution
+from domain_engine import RecordEngine
+from fast_providers import name_based_email
+from identifiers import IdAllocator
+from lazy_loading import DEFAULT_LOCALE, LazyFaker
+from locales import LOCALES
+from shared_tables import shared_table
 
 # Custom provider for financial services data
 class FinancialProvider(BaseProvider):
@@ -15,7 +19,7 @@ class FinancialProvider(BaseProvider):
         super().__init__(generator)
         
         # Account type specific transaction patterns
-        self.account_transactions = {
+        self.account_transactions = shared_table('account_transactions') or {
             'Checking': ['Direct Deposit', 'Debit Purchase', 'ATM Withdrawal', 'Bill Payment', 'Transfer', 'Check Payment'],
             'Savings': ['Interest Payment', 'Transfer In', 'Transfer Out', 'Deposit', 'Withdrawal'],
             'Credit Card': ['Purchase', 'Payment', 'Cash Advance', 'Interest Charge', 'Fee', 'Refund'],
@@ -27,7 +31,7 @@ class FinancialProvider(BaseProvider):
         }
         
         # Income bracket to account type relationships
-        self.income_account_mapping = {
+        self.income_account_mapping = shared_table('income_account_mapping') or {
             'Under $30k': ['Checking', 'Savings'],
             '$30k-$50k': ['Checking', 'Savings', 'Credit Card'],
             '$50k-$75k': ['Checking', 'Savings', 'Credit Card', 'Auto Loan'],
@@ -37,7 +41,7 @@ class FinancialProvider(BaseProvider):
         }
         
         # Credit score to product relationships
-        self.credit_products = {
+        self.credit_products = shared_table('credit_products') or {
             'Excellent (750+)': ['Premium Credit Card', 'Mortgage', 'Personal Loan', 'Business Loan'],
             'Good (700-749)': ['Standard Credit Card', 'Mortgage', 'Auto Loan', 'Personal Loan'],
             'Fair (650-699)': ['Secured Credit Card', 'Auto Loan', 'Personal Loan'],
@@ -53,14 +57,14 @@ class FinancialProvider(BaseProvider):
         ]
         
         # Investment types by risk profile
-        self.investment_products = {
+        self.investment_products = shared_table('investment_products') or {
             'Conservative': ['Savings Account', 'CD', 'Government Bonds', 'Money Market'],
             'Moderate': ['Mutual Funds', 'Corporate Bonds', 'Balanced Portfolio', 'Index Funds'],
             'Aggressive': ['Individual Stocks', 'Options', 'Crypto', 'Growth Funds', 'REITs']
         }
         
         # Bank branches by region
-        self.bank_branches = {
+        self.bank_branches = shared_table('bank_branches') or {
             'Northeast': ['New York Main', 'Boston Financial', 'Philadelphia Center', 'Newark Business'],
             'Southeast': ['Atlanta Metro', 'Miami Beach', 'Charlotte Uptown', 'Jacksonville East'],
             'Midwest': ['Chicago Loop', 'Detroit Downtown', 'Minneapolis Central', 'Cleveland Heights'],
@@ -76,6 +80,7 @@ class FinancialProvider(BaseProvider):
         self.credit_scores = list(self.credit_products.keys())
         self.risk_profiles = list(self.investment_products.keys())
         self.regions = list(self.bank_branches.keys())
+        self.customer_segments = ['Mass Market', 'Affluent', 'High Net Worth', 'Private Banking', 'Business', 'Small Business']
     
     def account_number(self):
         """Generate realistic account number"""
@@ -99,8 +104,8 @@ class FinancialProvider(BaseProvider):
         return self.random_element(self.income_brackets)
     
     def credit_score_category(self):
-        """Generate credit score category"""
-        return self.random_element(self.credit_scores)
+        """Generate credit score category (weighted by the US score distribution)"""
+        return distribution('credit_score_category').sample(self.generator.random)
     
     def employment_sector(self):
         """Generate employment sector"""
@@ -120,11 +125,26 @@ class FinancialProvider(BaseProvider):
             return self.random_element(self.bank_branches[region])
         return self.random_element(self.bank_branches['Northeast'])
     
-    def account_types_for_income(self, income_bracket):
-        """Generate account types based on income"""
+    def account_types_for_income(self, income_bracket, required=()):
+        """Generate account types based on income, weighted by how likely each account is held
+        
+        Accounts in ``required`` are always included; the rest are drawn as usual.
+        """
         if income_bracket in self.income_account_mapping:
             available_accounts = self.income_account_mapping[income_bracket]
-            num_accounts = self.random_int(1, min(4, len(available_accounts)))
+            num_accounts = self.random_int(max(1, len(required)), min(4, len(available_accounts)))
+            weighted = conditional_distribution('account_types_for_income', income_bracket)
+            if required:
+                extra = num_accounts - len(required)
+                if weighted is not None:
+                    accounts = list(required) + weighted.sample_unique(self.generator.random, extra, exclude=required)
+                else:
+                    remaining = [account for account in available_accounts if account not in required]
+                    accounts = list(required) + (self.random_elements(remaining, length=extra, unique=True) if extra else [])
+                self.generator.random.shuffle(accounts)
+                return accounts
+            if weighted is not None:
+                return weighted.sample_unique(self.generator.random, num_accounts)
             return self.random_elements(available_accounts, length=num_accounts, unique=True)
         return ['Checking']
     
@@ -143,23 +163,11 @@ class FinancialProvider(BaseProvider):
     def create_realistic_email(self, first_name, last_name):
         """Create realistic email based on person's name"""
         domain = self.random_element(self.email_domains)
-        
-        formats = [
-            f"{first_name.lower()}.{last_name.lower()}",
-            f"{first_name.lower()}{last_name.lower()}",
-            f"{first_name[0].lower()}{last_name.lower()}",
-            f"{first_name.lower()}{last_name[0].lower()}",
-            f"{first_name.lower()}.{last_name.lower()}{self.random_int(1, 999)}",
-            f"{first_name.lower()}{self.random_int(1, 999)}"
-        ]
-        
-        username = self.random_element(formats)
-        return f"{username}@{domain}"
+        return name_based_email(self.generator.random, first_name, last_name, domain)
     
     def customer_segment(self):
         """Generate customer segment"""
-        segments = ['Mass Market', 'Affluent', 'High Net Worth', 'Private Banking', 'Business', 'Small Business']
-        return self.random_element(segments)
+        return self.random_element(self.customer_segments)
     
     def relationship_length(self):
         """Generate relationship length with bank"""
@@ -170,18 +178,32 @@ class FinancialProvider(BaseProvider):
         purposes = ['Home Purchase', 'Refinance', 'Home Improvement', 'Debt Consolidation', 'Education', 'Business Expansion', 'Equipment Purchase']
         return self.random_element(purposes)
 
-class FinancialDatasetGenerator:
-    def __init__(self, seed=42):
-        """Initialize the financial dataset generator"""
-        self.fake = Faker()
-        self.fake.add_provider(FinancialProvider)
-        Faker.seed(seed)
+class FinancialDatasetGenerator(RecordEngine):
+    record_method = 'generate_customer_record'
+    record_label = 'financial services customer records'
+    dataset_prefix = 'financial_dataset'
+    list_fields = ['unique_pii_types', 'account_types']
+    
+    # Faker (with FinancialProvider) is only built on first use
+    fake = LazyFaker(FinancialProvider)
+    
+    def __init__(self, seed=42, population=None, population_offset=0, id_allocator=None):
+        """Initialize the financial dataset generator
+        
+        With a PopulationStore, customers are drawn from the shared population
+        starting at ``population_offset`` instead of being generated by Faker.
+        Account numbers and SSNs come from ``id_allocator`` (an IdAllocator), which
+        never hands out the same value twice.
+        """
+        self.seed = seed
+        self.people = population.iter_from(population_offset) if population is not None else None
+        self.ids = id_allocator if id_allocator is not None else IdAllocator(seed)
         
         # Build dynamic patterns for PII detection
         provider = [p for p in self.fake.providers if isinstance(p, FinancialProvider)][0]
         all_sectors = provider.employment_sectors
         all_segments = ['Mass Market', 'Affluent', 'High Net Worth', 'Private Banking', 'Business', 'Small Business']
-        all_account_types = list(set([acc for acc_list in provider.income_account_mapping.values() for acc in acc_list]))
+        all_account_types = sorted(set([acc for acc_list in provider.income_account_mapping.values() for acc in acc_list]))
         
         # PII type definitions for financial data
         self.pii_types = {
@@ -205,56 +227,89 @@ class FinancialDatasetGenerator:
             'UNAVAILABLE_FIELD': r'\bNot Available\b'
         }
     
-    def find_pii_in_text(self, text):
-        """Find PII types and their indices in a text"""
-        pii_findings = []
-        
-        for pii_type, pattern in self.pii_types.items():
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                pii_findings.append({
-                    'pii_type': pii_type,
-                    'value': match.group(),
-                    'start_index': match.start(),
-                    'end_index': match.end(),
-                    'length': len(match.group())
-                })
-        
-        return pii_findings
+    def compile_constraints(self, constraints):
+        """Validate record constraints and narrow the income brackets and regions they allow"""
+        provider = [p for p in self.fake.providers if isinstance(p, FinancialProvider)][0]
+        options = {
+            'income_bracket': provider.income_brackets,
+            'credit_score_category': list(distribution('credit_score_category').values),
+            'employment_sector': provider.employment_sectors,
+            'risk_profile': provider.risk_profiles,
+            'customer_segment': provider.customer_segments,
+            'region': provider.regions,
+            'bank_branch': [branch for branches in provider.bank_branches.values() for branch in branches],
+            'account_types': sorted({account for accounts in provider.income_account_mapping.values() for account in accounts}),
+        }
+        compiled = compile_constraints(constraints, options)
+        
+        # Required accounts limit the income brackets that hold them; a branch fixes its region
+        if 'account_types' in compiled:
+            required = set(compiled['account_types'])
+            brackets = [bracket for bracket, accounts in provider.income_account_mapping.items()
+                        if required <= set(accounts) and len(required) <= 4]
+            narrow(compiled, 'income_bracket', brackets, 'account_types')
+        if 'bank_branch' in compiled:
+            regions = [region for region, branches in provider.bank_branches.items()
+                       if set(branches) & set(compiled['bank_branch'])]
+            narrow(compiled, 'region', regions, 'bank_branch')
+        return compiled, provider
     
-    def generate_customer_record(self):
-        """Generate a single customer record with financial data"""
+    def generate_customer_record(self, constraints=None):
+        """Generate a single customer record with financial data
+        
+        ``constraints`` maps record fields (income_bracket, credit_score_category,
+        employment_sector, risk_profile, customer_segment, region, bank_branch)
+        to a value or a list of allowed values; ``account_types`` lists
+        accounts every customer must hold.
+        """
+        compiled, provider = self.compiled_constraints(constraints) if constraints else ({}, None)
+        rng = self.fake.random
+        
+        # Draw the customer from the shared population when one is attached
+        person = next(self.people) if self.people is not None else None
+        
         # Generate basic customer information
-        first_name = self.fake.first_name()
-        last_name = self.fake.last_name()
+        first_name = person['first_name'] if person else self.fake.first_name()
+        last_name = person['last_name'] if person else self.fake.last_name()
         full_name = f"{first_name} {last_name}"
         
         # Generate demographics
-        birth_date = self.fake.date_of_birth(minimum_age=18, maximum_age=80)
-        ssn = self.fake.ssn()
-        email = self.fake.create_realistic_email(first_name, last_name)
-        phone = self.fake.phone_number()
-        address = self.fake.address().replace('\n', ', ')
+        birth_date = person['date_of_birth'] if person else self.fake.date_of_birth(minimum_age=18, maximum_age=80)
+        # The unique SSN space is US-only; other locales use their national identifier
+        if person:
+            ssn = person['ssn']
+        elif self.locale == DEFAULT_LOCALE:
+            ssn = self.ids.next('ssn')
+        else:
+            ssn = self.fake.ssn()
+        email = person['email'] if person else self.fake.create_realistic_email(first_name, last_name)
+        phone = person['phone'] if person else self.fake.phone_number()
+        address = person['address'] if person else self.fake.address().replace('\n', ', ')
         
         # Generate financial profile
-        income_bracket = self.fake.income_bracket()
-        credit_score_category = self.fake.credit_score_category()
-        employment_sector = self.fake.employment_sector()
-        risk_profile = self.fake.risk_profile()
-        customer_segment = self.fake.customer_segment()
+        income_bracket = choose(compiled, 'income_bracket', self.fake.income_bracket, rng)
+        credit_score_category = choose(compiled, 'credit_score_category', self.fake.credit_score_category, rng, 'credit_score_category')
+        employment_sector = choose(compiled, 'employment_sector', self.fake.employment_sector, rng)
+        risk_profile = choose(compiled, 'risk_profile', self.fake.risk_profile, rng)
+        customer_segment = choose(compiled, 'customer_segment', self.fake.customer_segment, rng)
         relationship_length = self.fake.relationship_length()
         
         # Generate location and branch
-        region = self.fake.region()
-        bank_branch = self.fake.bank_branch(region)
+        region = choose(compiled, 'region', self.fake.region, rng)
+        if 'bank_branch' in compiled:
+            bank_branch = choose_from([branch for branch in compiled['bank_branch'] if branch in provider.bank_branches[region]], rng)
+        else:
+            bank_branch = self.fake.bank_branch(region)
         
         # Generate accounts based on income
-        account_types = self.fake.account_types_for_income(income_bracket)
+        account_types = self.fake.account_types_for_income(income_bracket, compiled.get('account_types', ()))
         primary_account_type = account_types[0] if account_types else 'Checking'
         
         # Generate account details
-        account_number = self.fake.account_number()
+        account_number = self.ids.next('account_number')
         routing_number = self.fake.routing_number()
+        iban = self.fake.iban() if LOCALES[self.locale]['iban'] else None
+        iban_line = f"\nIBAN: {iban}" if iban else ''
         
         # Generate additional financial products
         if 'Credit Card' in account_types:
@@ -308,7 +363,7 @@ Relationship Length: {relationship_length} years
 
 ACCOUNT INFORMATION:
 Primary Account Type: {primary_account_type}
-Account Number: {account_number}
+Account Number: {account_number}{iban_line}
 Routing Number: {routing_number}
 All Account Types: {', '.join(account_types)}
 Credit Card: {credit_card_number if credit_card_number else 'Not Available'}
@@ -342,6 +397,7 @@ Account managed by {advisor_name} ({advisor_email})
         # Create structured record
         record = {
             'customer_id': self.fake.uuid4(),
+            'person_index': person['person_index'] if person else None,
             'customer_name': full_name,
             'first_name': first_name,
             'last_name': last_name,
@@ -375,54 +431,13 @@ Account managed by {advisor_name} ({advisor_email})
             'full_record_text': record_text,
             'pii_findings': pii_findings,
             'pii_count': len(pii_findings),
-            'unique_pii_types': list(set([finding['pii_type'] for finding in pii_findings]))
+            'unique_pii_types': list(dict.fromkeys(finding['pii_type'] for finding in pii_findings))
         }
+        if iban:
+            record['iban'] = iban
         
         return record
     
-    def generate_dataset(self, num_records=1000):
-        """Generate a complete financial services dataset"""
-        print(f"Generating {num_records} financial services customer records...")
-        
-        records = []
-        for i in range(num_records):
-            if (i + 1) % 100 == 0:
-                print(f"Generated {i + 1}/{num_records} records...")
-            
-            record = self.generate_customer_record()
-            records.append(record)
-        
-        return records
-    
-    def save_dataset(self, records, filename_prefix='financial_dataset'):
-        """Save the dataset in multiple formats"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        # Save as JSON
-        json_filename = f"{filename_prefix}_{timestamp}.json"
-        with open(json_filename, 'w') as f:
-            json.dump(records, f, indent=2, default=str)
-        print(f"Dataset saved as JSON: {json_filename}")
-        
-        # Save as CSV (flattened version)
-        csv_records = []
-        for record in records:
-            csv_record = record.copy()
-            csv_record['pii_findings'] = json.dumps(record['pii_findings'])
-            csv_record['unique_pii_types'] = ', '.join(record['unique_pii_types'])
-            csv_record['account_types'] = ', '.join(record['account_types'])
-            csv_records.append(csv_record)
-        
-        df = pd.DataFrame(csv_records)
-        csv_filename = f"{filename_prefix}_{timestamp}.csv"
-        df.to_csv(csv_filename, index=False)
-        print(f"Dataset saved as CSV: {csv_filename}")
-        
-        # Generate summary statistics
-        self.generate_summary_report(records, f"{filename_prefix}_summary_{timestamp}.txt")
-        
-        return json_filename, csv_filename
-    
     def generate_summary_report(self, records, filename):
         """Generate a comprehensive summary report"""
         pii_type_counts = {}
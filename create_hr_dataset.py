@@ -0,0 +1,234 @@
+"""HR employee records, defined by a declarative domain spec (see domain_engine.py)"""
+import re
+from faker.providers import BaseProvider
+from distributions import DISTRIBUTIONS, distribution
+from domain_engine import DomainSpec, Field, alternation
+from fast_providers import name_based_email
+from shared_tables import shared_table
+
+# Custom provider for HR-specific data
+class HRProvider(BaseProvider):
+    """Custom Faker provider for HR employee data"""
+
+    def __init__(self, generator):
+        super().__init__(generator)
+
+        # Department to job title relationships
+        self.department_titles = shared_table('department_titles') or {
+            'Engineering': ['Software Engineer', 'Senior Software Engineer', 'QA Engineer', 'DevOps Engineer', 'Engineering Manager'],
+            'Sales': ['Account Executive', 'Sales Representative', 'Sales Manager', 'Business Development Manager'],
+            'Marketing': ['Marketing Specialist', 'Content Strategist', 'Brand Manager', 'Marketing Director'],
+            'Finance': ['Financial Analyst', 'Staff Accountant', 'Payroll Specialist', 'Controller'],
+            'Human Resources': ['HR Generalist', 'Recruiter', 'Benefits Coordinator', 'HR Business Partner'],
+            'Operations': ['Operations Analyst', 'Logistics Coordinator', 'Facilities Manager', 'Operations Director'],
+            'Customer Support': ['Support Specialist', 'Customer Success Manager', 'Support Team Lead'],
+            'Legal': ['Paralegal', 'Corporate Counsel', 'Compliance Officer']
+        }
+        self.departments = list(self.department_titles)
+
+        # Salary bands (annual USD range)
+        self.salary_bands = {
+            'Band 1': (38000, 52000),
+            'Band 2': (52000, 75000),
+            'Band 3': (75000, 105000),
+            'Band 4': (105000, 145000),
+            'Band 5': (145000, 210000)
+        }
+
+        self.work_locations = ['Headquarters', 'Remote', 'Hybrid', 'Regional Office', 'Field']
+        self.benefit_plans = ['PPO Family', 'PPO Individual', 'HMO Family', 'HMO Individual', 'High Deductible', 'Waived']
+        self.personal_email_domains = ['gmail.com', 'outlook.com', 'yahoo.com', 'hotmail.com', 'icloud.com']
+
+    def department(self):
+        """Generate department"""
+        return self.random_element(self.departments)
+
+    def job_title_for_department(self, department):
+        """Generate a job title that exists in the department"""
+        return self.random_element(self.department_titles[department])
+
+    def employment_type(self):
+        """Generate employment type"""
+        return distribution('employment_type').sample(self.generator.random)
+
+    def performance_rating(self):
+        """Generate last review rating"""
+        return distribution('performance_rating').sample(self.generator.random)
+
+    def salary_band(self):
+        """Generate salary band"""
+        return self.random_element(list(self.salary_bands))
+
+    def annual_salary(self, band):
+        """Generate an annual salary within the band"""
+        low, high = self.salary_bands[band]
+        return f"${self.generator.random.randrange(low, high, 500):,}"
+
+    def work_location(self):
+        """Generate work location"""
+        return self.random_element(self.work_locations)
+
+    def benefit_plan(self):
+        """Generate benefit plan"""
+        return self.random_element(self.benefit_plans)
+
+    def company_domain(self, company_name):
+        """Email domain of a company name"""
+        return re.sub(r'[^a-z0-9]+', '', company_name.lower().split(',')[0]) + '.com'
+
+    def work_email(self, first_name, last_name, company_domain):
+        """Create a company email based on the employee's name"""
+        return name_based_email(self.generator.random, first_name, last_name, company_domain, dotted_number_max=9)
+
+    def personal_email(self, first_name, last_name):
+        """Create a personal email based on the employee's name"""
+        domain = self.random_element(self.personal_email_domains)
+        return name_based_email(self.generator.random, first_name, last_name, domain)
+
+    def bank_account(self):
+        """Generate a direct deposit account number"""
+        return self.numerify('#########')
+
+HR_SPEC = DomainSpec(
+    name='hr',
+    providers=[HRProvider],
+    record_label='HR employee records',
+    dataset_prefix='hr_dataset',
+    title='HR EMPLOYEE DATASET',
+    summary_fields=['department', 'employment_type', 'salary_band', 'performance_rating', 'work_location'],
+    fields={
+        # Employee identity (drawn from the shared population when one is attached)
+        'first_name': Field('first_name', person='first_name'),
+        'last_name': Field('last_name', person='last_name'),
+        'employee_name': Field(lambda fake, first, last: f"{first} {last}", depends_on=['first_name', 'last_name']),
+        'date_of_birth': Field(lambda fake: fake.date_of_birth(minimum_age=21, maximum_age=67),
+                               person='date_of_birth', fmt='%m/%d/%Y'),
+        'ssn': Field('ssn', person='ssn'),
+        'address': Field(lambda fake: fake.address().replace('\n', ', '), person='address'),
+        'phone': Field('phone_number', person='phone'),
+        'personal_email': Field('personal_email', depends_on=['first_name', 'last_name'], person='email'),
+
+        # Employment
+        'company_name': Field('company'),
+        '_company_domain': Field('company_domain', depends_on=['company_name']),
+        'employee_id': Field('id:employee_id'),
+        'work_email': Field('work_email', depends_on=['first_name', 'last_name', '_company_domain']),
+        'department': Field('department', options='departments'),
+        'job_title': Field('job_title_for_department', depends_on=['department'], options='department_titles'),
+        'employment_type': Field('employment_type', options=list(DISTRIBUTIONS['employment_type']),
+                                 distribution='employment_type'),
+        'work_location': Field('work_location', options='work_locations'),
+        'hire_date': Field(lambda fake: fake.date_between(start_date='-15y', end_date='today'), fmt='%m/%d/%Y'),
+        'salary_band': Field('salary_band', options=['Band 1', 'Band 2', 'Band 3', 'Band 4', 'Band 5']),
+        'annual_salary': Field('annual_salary', depends_on=['salary_band']),
+        'direct_deposit_account': Field('bank_account'),
+        'benefit_plan': Field('benefit_plan', options='benefit_plans'),
+        'performance_rating': Field('performance_rating', options=list(DISTRIBUTIONS['performance_rating']),
+                                    distribution='performance_rating'),
+
+        # Manager and emergency contact
+        '_manager_first': Field('first_name'),
+        '_manager_last': Field('last_name'),
+        'manager_name': Field(lambda fake, first, last: f"{first} {last}", depends_on=['_manager_first', '_manager_last']),
+        'manager_email': Field('work_email', depends_on=['_manager_first', '_manager_last', '_company_domain']),
+        'emergency_contact_name': Field(lambda fake: f"{fake.first_name()} {fake.last_name()}"),
+        'emergency_contact_phone': Field('phone_number'),
+    },
+    template="""
+EMPLOYEE RECORD - {company_name}
+
+EMPLOYEE INFORMATION:
+Name: {employee_name}
+Employee ID: {employee_id}
+Date of Birth: {date_of_birth}
+SSN: {ssn}
+Address: {address}
+Phone: {phone}
+Personal Email: {personal_email}
+Work Email: {work_email}
+
+EMPLOYMENT DETAILS:
+Department: {department}
+Job Title: {job_title}
+Employment Type: {employment_type}
+Work Location: {work_location}
+Hire Date: {hire_date}
+Manager: {manager_name} ({manager_email})
+
+COMPENSATION AND BENEFITS:
+Salary Band: {salary_band}
+Annual Salary: {annual_salary}
+Direct Deposit Account: {direct_deposit_account}
+Benefit Plan: {benefit_plan}
+
+PERFORMANCE:
+Last Review Rating: {performance_rating}
+
+EMERGENCY CONTACT:
+Name: {emergency_contact_name}
+Phone: {emergency_contact_phone}
+
+HR NOTES:
+{employee_name} ({employee_id}) joined {department} as {job_title} on {hire_date} and reports to {manager_name}.
+Payroll deposits {annual_salary} per year to account {direct_deposit_account}; contact {phone} or {personal_email}.
+    """,
+    pii_types={
+        'PERSON_NAME': r'\b[A-Z][a-z]+ [A-Z][a-z]+\b',
+        'EMAIL': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+        'PHONE': r'\b\d{3}-\d{3}-\d{4}\b',
+        'SSN': r'\b\d{3}-\d{2}-\d{4}\b',
+        'ADDRESS': r'\d+\s+\w+\s+\w+',
+        'DATE': r'\b\d{2}/\d{2}/\d{4}\b',
+        'EMPLOYEE_ID': r'EMP-\d{6}',
+        'ZIP_CODE': r'\b\d{5}\b',
+        'ACCOUNT_NUMBER': r'\b\d{9}\b',
+        'SALARY': r'\$\d{1,3}(,\d{3})+',
+        'DEPARTMENT': lambda provider: alternation(provider.departments),
+        'JOB_TITLE': lambda provider: alternation(title for titles in provider.department_titles.values() for title in titles),
+        'EMPLOYMENT_TYPE': alternation(DISTRIBUTIONS['employment_type']),
+        'PERFORMANCE_RATING': alternation(DISTRIBUTIONS['performance_rating']),
+    },
+)
+
+HRDatasetGenerator = HR_SPEC.generator_class('HRDatasetGenerator')
+
+def main():
+    """Main function to generate the HR employee dataset"""
+    print("HR Employee Dataset Generator")
+    print("="*45)
+    print("Features:")
+    print("✓ Department-based job titles")
+    print("✓ Salary bands with matching salaries")
+    print("✓ Company and personal name-based emails")
+    print("✓ Comprehensive PII detection and indexing")
+    print()
+
+    # Initialize generator
+    generator = HRDatasetGenerator(seed=42)
+
+    # Generate dataset
+    num_records = 500
+    records = generator.generate_dataset(num_records)
+
+    # Save dataset
+    json_file, csv_file = generator.save_dataset(records)
+
+    print(f"\nDataset generation complete!")
+    print(f"Generated {len(records)} HR employee records")
+    print(f"Files created: {json_file}, {csv_file}")
+
+    # Display sample record
+    print(f"\nSample Record (first record):")
+    print("-" * 60)
+    sample = records[0]
+    print(f"Employee: {sample['employee_name']} ({sample['employee_id']})")
+    print(f"Position: {sample['job_title']}, {sample['department']} ({sample['employment_type']})")
+    print(f"Salary: {sample['annual_salary']} ({sample['salary_band']})")
+    print(f"PII Types Found: {', '.join(sample['unique_pii_types'])}")
+    print(f"Total PII Count: {sample['pii_count']}")
+
+    print(f"\nSample Record Text (first 400 chars):")
+    print(sample['full_record_text'][:400] + "...")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,14 @@
-import json
-import re
-from faker import Faker
 from faker.providers import BaseProvider
-import pandas as pd
 from datetime import datetime, timedelta
 import random
 from decimal import Decimal
+from constraints import choose, choose_from, compile_constraints, narrow
+from distributions import distribution
+from domain_engine import RecordEngine
+from fast_providers import name_based_email
+from identifiers import IdAllocator
+from lazy_loading import LazyFaker
+from shared_tables import shared_table
 
 # Custom provider for legal services data
 class LegalProvider(BaseProvider):
@@ -15,7 +18,7 @@ class LegalProvider(BaseProvider):
         super().__init__(generator)
         
         # Practice area specific case types
-        self.practice_area_cases = {
+        self.practice_area_cases = shared_table('practice_area_cases') or {
             'Corporate Law': ['Merger & Acquisition', 'Corporate Governance', 'Securities', 'Contract Dispute', 'Compliance Review', 'IPO Preparation'],
             'Criminal Defense': ['Felony Defense', 'Misdemeanor Defense', 'DUI/DWI', 'White Collar Crime', 'Appeals', 'Plea Negotiation'],
             'Personal Injury': ['Auto Accident', 'Medical Malpractice', 'Slip and Fall', 'Product Liability', 'Workers Compensation', 'Wrongful Death'],
@@ -31,7 +34,7 @@ class LegalProvider(BaseProvider):
         }
         
         # Client type to legal service relationships
-        self.client_service_mapping = {
+        self.client_service_mapping = shared_table('client_service_mapping') or {
             'Individual': ['Personal Injury', 'Family Law', 'Criminal Defense', 'Immigration', 'Bankruptcy', 'Estate Planning'],
             'Small Business': ['Corporate Law', 'Employment Law', 'Real Estate', 'Tax Law', 'Intellectual Property', 'Contract Dispute'],
             'Corporation': ['Corporate Law', 'Employment Law', 'Intellectual Property', 'Tax Law', 'Environmental Law', 'Securities'],
@@ -55,7 +58,7 @@ class LegalProvider(BaseProvider):
         ]
         
         # Court jurisdictions by region
-        self.court_jurisdictions = {
+        self.court_jurisdictions = shared_table('court_jurisdictions') or {
             'Federal': ['U.S. District Court SDNY', 'U.S. District Court NDCA', 'U.S. District Court DDC', 'U.S. Court of Appeals 9th Circuit'],
             'State': ['New York Supreme Court', 'California Superior Court', 'Texas District Court', 'Florida Circuit Court'],
             'Local': ['Manhattan Family Court', 'Los Angeles Municipal Court', 'Cook County Circuit Court', 'Wayne County Probate Court']
@@ -68,7 +71,7 @@ class LegalProvider(BaseProvider):
         ]
         
         # Legal document types by practice area
-        self.legal_documents = {
+        self.legal_documents = shared_table('legal_documents') or {
             'Corporate Law': ['Articles of Incorporation', 'Merger Agreement', 'Stock Purchase Agreement', 'Board Resolution'],
             'Criminal Defense': ['Motion to Dismiss', 'Plea Agreement', 'Sentencing Memorandum', 'Appeal Brief'],
             'Personal Injury': ['Complaint', 'Settlement Agreement', 'Medical Records Release', 'Expert Witness Report'],
@@ -148,11 +151,17 @@ class LegalProvider(BaseProvider):
             return self.random_element(self.court_jurisdictions[jurisdiction_type])
         return self.random_element(self.court_jurisdictions['State'])
     
-    def case_types_for_practice_area(self, practice_area):
-        """Generate case types based on practice area"""
+    def case_types_for_practice_area(self, practice_area, required=()):
+        """Generate case types based on practice area (always including ``required``)"""
         if practice_area in self.practice_area_cases:
             available_cases = self.practice_area_cases[practice_area]
-            num_cases = self.random_int(1, min(3, len(available_cases)))
+            num_cases = self.random_int(max(1, len(required)), min(3, len(available_cases)))
+            if required:
+                remaining = [case for case in available_cases if case not in required]
+                extra = num_cases - len(required)
+                cases = list(required) + (self.random_elements(remaining, length=extra, unique=True) if extra else [])
+                self.generator.random.shuffle(cases)
+                return cases
             return self.random_elements(available_cases, length=num_cases, unique=True)
         return ['General Legal Matter']
     
@@ -185,8 +194,8 @@ class LegalProvider(BaseProvider):
         return self.random_element(self.firm_types)
     
     def case_status(self):
-        """Generate case status"""
-        return self.random_element(self.case_statuses)
+        """Generate case status (open matters outnumber closed ones)"""
+        return distribution('case_status').sample(self.generator.random)
     
     def fee_structure(self):
         """Generate fee structure"""
@@ -207,17 +216,7 @@ class LegalProvider(BaseProvider):
         else:
             domain = self.random_element(self.client_email_domains)
         
-        formats = [
-            f"{first_name.lower()}.{last_name.lower()}",
-            f"{first_name.lower()}{last_name.lower()}",
-            f"{first_name[0].lower()}{last_name.lower()}",
-            f"{first_name.lower()}{last_name[0].lower()}",
-            f"{first_name.lower()}.{last_name.lower()}{self.random_int(1, 99)}",
-            f"{first_name.lower()}{self.random_int(1, 999)}"
-        ]
-        
-        username = self.random_element(formats)
-        return f"{username}@{domain}"
+        return name_based_email(self.generator.random, first_name, last_name, domain, dotted_number_max=99)
     
     def settlement_amount(self):
         """Generate settlement amount"""
@@ -227,12 +226,27 @@ class LegalProvider(BaseProvider):
         """Generate court filing fee"""
         return round(random.uniform(50.00, 2000.00), 2)
 
-class LegalDatasetGenerator:
-    def __init__(self, seed=42):
-        """Initialize the legal dataset generator"""
-        self.fake = Faker()
-        self.fake.add_provider(LegalProvider)
-        Faker.seed(seed)
+class LegalDatasetGenerator(RecordEngine):
+    record_method = 'generate_legal_record'
+    record_label = 'legal case records'
+    dataset_prefix = 'legal_dataset'
+    output_dir = 'legal'
+    list_fields = ['unique_pii_types', 'case_types', 'credentials']
+    
+    # Faker (with LegalProvider) is only built on first use
+    fake = LazyFaker(LegalProvider)
+    
+    def __init__(self, seed=42, population=None, population_offset=0, id_allocator=None):
+        """Initialize the legal dataset generator
+        
+        With a PopulationStore, clients are drawn from the shared population
+        starting at ``population_offset`` instead of being generated by Faker.
+        Case and docket numbers come from ``id_allocator`` (an IdAllocator), which
+        never hands out the same value twice.
+        """
+        self.seed = seed
+        self.people = population.iter_from(population_offset) if population is not None else None
+        self.ids = id_allocator if id_allocator is not None else IdAllocator(seed)
         
         # Build dynamic patterns for PII detection
         provider = [p for p in self.fake.providers if isinstance(p, LegalProvider)][0]
@@ -267,28 +281,49 @@ class LegalDatasetGenerator:
             'UNAVAILABLE_FIELD': r'\bNot Available\b'
         }
     
-    def find_pii_in_text(self, text):
-        """Find PII types and their indices in a text"""
-        pii_findings = []
-        
-        for pii_type, pattern in self.pii_types.items():
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                pii_findings.append({
-                    'pii_type': pii_type,
-                    'value': match.group(),
-                    'start_index': match.start(),
-                    'end_index': match.end(),
-                    'length': len(match.group())
-                })
-        
-        return pii_findings
-    
-    def generate_legal_record(self):
-        """Generate a single legal case record"""
+    def compile_constraints(self, constraints):
+        """Validate record constraints and narrow the practice areas and jurisdiction types they allow"""
+        provider = [p for p in self.fake.providers if isinstance(p, LegalProvider)][0]
+        options = {
+            'practice_area': provider.practice_areas,
+            'client_type': provider.client_types,
+            'case_complexity': provider.complexities,
+            'jurisdiction_type': provider.jurisdiction_types,
+            'court_jurisdiction': [court for courts in provider.court_jurisdictions.values() for court in courts],
+            'case_status': list(distribution('case_status').values),
+            'case_types': sorted({case for cases in provider.practice_area_cases.values() for case in cases}),
+        }
+        compiled = compile_constraints(constraints, options)
+        
+        # Required case types limit the practice areas that handle them; a court fixes its jurisdiction type
+        if 'case_types' in compiled:
+            required = set(compiled['case_types'])
+            areas = [area for area, cases in provider.practice_area_cases.items()
+                     if required <= set(cases) and len(required) <= 3]
+            narrow(compiled, 'practice_area', areas, 'case_types')
+        if 'court_jurisdiction' in compiled:
+            types = [jurisdiction for jurisdiction, courts in provider.court_jurisdictions.items()
+                     if set(courts) & set(compiled['court_jurisdiction'])]
+            narrow(compiled, 'jurisdiction_type', types, 'court_jurisdiction')
+        return compiled, provider
+    
+    def generate_legal_record(self, constraints=None):
+        """Generate a single legal case record
+        
+        ``constraints`` maps record fields (practice_area, client_type,
+        case_complexity, jurisdiction_type, court_jurisdiction, case_status)
+        to a value or a list of allowed values; ``case_types`` lists case
+        types every case must include.
+        """
+        compiled, provider = self.compiled_constraints(constraints) if constraints else ({}, None)
+        rng = self.fake.random
+        
+        # Draw the client from the shared population when one is attached
+        person = next(self.people) if self.people is not None else None
+        
         # Generate basic client information
-        client_first_name = self.fake.first_name()
-        client_last_name = self.fake.last_name()
+        client_first_name = person['first_name'] if person else self.fake.first_name()
+        client_last_name = person['last_name'] if person else self.fake.last_name()
         client_full_name = f"{client_first_name} {client_last_name}"
         
         # Generate attorney information
@@ -297,25 +332,32 @@ class LegalDatasetGenerator:
         attorney_full_name = f"{attorney_first_name} {attorney_last_name}"
         
         # Generate client demographics
-        client_birth_date = self.fake.date_of_birth(minimum_age=18, maximum_age=80)
-        client_ssn = self.fake.ssn() if random.random() > 0.3 else None  # Not always available
-        client_email = self.fake.create_legal_email(client_first_name, client_last_name, is_attorney=False)
-        client_phone = self.fake.phone_number()
-        client_address = self.fake.address().replace('\n', ', ')
+        client_birth_date = person['date_of_birth'] if person else self.fake.date_of_birth(minimum_age=18, maximum_age=80)
+        if random.random() > 0.3:  # Not always available
+            client_ssn = person['ssn'] if person else self.fake.ssn()
+        else:
+            client_ssn = None
+        client_email = person['email'] if person else self.fake.create_legal_email(client_first_name, client_last_name, is_attorney=False)
+        client_phone = person['phone'] if person else self.fake.phone_number()
+        client_address = person['address'] if person else self.fake.address().replace('\n', ', ')
         
         # Generate legal case profile
-        practice_area = self.fake.practice_area()
-        client_type = self.fake.client_type()
-        case_complexity = self.fake.case_complexity()
-        jurisdiction_type = self.fake.jurisdiction_type()
-        court_jurisdiction = self.fake.court_jurisdiction(jurisdiction_type)
+        practice_area = choose(compiled, 'practice_area', self.fake.practice_area, rng)
+        client_type = choose(compiled, 'client_type', self.fake.client_type, rng)
+        case_complexity = choose(compiled, 'case_complexity', self.fake.case_complexity, rng)
+        jurisdiction_type = choose(compiled, 'jurisdiction_type', self.fake.jurisdiction_type, rng)
+        if 'court_jurisdiction' in compiled:
+            court_jurisdiction = choose_from([court for court in compiled['court_jurisdiction']
+                                              if court in provider.court_jurisdictions[jurisdiction_type]], rng)
+        else:
+            court_jurisdiction = self.fake.court_jurisdiction(jurisdiction_type)
         
         # Generate case details
-        case_number = self.fake.case_number()
-        docket_number = self.fake.docket_number()
-        case_types = self.fake.case_types_for_practice_area(practice_area)
+        case_number = self.ids.next('case_number')
+        docket_number = self.ids.next('docket_number')
+        case_types = self.fake.case_types_for_practice_area(practice_area, compiled.get('case_types', ()))
         primary_case_type = case_types[0] if case_types else 'General Legal Matter'
-        case_status = self.fake.case_status()
+        case_status = choose(compiled, 'case_status', self.fake.case_status, rng, 'case_status')
         
         # Generate attorney details
         attorney_bar_number = self.fake.bar_number()
@@ -430,6 +472,7 @@ Total fees to date: ${total_fees_billed:.2f}
         # Create structured record
         record = {
             'case_id': self.fake.uuid4(),
+            'person_index': person['person_index'] if person else None,
             'case_number': case_number,
             'docket_number': docket_number,
             'client_name': client_full_name,
@@ -475,60 +518,11 @@ Total fees to date: ${total_fees_billed:.2f}
             'full_record_text': record_text,
             'pii_findings': pii_findings,
             'pii_count': len(pii_findings),
-            'unique_pii_types': list(set([finding['pii_type'] for finding in pii_findings]))
+            'unique_pii_types': list(dict.fromkeys(finding['pii_type'] for finding in pii_findings))
         }
         
         return record
     
-    def generate_dataset(self, num_records=1000):
-        """Generate a complete legal services dataset"""
-        print(f"Generating {num_records} legal case records...")
-        
-        records = []
-        for i in range(num_records):
-            if (i + 1) % 100 == 0:
-                print(f"Generated {i + 1}/{num_records} records...")
-            
-            record = self.generate_legal_record()
-            records.append(record)
-        
-        return records
-    
-    def save_dataset(self, records, filename_prefix='legal_dataset'):
-        """Save the dataset in multiple formats"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        # Create legal directory if it doesn't exist
-        import os
-        if not os.path.exists('legal'):
-            os.makedirs('legal')
-        
-        # Save as JSON
-        json_filename = f"legal/{filename_prefix}_{timestamp}.json"
-        with open(json_filename, 'w') as f:
-            json.dump(records, f, indent=2, default=str)
-        print(f"Dataset saved as JSON: {json_filename}")
-        
-        # Save as CSV (flattened version)
-        csv_records = []
-        for record in records:
-            csv_record = record.copy()
-            csv_record['pii_findings'] = json.dumps(record['pii_findings'])
-            csv_record['unique_pii_types'] = ', '.join(record['unique_pii_types'])
-            csv_record['case_types'] = ', '.join(record['case_types'])
-            csv_record['credentials'] = ', '.join(record['credentials'])
-            csv_records.append(csv_record)
-        
-        df = pd.DataFrame(csv_records)
-        csv_filename = f"legal/{filename_prefix}_{timestamp}.csv"
-        df.to_csv(csv_filename, index=False)
-        print(f"Dataset saved as CSV: {csv_filename}")
-        
-        # Generate summary statistics
-        self.generate_summary_report(records, f"legal/{filename_prefix}_summary_{timestamp}.txt")
-        
-        return json_filename, csv_filename
-    
     def generate_summary_report(self, records, filename):
         """Generate a comprehensive summary report"""
         pii_type_counts = {}
@@ -1,15 +1,21 @@
 import json
 import re
 import random
-import pandas as pd
 from datetime import datetime, timedelta
-from faker import Faker
+from detection_cache import DetectionCache, PromptAnalysis
+from domain_engine import compile_pii_types
+from lazy_loading import LazyFaker, reseed_fakers
+from prompt_templates import compile_templates
 
 class LegalPromptGenerator:
+    # Faker is only built on first use
+    fake = LazyFaker()
+    # Persistent detection results shared across runs (detection_cache.DetectionStore), if any
+    detection_store = None
+    
     def __init__(self, seed=42):
         """Initialize the legal prompt generator"""
-        self.fake = Faker()
-        Faker.seed(seed)
+        self.seed = seed
         
         # PII type definitions for legal prompts
         self.pii_types = {
@@ -227,58 +233,87 @@ class LegalPromptGenerator:
             "Create templates for routine legal documents",
             "Review and update firm policies annually"
         ]
+        
+        # Templates are parsed once; a prompt generates only the fake fields its template uses
+        self.all_case_types = [case for cases in self.case_types.values() for case in cases]
+        self.fake_fields = self.fake_field_providers()
+        # PII type each field is built to carry (the label detection gives its values), for the coverage planner
+        self.field_pii_types = {
+            **dict.fromkeys(['client_name', 'attorney_name', 'opposing_party', 'opposing_counsel', 'co_defendant',
+                             'emergency_contact'], 'PERSON_NAME'),
+            'case_number': 'CASE_NUMBER',
+            'docket_number': 'DOCKET_NUMBER',
+            'bar_number': 'BAR_NUMBER',
+            'phone': 'PHONE',
+            'email': 'EMAIL',
+            'attorney_email': 'EMAIL',
+            'address': 'ADDRESS',
+            'date': 'DATE_OF_BIRTH',
+            'date_of_birth': 'DATE_OF_BIRTH',
+            'court_jurisdiction': 'COURT_JURISDICTION',
+            'legal_document': 'LEGAL_DOCUMENT',
+            'billing_rate': 'BILLING_RATE',
+            'settlement_amount': 'SETTLEMENT_AMOUNT',
+        }
+        self.compiled_templates = compile_templates(self.pii_prompt_templates, self.fake_fields, self.field_pii_types,
+                                                    id_prefix='pii')
+        self.pii_templates = {template.template_id: template for template in self.compiled_templates}
+        
+        # Detection results by prompt text; the fixed non-PII templates are scanned once
+        self.detection_cache = DetectionCache(self.scan_prompt)
     
-    def generate_fake_legal_data(self):
-        """Generate fake legal data for use in prompts"""
+    def fake_field_providers(self):
+        """Zero-argument providers of the fake legal data the PII templates can reference"""
         return {
-            'client_name': self.fake.name(),
-            'attorney_name': self.fake.name(),
-            'opposing_party': self.fake.name(),
-            'opposing_counsel': self.fake.name(),
-            'co_defendant': self.fake.name(),
-            'emergency_contact': self.fake.name(),
-            'case_number': f"CV-{random.randint(2020, 2024)}-{random.randint(1000, 9999)}",
-            'docket_number': f"DC-{random.randint(100000, 999999)}",
-            'bar_number': f"{random.choice(['NY', 'CA', 'TX', 'FL', 'IL'])}-{random.randint(100000, 999999)}",
-            'phone': self.fake.phone_number(),
-            'email': self.fake.email(),
-            'attorney_email': f"{self.fake.first_name().lower()}.{self.fake.last_name().lower()}@lawfirm.com",
-            'address': self.fake.address().replace('\n', ', '),
-            'date': self.fake.date_between(start_date='today', end_date='+30d').strftime('%m/%d/%Y'),
-            'date_of_birth': self.fake.date_of_birth(minimum_age=18, maximum_age=80).strftime('%m/%d/%Y'),
-            'case_type': random.choice([case for cases in self.case_types.values() for case in cases]),
-            'practice_area': random.choice(self.practice_areas),
-            'court_jurisdiction': random.choice(self.court_jurisdictions),
-            'legal_document': random.choice(self.legal_documents),
-            'billing_rate': f"{random.randint(150, 1000)}.00",
-            'settlement_amount': f"{random.randint(1000, 1000000):,}.00",
-            'hours': random.randint(1, 100),
-            'client_type': random.choice(self.client_types),
-            'case_status': random.choice(self.case_statuses)
+            'client_name': lambda: self.fake.name(),
+            'attorney_name': lambda: self.fake.name(),
+            'opposing_party': lambda: self.fake.name(),
+            'opposing_counsel': lambda: self.fake.name(),
+            'co_defendant': lambda: self.fake.name(),
+            'emergency_contact': lambda: self.fake.name(),
+            'case_number': lambda: f"CV-{random.randint(2020, 2024)}-{random.randint(1000, 9999)}",
+            'docket_number': lambda: f"DC-{random.randint(100000, 999999)}",
+            'bar_number': lambda: f"{random.choice(['NY', 'CA', 'TX', 'FL', 'IL'])}-{random.randint(100000, 999999)}",
+            'phone': lambda: self.fake.phone_number(),
+            'email': lambda: self.fake.email(),
+            'attorney_email': lambda: f"{self.fake.first_name().lower()}.{self.fake.last_name().lower()}@lawfirm.com",
+            'address': lambda: self.fake.address().replace('\n', ', '),
+            'date': lambda: self.fake.date_between(start_date='today', end_date='+30d').strftime('%m/%d/%Y'),
+            'date_of_birth': lambda: self.fake.date_of_birth(minimum_age=18, maximum_age=80).strftime('%m/%d/%Y'),
+            'case_type': lambda: random.choice(self.all_case_types),
+            'practice_area': lambda: random.choice(self.practice_areas),
+            'court_jurisdiction': lambda: random.choice(self.court_jurisdictions),
+            'legal_document': lambda: random.choice(self.legal_documents),
+            'billing_rate': lambda: f"{random.randint(150, 1000)}.00",
+            'settlement_amount': lambda: f"{random.randint(1000, 1000000):,}.00",
+            'hours': lambda: random.randint(1, 100),
+            'client_type': lambda: random.choice(self.client_types),
+            'case_status': lambda: random.choice(self.case_statuses)
         }
     
-    def create_pii_prompt(self):
-        """Create a prompt that contains PII"""
-        template = random.choice(self.pii_prompt_templates)
-        fake_data = self.generate_fake_legal_data()
-        
-        # Fill in the template with fake data
-        try:
-            prompt = template.format(**fake_data)
-        except KeyError as e:
-            # If a key is missing, use a fallback
-            missing_key = str(e).strip("'")
-            fake_data[missing_key] = "PLACEHOLDER"
-            prompt = template.format(**fake_data)
-        
-        return prompt
+    def create_pii_prompt(self, template_id=None):
+        """Create a prompt that contains PII (from ``template_id`` when given); returns (prompt, template_id)"""
+        if template_id is not None:
+            template = self.pii_templates[template_id]
+        else:
+            template = random.choice(self.compiled_templates)
+        return template.fill(), template.template_id
     
-    def create_non_pii_prompt(self):
-        """Create a prompt that does not contain PII"""
-        return random.choice(self.non_pii_prompt_templates)
+    def create_non_pii_prompt(self, template_id=None):
+        """Create a prompt that does not contain PII (from ``template_id`` when given); returns (prompt, template_id)"""
+        if template_id is not None:
+            index = int(template_id.rpartition('-')[2]) - 1
+        else:
+            index = random.randrange(len(self.non_pii_prompt_templates))
+        return self.non_pii_prompt_templates[index], f"nopii-{index + 1}"
     
     def find_pii_in_prompt(self, prompt_text):
         """Find PII types and their indices in a prompt"""
+        if self.detection_store is not None:
+            patterns = compile_pii_types(self.pii_types)
+            return [{'pii_type': pii_type, 'value': prompt_text[start:end], 'start_index': start, 'end_index': end}
+                    for pii_type, start, end in self.detection_store.scan(patterns, prompt_text)]
+        
         pii_findings = []
         
         for pii_type, pattern in self.pii_types.items():
@@ -293,16 +328,24 @@ class LegalPromptGenerator:
         
         return pii_findings
     
-    def verify_pii_presence(self, prompt_text, expected_contains_pii):
-        """Verify that PII detection matches expected result"""
-        pii_findings = self.find_pii_in_prompt(prompt_text)
-        actual_contains_pii = len(pii_findings) > 0
+    def scan_prompt(self, prompt_text):
+        """PromptAnalysis of a prompt (uncached; use analyze_prompt)"""
+        return PromptAnalysis(prompt_text, self.find_pii_in_prompt(prompt_text))
+    
+    def analyze_prompt(self, prompt_text):
+        """PromptAnalysis of a prompt, from the detection cache"""
+        return self.detection_cache.get(prompt_text)
+    
+    def verify_pii_presence(self, prompt_text, expected_contains_pii, analysis=None):
+        """Verify that PII detection matches expected result (reusing ``analysis`` when given)"""
+        analysis = analysis or self.analyze_prompt(prompt_text)
+        actual_contains_pii = analysis.contains_pii
         
         return {
             'matches_expectation': actual_contains_pii == expected_contains_pii,
             'expected': expected_contains_pii,
             'actual': actual_contains_pii,
-            'pii_findings': pii_findings
+            'pii_findings': analysis.pii_findings()
         }
     
     def extract_source_entities(self, prompt_text, pii_findings):
@@ -338,35 +381,46 @@ class LegalPromptGenerator:
         
         return entities
     
-    def generate_prompt_record(self, target_contains_pii=None):
-        """Generate a single prompt record with legal context"""
+    def generate_prompt_record(self, target_contains_pii=None, template_id=None, contexts=None):
+        """Generate a single prompt record with legal context
+        
+        ``template_id`` and ``contexts`` ({context field: value}) fix what is otherwise drawn at random
+        (see template_catalog and coverage_contexts).
+        """
         # Decide if this prompt should contain PII
-        if target_contains_pii is None:
+        if template_id is not None:
+            contains_pii = not template_id.startswith('nopii')
+        elif target_contains_pii is None:
             contains_pii = random.choice([True, False])
         else:
             contains_pii = target_contains_pii
         
         # Generate the appropriate type of prompt
         if contains_pii:
-            prompt_text = self.create_pii_prompt()
+            prompt_text, template_id = self.create_pii_prompt(template_id)
             prompt_category = "Legal Professional Query with PII"
         else:
-            prompt_text = self.create_non_pii_prompt()
+            prompt_text, template_id = self.create_non_pii_prompt(template_id)
             prompt_category = "Legal Professional Query without PII"
         
-        # Find PII in the prompt
-        pii_findings = self.find_pii_in_prompt(prompt_text)
-        actual_contains_pii = len(pii_findings) > 0
+        # Find PII in the prompt (one cached analysis serves every step below)
+        analysis = self.analyze_prompt(prompt_text)
+        pii_findings = analysis.pii_findings()
+        actual_contains_pii = analysis.contains_pii
         
         # Verify PII detection
-        verification = self.verify_pii_presence(prompt_text, contains_pii)
+        verification = self.verify_pii_presence(prompt_text, contains_pii, analysis)
         
         # Extract source entities
         source_entities = self.extract_source_entities(prompt_text, pii_findings)
         
         # Determine professional context
-        role_context = random.choice(self.legal_roles)
-        practice_area_context = random.choice(self.practice_areas)
+        if contexts is not None:
+            role_context = contexts['role_context']
+            practice_area_context = contexts['practice_area_context']
+        else:
+            role_context = random.choice(self.legal_roles)
+            practice_area_context = random.choice(self.practice_areas)
         
         # Create record
         record = {
@@ -376,11 +430,12 @@ class LegalPromptGenerator:
             'intended_pii': contains_pii,
             'verification_passed': verification['matches_expectation'],
             'prompt_category': prompt_category,
+            'template_id': template_id,
             'role_context': role_context,
             'practice_area_context': practice_area_context,
             'pii_findings': pii_findings,
             'pii_count': len(pii_findings),
-            'unique_pii_types': list(set([finding['pii_type'] for finding in pii_findings])),
+            'unique_pii_types': list(dict.fromkeys(finding['pii_type'] for finding in pii_findings)),
             'source_entities': source_entities,
             'entity_count': len(source_entities),
             'prompt_length': len(prompt_text),
@@ -389,41 +444,73 @@ class LegalPromptGenerator:
         
         return record
     
+    def reseed(self, seed, row_offset=0):
+        """Restart the generator's random streams from ``seed`` (one chunk of a parallel run, see pipeline.py)
+        
+        ``row_offset`` is unused: these prompts are not filled from source rows.
+        """
+        reseed_fakers(self, seed)
+        random.seed(seed)
+    
+    def generate_prompt_records(self, contains_pii, count, start=0, progress=False):
+        """Generate ``count`` prompt records with or without PII
+        
+        ``start`` only offsets the progress count; legal prompts are numbered
+        after the shuffle (finalize_dataset).
+        """
+        records = []
+        for i in range(start, start + count):
+            if progress and (i + 1) % 100 == 0:
+                print(f"Generated {i + 1}/{start + count} {'PII' if contains_pii else 'non-PII'} prompts...")
+            
+            records.append(self.generate_prompt_record(target_contains_pii=contains_pii))
+        return records
+    
+    def template_catalog(self):
+        """Templates the coverage planner allocates prompts to (see coverage.py), all equally weighted"""
+        return ([{'template_id': template.template_id, 'contains_pii': True, 'pii_types': template.pii_types,
+                  'weight': 1.0} for template in self.compiled_templates]
+                + [{'template_id': f"nopii-{index}", 'contains_pii': False, 'pii_types': [], 'weight': 1.0}
+                   for index in range(1, len(self.non_pii_prompt_templates) + 1)])
+    
+    def coverage_contexts(self):
+        """Record context fields the coverage planner balances, with their values"""
+        return {'role_context': self.legal_roles, 'practice_area_context': self.practice_areas}
+    
+    def generate_planned_records(self, slots):
+        """Prompt records of coverage plan slots ((position, number, template_id, contexts), see coverage.py)"""
+        records = []
+        for position, number, template_id, contexts in slots:
+            record = self.generate_prompt_record(template_id=template_id, contexts=contexts)
+            record['prompt_number'] = position + 1
+            records.append(record)
+        return records
+    
+    def finalize_dataset(self, records, rng=random):
+        """Shuffle the records with ``rng`` and add final numbering"""
+        rng.shuffle(records)
+        for i, record in enumerate(records):
+            record['prompt_number'] = i + 1
+        return records
+    
     def generate_dataset(self, num_prompts=1000, pii_ratio=0.5):
         """Generate a complete legal prompt dataset"""
         print(f"Generating {num_prompts} legal professional prompts...")
         print(f"Target PII ratio: {pii_ratio*100}% with PII, {(1-pii_ratio)*100}% without PII")
         
-        records = []
         num_pii_prompts = int(num_prompts * pii_ratio)
         num_non_pii_prompts = num_prompts - num_pii_prompts
         
         # Generate PII-containing prompts
         print(f"Generating {num_pii_prompts} prompts with PII...")
-        for i in range(num_pii_prompts):
-            if (i + 1) % 100 == 0:
-                print(f"Generated {i + 1}/{num_pii_prompts} PII prompts...")
-            
-            record = self.generate_prompt_record(target_contains_pii=True)
-            records.append(record)
+        records = self.generate_prompt_records(True, num_pii_prompts, progress=True)
         
         # Generate non-PII prompts
         print(f"Generating {num_non_pii_prompts} prompts without PII...")
-        for i in range(num_non_pii_prompts):
-            if (i + 1) % 100 == 0:
-                print(f"Generated {i + 1}/{num_non_pii_prompts} non-PII prompts...")
-            
-            record = self.generate_prompt_record(target_contains_pii=False)
-            records.append(record)
-        
-        # Shuffle the records
-        random.shuffle(records)
+        records.extend(self.generate_prompt_records(False, num_non_pii_prompts, progress=True))
         
-        # Add final numbering
-        for i, record in enumerate(records):
-            record['prompt_number'] = i + 1
-        
-        return records
+        # Shuffle the records and add final numbering
+        return self.finalize_dataset(records)
     
     def save_dataset(self, records, filename_prefix='employer_prompts_legal'):
         """Save the prompt dataset in multiple formats"""
@@ -449,6 +536,7 @@ class LegalPromptGenerator:
             csv_record['source_entities'] = json.dumps(record['source_entities'])
             csv_records.append(csv_record)
         
+        import pandas as pd
         df = pd.DataFrame(csv_records)
         csv_filename = f"prompts_for_llm/{filename_prefix}_{timestamp}.csv"
         df.to_csv(csv_filename, index=False)
@@ -1,22 +1,38 @@
-import pandas as pd
 import random
 import json
 from datetime import datetime
-from faker import Faker
 import re
+from detection_cache import DetectionCache
+from lazy_loading import LazyFaker, reseed_fakers
+from prompt_templates import PromptTemplate, compile_templates
+from row_sampling import EntityTable, RowSampler, SourceRows, source_value
 
 class MedicalPromptGenerator:
     """Generate realistic medical/healthcare employer prompts for LLM with PII detection labels"""
     
-    def __init__(self, csv_file_path):
-        """Initialize with medical dataset"""
-        self.fake = Faker()
-        Faker.seed(42)
+    # Faker is only built on first use
+    fake = LazyFaker()
+    
+    def __init__(self, csv_file_path=None, seed=42, row_sampling='random', records=None):
+        """Initialize with medical dataset (no dataset is loaded when neither csv_file_path nor records is given)
+        
+        ``records`` are patient records straight from MedicalDatasetGenerator (a list or
+        any iterable of dicts, read once) in place of the CSV, or the entity
+        table of another MedicalPromptGenerator (its ``entities``), shared as is.
+        ``row_sampling`` is 'random' (rows drawn with replacement) or 'permutation'
+        (every row used once before any repeats), see row_sampling.py
+        """
+        if csv_file_path is not None and records is not None:
+            raise ValueError("Pass either csv_file_path or records, not both")
+        self.seed = seed
+        self.df = None
         
         # Load the medical dataset
-        print(f"Loading medical dataset from {csv_file_path}...")
-        self.df = pd.read_csv(csv_file_path)
-        print(f"Loaded {len(self.df)} patient records")
+        if csv_file_path is not None:
+            print(f"Loading medical dataset from {csv_file_path}...")
+            import pandas as pd
+            self.df = pd.read_csv(csv_file_path)
+            print(f"Loaded {len(self.df)} patient records")
         
         # Define prompt templates with PII (True cases) - Single Patient
         self.single_patient_templates = [
@@ -183,9 +199,75 @@ class MedicalPromptGenerator:
             "What emergency preparedness plans do we need for natural disasters?",
             "How should we address social determinants of health in our programs?"
         ]
+        
+        # PII type of each entity field a template can substitute; the prompt's
+        # findings are recorded from these slots while it is filled
+        self.field_pii_types = {
+            'record_id': 'RECORD_ID',
+            'patient_name': 'PERSON_NAME',
+            'provider_name': 'PERSON_NAME',
+            'emergency_contact_name': 'PERSON_NAME',
+            'ssn': 'SSN',
+            'date_of_birth': 'DATE_OF_BIRTH',
+            'address': 'ADDRESS',
+            'phone': 'PHONE',
+            'emergency_contact_phone': 'PHONE',
+            'email': 'EMAIL',
+            'provider_email': 'EMAIL',
+            'medical_record_number': 'MEDICAL_RECORD_NUMBER',
+            'insurance_id': 'INSURANCE_ID',
+            'insurance_provider': 'INSURANCE_PROVIDER',
+            'blood_type': 'BLOOD_TYPE',
+            'ethnicity': 'ETHNICITY',
+            'medication': 'MEDICATION_NAME',
+            'diagnosis_code': 'DIAGNOSIS_CODE',
+            'department': 'DEPARTMENT',
+            'condition_severity': 'SEVERITY_LEVEL',
+            'allergies': 'ALLERGY',
+            'emergency_contact_relationship': 'RELATIONSHIP',
+        }
+        
+        # Templates are parsed once and rendered slot by slot
+        self.compiled_single_templates = compile_templates(self.single_patient_templates,
+                                                           field_types=self.field_pii_types, id_prefix='single')
+        self.compiled_multi_templates = compile_templates(self.multi_patient_templates,
+                                                          field_types=self.field_pii_types, id_prefix='multi')
+        self.single_fallback_template = PromptTemplate(
+            "Review the medical record for patient {patient_name} (MRN: {medical_record_number})",
+            field_types=self.field_pii_types, template_id='single-fallback')
+        self.multi_fallback_template = PromptTemplate(
+            "Compare medical records for {patient_name_1} (MRN: {medical_record_number_1}) and {patient_name_2} (MRN: {medical_record_number_2})",
+            field_types=self.field_pii_types, template_id='multi-fallback')
+        self.pii_templates = {template.template_id: template
+                              for template in self.compiled_single_templates + self.compiled_multi_templates}
+        
+        # Patterns of the has_pii_content double check, and its results by prompt text
+        # (the fixed non-PII templates are scanned once)
+        self.verification_patterns = [re.compile(pattern) for pattern in [
+            r'\b\d{3}-\d{2}-\d{4}\b',  # SSN
+            r'MRN-\d{6}',  # Medical Record Number
+            r'INS-\d{7}',  # Insurance ID
+            r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',  # Email
+            r'\b\d{3}-\d{3}-\d{4}\b',  # Phone
+            r'\b[A-Z][a-z]+ [A-Z][a-z]+\b',  # Names (basic pattern)
+        ]]
+        self.detection_cache = DetectionCache(self.scan_pii_content)
+        
+        # Source rows are cleaned into template-ready entities once; positions are drawn in seeded batches
+        self.entities = None
+        if isinstance(records, EntityTable):
+            self.entities = records
+        elif records is not None:
+            self.entities = EntityTable(records, self.extract_patient_data)
+            print(f"Loaded {len(self.entities)} patient records")
+        elif self.df is not None:
+            self.entities = EntityTable(SourceRows(self.df), self.extract_patient_data)
+        if self.entities is not None:
+            self.row_sampler = RowSampler(len(self.entities), seed, row_sampling)
     
     def extract_patient_data(self, row):
-        """Extract clean patient data from a dataframe row"""
+        """Extract clean patient data from a source row (called once per row, see EntityTable)"""
+        allergies = source_value(row['allergies'], 'None')
         return {
             'record_id': row['record_id'],
             'patient_name': row['patient_name'],
@@ -213,15 +295,21 @@ class MedicalPromptGenerator:
             'diagnosis_code': row['diagnosis_code'],
             'condition_severity': row['condition_severity'],
             'medication': row['medication'],
-            'allergies': row['allergies'] if pd.notna(row['allergies']) and row['allergies'] != '[]' else 'None',
+            'allergies': allergies if allergies != '[]' else 'None',
             'emergency_contact_name': row['emergency_contact_name'],
             'emergency_contact_relationship': row['emergency_contact_relationship'],
             'emergency_contact_phone': row['emergency_contact_phone'],
             'emergency_contact_email': row['emergency_contact_email'],
         }
     
-    def generate_pii_prompt(self):
-        """Generate a prompt containing PII data"""
+    def generate_pii_prompt(self, template_id=None):
+        """Generate a prompt containing PII data (from the template ``template_id`` when given)"""
+        if template_id is not None:
+            template = self.pii_templates[template_id]
+            if template_id.startswith('multi'):
+                return self.generate_multi_patient_prompt(template)
+            return self.generate_single_patient_prompt(template)
+        
         # Randomly choose between single and multi-patient templates (70% single, 30% multi)
         use_multi_patient = random.random() < 0.3
         
@@ -230,134 +318,175 @@ class MedicalPromptGenerator:
         else:
             return self.generate_single_patient_prompt()
     
-    def generate_single_patient_prompt(self):
+    def generate_single_patient_prompt(self, template=None):
         """Generate a prompt with one patient's PII"""
         # Select random patient record
-        random_row = self.df.sample(n=1).iloc[0]
-        patient_data = self.extract_patient_data(random_row)
+        patient_data = self.entities[self.row_sampler.next()]
         
         # Select random single-patient template
-        template = random.choice(self.single_patient_templates)
+        if template is None:
+            template = random.choice(self.compiled_single_templates)
         
-        # Fill template with patient data
+        # Fill template with patient data, recording the PII slots as findings
         try:
-            prompt = template.format(**patient_data)
-            return prompt, True, [patient_data['record_id']]
+            prompt, pii_findings = template.render(patient_data)
         except KeyError as e:
             # Fallback if template has missing field
-            fallback_template = "Review the medical record for patient {patient_name} (MRN: {medical_record_number})"
-            prompt = fallback_template.format(**patient_data)
-            return prompt, True, [patient_data['record_id']]
+            template = self.single_fallback_template
+            prompt, pii_findings = template.render(patient_data)
+        return prompt, True, [patient_data['record_id']], pii_findings, template.template_id
     
-    def generate_multi_patient_prompt(self):
+    def generate_multi_patient_prompt(self, template=None):
         """Generate a prompt with multiple patients' PII"""
         # Select two random patient records
-        random_rows = self.df.sample(n=2)
-        patient_1 = self.extract_patient_data(random_rows.iloc[0])
-        patient_2 = self.extract_patient_data(random_rows.iloc[1])
-        
-        # Create combined data with _1 and _2 suffixes
-        combined_data = {}
-        for key, value in patient_1.items():
-            combined_data[f"{key}_1"] = value
-        for key, value in patient_2.items():
-            combined_data[f"{key}_2"] = value
+        positions = self.row_sampler.distinct(2)
+        combined_data = self.entities.suffixed(positions)
+        source_ids = [self.entities[position]['record_id'] for position in positions]
         
         # Select random multi-patient template
-        template = random.choice(self.multi_patient_templates)
+        if template is None:
+            template = random.choice(self.compiled_multi_templates)
         
-        # Fill template with combined patient data
+        # Fill template with combined patient data, recording the PII slots as findings
         try:
-            prompt = template.format(**combined_data)
-            return prompt, True, [patient_1['record_id'], patient_2['record_id']]
+            prompt, pii_findings = template.render(combined_data)
         except KeyError as e:
             # Fallback if template has missing field
-            fallback_template = "Compare medical records for {patient_name_1} (MRN: {medical_record_number_1}) and {patient_name_2} (MRN: {medical_record_number_2})"
-            prompt = fallback_template.format(**combined_data)
-            return prompt, True, [patient_1['record_id'], patient_2['record_id']]
+            template = self.multi_fallback_template
+            prompt, pii_findings = template.render(combined_data)
+        return prompt, True, source_ids, pii_findings, template.template_id
     
-    def generate_non_pii_prompt(self):
-        """Generate a prompt without PII data"""
-        template = random.choice(self.non_pii_prompt_templates)
-        return template, False, None
+    def generate_non_pii_prompt(self, template_id=None):
+        """Generate a prompt without PII data (from the template ``template_id`` when given)"""
+        if template_id is not None:
+            index = int(template_id.rpartition('-')[2]) - 1
+        else:
+            index = random.randrange(len(self.non_pii_prompt_templates))
+        return self.non_pii_prompt_templates[index], False, None, [], f"nopii-{index + 1}"
     
     def has_pii_content(self, prompt):
-        """Double-check if prompt actually contains PII"""
-        pii_patterns = [
-            r'\b\d{3}-\d{2}-\d{4}\b',  # SSN
-            r'MRN-\d{6}',  # Medical Record Number
-            r'INS-\d{7}',  # Insurance ID
-            r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',  # Email
-            r'\b\d{3}-\d{3}-\d{4}\b',  # Phone
-            r'\b[A-Z][a-z]+ [A-Z][a-z]+\b',  # Names (basic pattern)
-        ]
-        
-        for pattern in pii_patterns:
-            if re.search(pattern, prompt):
-                return True
-        return False
+        """Double-check if prompt actually contains PII (cached by prompt text)"""
+        return self.detection_cache.get(prompt)
     
-    def generate_dataset(self, total_prompts=1000, pii_ratio=0.5):
-        """Generate the complete medical prompt dataset"""
-        print(f"Generating {total_prompts} medical employer prompts...")
+    def scan_pii_content(self, prompt):
+        """Whether any of the verification patterns matches the prompt (uncached)"""
+        return any(pattern.search(prompt) for pattern in self.verification_patterns)
+    
+    def reseed(self, seed, row_offset=0):
+        """Restart the generator's random streams from ``seed`` (one chunk of a parallel run, see pipeline.py)
         
-        dataset = []
-        pii_prompts_target = int(total_prompts * pii_ratio)
-        non_pii_prompts_target = total_prompts - pii_prompts_target
+        In 'permutation' row sampling the rows are read on from draw ``row_offset`` of the run's permutations.
+        """
+        reseed_fakers(self, seed)
+        random.seed(seed)
+        if self.entities is not None:
+            self.row_sampler.restart(seed, row_offset)
+    
+    def generate_prompt_record(self, contains_pii, number, template_id=None):
+        """Generate one prompt record, numbered ``number`` among the prompts with or without PII
         
-        # Generate PII prompts
-        print(f"Generating {pii_prompts_target} prompts with PII...")
-        for i in range(pii_prompts_target):
-            if (i + 1) % 100 == 0:
-                print(f"  Generated {i + 1}/{pii_prompts_target} PII prompts...")
-            
-            prompt, contains_pii, patient_ids = self.generate_pii_prompt()
-            
-            # Verify it actually contains PII
-            verified_pii = self.has_pii_content(prompt)
-            
+        ``template_id`` fixes the template (see template_catalog); by default it is drawn at random.
+        """
+        if contains_pii:
+            prompt, contains_pii_flag, patient_ids, pii_findings, template_id = self.generate_pii_prompt(template_id)
             record = {
-                'prompt_id': f"pii_{i+1:04d}",
+                'prompt_id': f"pii_{number:04d}",
                 'prompt': prompt,
-                'contains_pii': contains_pii,
-                'verified_pii': verified_pii,
+                'contains_pii': contains_pii_flag,
+                # Verify it actually contains PII
+                'verified_pii': self.has_pii_content(prompt),
                 'prompt_type': 'with_pii',
+                'template_id': template_id,
                 'source_patient_id': patient_ids,
-                'num_patients': len(patient_ids)
+                'num_patients': len(patient_ids),
+                'pii_findings': pii_findings,
+                'pii_count': len(pii_findings),
+                'unique_pii_types': list(dict.fromkeys(finding['pii_type'] for finding in pii_findings))
             }
-            dataset.append(record)
-        
-        # Generate non-PII prompts
-        print(f"Generating {non_pii_prompts_target} prompts without PII...")
-        for i in range(non_pii_prompts_target):
-            if (i + 1) % 100 == 0:
-                print(f"  Generated {i + 1}/{non_pii_prompts_target} non-PII prompts...")
-            
-            prompt, contains_pii, patient_data = self.generate_non_pii_prompt()
-            
-            # Verify it doesn't contain PII
-            verified_pii = self.has_pii_content(prompt)
-            
+        else:
+            prompt, contains_pii_flag, patient_data, pii_findings, template_id = self.generate_non_pii_prompt(template_id)
             record = {
-                'prompt_id': f"nopii_{i+1:04d}",
+                'prompt_id': f"nopii_{number:04d}",
                 'prompt': prompt,
-                'contains_pii': contains_pii,
-                'verified_pii': verified_pii,
+                'contains_pii': contains_pii_flag,
+                # Verify it doesn't contain PII
+                'verified_pii': self.has_pii_content(prompt),
                 'prompt_type': 'without_pii',
+                'template_id': template_id,
                 'source_patient_id': [],
-                'num_patients': 0
+                'num_patients': 0,
+                'pii_findings': [],
+                'pii_count': 0,
+                'unique_pii_types': []
             }
-            dataset.append(record)
-        
-        # Shuffle the dataset
-        random.shuffle(dataset)
+        return record
+    
+    def generate_prompt_records(self, contains_pii, count, start=0, progress=False):
+        """Generate ``count`` prompt records with or without PII, numbered from ``start``"""
+        records = []
+        for i in range(start, start + count):
+            if progress and (i + 1) % 100 == 0:
+                print(f"  Generated {i + 1}/{start + count} {'PII' if contains_pii else 'non-PII'} prompts...")
+            
+            records.append(self.generate_prompt_record(contains_pii, i + 1))
+        return records
+    
+    def template_catalog(self):
+        """Templates the coverage planner allocates prompts to (see coverage.py)
         
-        # Add final indices
+        Weights follow the random choice: 70% single-patient and 30% multi-patient PII prompts.
+        ``source_rows`` is the number of row positions a prompt of the template draws.
+        """
+        num_rows = len(self.entities) if self.entities is not None else 2
+        catalog = []
+        for templates, share, rows in ((self.compiled_single_templates, 0.7, 1),
+                                       (self.compiled_multi_templates, 0.3, min(2, num_rows))):
+            catalog.extend({'template_id': template.template_id, 'contains_pii': True,
+                            'pii_types': template.pii_types, 'weight': share / len(templates), 'source_rows': rows}
+                           for template in templates)
+        catalog.extend({'template_id': f"nopii-{index}", 'contains_pii': False, 'pii_types': [], 'weight': 1.0,
+                        'source_rows': 0}
+                       for index in range(1, len(self.non_pii_prompt_templates) + 1))
+        return catalog
+    
+    def coverage_contexts(self):
+        """Record context fields the coverage planner balances (patient prompts have none)"""
+        return {}
+    
+    def generate_planned_records(self, slots):
+        """Prompt records of coverage plan slots ((position, number, template_id, contexts), see coverage.py)"""
+        records = []
+        for position, number, template_id, contexts in slots:
+            record = self.generate_prompt_record(not template_id.startswith('nopii'), number, template_id)
+            record['final_index'] = position + 1
+            records.append(record)
+        return records
+    
+    def finalize_dataset(self, dataset, rng=random):
+        """Shuffle the dataset with ``rng`` and add final indices"""
+        rng.shuffle(dataset)
         for i, record in enumerate(dataset):
             record['final_index'] = i + 1
-        
         return dataset
     
+    def generate_dataset(self, total_prompts=1000, pii_ratio=0.5):
+        """Generate the complete medical prompt dataset"""
+        print(f"Generating {total_prompts} medical employer prompts...")
+        
+        pii_prompts_target = int(total_prompts * pii_ratio)
+        non_pii_prompts_target = total_prompts - pii_prompts_target
+        
+        # Generate PII prompts
+        print(f"Generating {pii_prompts_target} prompts with PII...")
+        dataset = self.generate_prompt_records(True, pii_prompts_target, progress=True)
+        
+        # Generate non-PII prompts
+        print(f"Generating {non_pii_prompts_target} prompts without PII...")
+        dataset.extend(self.generate_prompt_records(False, non_pii_prompts_target, progress=True))
+        
+        # Shuffle the dataset and add final indices
+        return self.finalize_dataset(dataset)
+    
     def save_dataset(self, dataset, filename_prefix='employer_prompts_medical'):
         """Save the medical prompt dataset"""
         
@@ -367,8 +496,16 @@ class MedicalPromptGenerator:
             json.dump(dataset, f, indent=2)
         print(f"Dataset saved as JSON: {json_filename}")
         
-        # Save as CSV
-        df = pd.DataFrame(dataset)
+        # Save as CSV (flattened version)
+        csv_records = []
+        for record in dataset:
+            csv_record = record.copy()
+            csv_record['pii_findings'] = json.dumps(record['pii_findings'])
+            csv_record['unique_pii_types'] = ', '.join(record['unique_pii_types'])
+            csv_records.append(csv_record)
+        
+        import pandas as pd
+        df = pd.DataFrame(csv_records)
         csv_filename = f"{filename_prefix}.csv"
         df.to_csv(csv_filename, index=False)
         print(f"Dataset saved as CSV: {csv_filename}")
@@ -1,22 +1,38 @@
-import pandas as pd
 import random
 import json
 from datetime import datetime
-from faker import Faker
 import re
+from detection_cache import DetectionCache
+from lazy_loading import LazyFaker, reseed_fakers
+from prompt_templates import PromptTemplate, compile_templates
+from row_sampling import EntityTable, RowSampler, SourceRows, source_value
 
 class EmployerPromptGenerator:
     """Generate realistic employer prompts for LLM with PII detection labels"""
     
-    def __init__(self, csv_file_path):
-        """Initialize with financial dataset"""
-        self.fake = Faker()
-        Faker.seed(42)
+    # Faker is only built on first use
+    fake = LazyFaker()
+    
+    def __init__(self, csv_file_path=None, seed=42, row_sampling='random', records=None):
+        """Initialize with financial dataset (no dataset is loaded when neither csv_file_path nor records is given)
+        
+        ``records`` are customer records straight from FinancialDatasetGenerator (a list or
+        any iterable of dicts, read once) in place of the CSV, or the entity
+        table of another EmployerPromptGenerator (its ``entities``), shared as is.
+        ``row_sampling`` is 'random' (rows drawn with replacement) or 'permutation'
+        (every row used once before any repeats), see row_sampling.py
+        """
+        if csv_file_path is not None and records is not None:
+            raise ValueError("Pass either csv_file_path or records, not both")
+        self.seed = seed
+        self.df = None
         
         # Load the financial dataset
-        print(f"Loading financial dataset from {csv_file_path}...")
-        self.df = pd.read_csv(csv_file_path)
-        print(f"Loaded {len(self.df)} customer records")
+        if csv_file_path is not None:
+            print(f"Loading financial dataset from {csv_file_path}...")
+            import pandas as pd
+            self.df = pd.read_csv(csv_file_path)
+            print(f"Loaded {len(self.df)} customer records")
         
         # Define prompt templates with PII (True cases) - Single Customer
         self.single_customer_templates = [
@@ -180,9 +196,67 @@ class EmployerPromptGenerator:
             "What technology investments should we prioritize?",
             "How can we improve operational efficiency across departments?"
         ]
+        
+        # PII type of each entity field a template can substitute; the prompt's
+        # findings are recorded from these slots while it is filled
+        self.field_pii_types = {
+            'customer_id': 'CUSTOMER_ID',
+            'customer_name': 'PERSON_NAME',
+            'ssn': 'SSN',
+            'date_of_birth': 'DATE_OF_BIRTH',
+            'address': 'ADDRESS',
+            'phone': 'PHONE',
+            'email': 'EMAIL',
+            'account_number': 'ACCOUNT_NUMBER',
+            'income_bracket': 'INCOME_BRACKET',
+            'credit_score_category': 'CREDIT_SCORE',
+            'employment_sector': 'EMPLOYMENT_SECTOR',
+            'customer_segment': 'CUSTOMER_SEGMENT',
+            'primary_account_type': 'ACCOUNT_TYPE',
+            'account_types': 'ACCOUNT_TYPE',
+            'bank_branch': 'BANK_BRANCH',
+            'recent_transaction_amount': 'TRANSACTION_AMOUNT',
+        }
+        
+        # Templates are parsed once and rendered slot by slot
+        self.compiled_single_templates = compile_templates(self.single_customer_templates,
+                                                           field_types=self.field_pii_types, id_prefix='single')
+        self.compiled_multi_templates = compile_templates(self.multi_customer_templates,
+                                                          field_types=self.field_pii_types, id_prefix='multi')
+        self.single_fallback_template = PromptTemplate(
+            "Analyze the account for customer {customer_name} (SSN: {ssn})",
+            field_types=self.field_pii_types, template_id='single-fallback')
+        self.multi_fallback_template = PromptTemplate(
+            "Compare accounts for {customer_name_1} (SSN: {ssn_1}) and {customer_name_2} (SSN: {ssn_2})",
+            field_types=self.field_pii_types, template_id='multi-fallback')
+        self.pii_templates = {template.template_id: template
+                              for template in self.compiled_single_templates + self.compiled_multi_templates}
+        
+        # Patterns of the has_pii_content double check, and its results by prompt text
+        # (the fixed non-PII templates are scanned once)
+        self.verification_patterns = [re.compile(pattern) for pattern in [
+            r'\b\d{3}-\d{2}-\d{4}\b',  # SSN
+            r'\b\d{9,12}\b',  # Account numbers
+            r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',  # Email
+            r'\b\d{3}-\d{3}-\d{4}\b',  # Phone
+            r'\b[A-Z][a-z]+ [A-Z][a-z]+\b',  # Names (basic pattern)
+        ]]
+        self.detection_cache = DetectionCache(self.scan_pii_content)
+        
+        # Source rows are cleaned into template-ready entities once; positions are drawn in seeded batches
+        self.entities = None
+        if isinstance(records, EntityTable):
+            self.entities = records
+        elif records is not None:
+            self.entities = EntityTable(records, self.extract_customer_data)
+            print(f"Loaded {len(self.entities)} customer records")
+        elif self.df is not None:
+            self.entities = EntityTable(SourceRows(self.df), self.extract_customer_data)
+        if self.entities is not None:
+            self.row_sampler = RowSampler(len(self.entities), seed, row_sampling)
     
     def extract_customer_data(self, row):
-        """Extract clean customer data from a dataframe row"""
+        """Extract clean customer data from a source row (called once per row, see EntityTable)"""
         return {
             'customer_id': row['customer_id'],
             'customer_name': row['customer_name'],
@@ -202,23 +276,29 @@ class EmployerPromptGenerator:
             'relationship_length': row['relationship_length'],
             'region': row['region'],
             'bank_branch': row['bank_branch'],
-            'account_types': row['account_types'],
+            'account_types': source_value(row['account_types']),
             'primary_account_type': row['primary_account_type'],
             'account_number': row['account_number'],
             'routing_number': row['routing_number'],
-            'credit_card_number': row['credit_card_number'] if pd.notna(row['credit_card_number']) else 'Not Available',
+            'credit_card_number': source_value(row['credit_card_number']),
             'recent_transaction_type': row['recent_transaction_type'],
             'recent_transaction_amount': row['recent_transaction_amount'],
             'recent_transaction_date': row['recent_transaction_date'],
-            'investment_product': row['investment_product'] if pd.notna(row['investment_product']) else 'Not Available',
-            'loan_purpose': row['loan_purpose'] if pd.notna(row['loan_purpose']) else 'Not Available',
-            'loan_amount': row['loan_amount'] if pd.notna(row['loan_amount']) else 'Not Available',
+            'investment_product': source_value(row['investment_product']),
+            'loan_purpose': source_value(row['loan_purpose']),
+            'loan_amount': source_value(row['loan_amount']),
             'advisor_name': row['advisor_name'],
             'advisor_email': row['advisor_email'],
         }
     
-    def generate_pii_prompt(self):
-        """Generate a prompt containing PII data"""
+    def generate_pii_prompt(self, template_id=None):
+        """Generate a prompt containing PII data (from the template ``template_id`` when given)"""
+        if template_id is not None:
+            template = self.pii_templates[template_id]
+            if template_id.startswith('multi'):
+                return self.generate_multi_customer_prompt(template)
+            return self.generate_single_customer_prompt(template)
+        
         # Randomly choose between single and multi-customer templates (70% single, 30% multi)
         use_multi_customer = random.random() < 0.3
         
@@ -227,133 +307,175 @@ class EmployerPromptGenerator:
         else:
             return self.generate_single_customer_prompt()
     
-    def generate_single_customer_prompt(self):
+    def generate_single_customer_prompt(self, template=None):
         """Generate a prompt with one customer's PII"""
         # Select random customer record
-        random_row = self.df.sample(n=1).iloc[0]
-        customer_data = self.extract_customer_data(random_row)
+        customer_data = self.entities[self.row_sampler.next()]
         
         # Select random single-customer template
-        template = random.choice(self.single_customer_templates)
+        if template is None:
+            template = random.choice(self.compiled_single_templates)
         
-        # Fill template with customer data
+        # Fill template with customer data, recording the PII slots as findings
         try:
-            prompt = template.format(**customer_data)
-            return prompt, True, [customer_data['customer_id']]
+            prompt, pii_findings = template.render(customer_data)
         except KeyError as e:
             # Fallback if template has missing field
-            fallback_template = "Analyze the account for customer {customer_name} (SSN: {ssn})"
-            prompt = fallback_template.format(**customer_data)
-            return prompt, True, [customer_data['customer_id']]
+            template = self.single_fallback_template
+            prompt, pii_findings = template.render(customer_data)
+        return prompt, True, [customer_data['customer_id']], pii_findings, template.template_id
     
-    def generate_multi_customer_prompt(self):
+    def generate_multi_customer_prompt(self, template=None):
         """Generate a prompt with multiple customers' PII"""
         # Select two random customer records
-        random_rows = self.df.sample(n=2)
-        customer_1 = self.extract_customer_data(random_rows.iloc[0])
-        customer_2 = self.extract_customer_data(random_rows.iloc[1])
-        
-        # Create combined data with _1 and _2 suffixes
-        combined_data = {}
-        for key, value in customer_1.items():
-            combined_data[f"{key}_1"] = value
-        for key, value in customer_2.items():
-            combined_data[f"{key}_2"] = value
+        positions = self.row_sampler.distinct(2)
+        combined_data = self.entities.suffixed(positions)
+        source_ids = [self.entities[position]['customer_id'] for position in positions]
         
         # Select random multi-customer template
-        template = random.choice(self.multi_customer_templates)
+        if template is None:
+            template = random.choice(self.compiled_multi_templates)
         
-        # Fill template with combined customer data
+        # Fill template with combined customer data, recording the PII slots as findings
         try:
-            prompt = template.format(**combined_data)
-            return prompt, True, [customer_1['customer_id'], customer_2['customer_id']]
+            prompt, pii_findings = template.render(combined_data)
         except KeyError as e:
             # Fallback if template has missing field
-            fallback_template = "Compare accounts for {customer_name_1} (SSN: {ssn_1}) and {customer_name_2} (SSN: {ssn_2})"
-            prompt = fallback_template.format(**combined_data)
-            return prompt, True, [customer_1['customer_id'], customer_2['customer_id']]
+            template = self.multi_fallback_template
+            prompt, pii_findings = template.render(combined_data)
+        return prompt, True, source_ids, pii_findings, template.template_id
     
-    def generate_non_pii_prompt(self):
-        """Generate a prompt without PII data"""
-        template = random.choice(self.non_pii_prompt_templates)
-        return template, False, None
+    def generate_non_pii_prompt(self, template_id=None):
+        """Generate a prompt without PII data (from the template ``template_id`` when given)"""
+        if template_id is not None:
+            index = int(template_id.rpartition('-')[2]) - 1
+        else:
+            index = random.randrange(len(self.non_pii_prompt_templates))
+        return self.non_pii_prompt_templates[index], False, None, [], f"nopii-{index + 1}"
     
     def has_pii_content(self, prompt):
-        """Double-check if prompt actually contains PII"""
-        pii_patterns = [
-            r'\b\d{3}-\d{2}-\d{4}\b',  # SSN
-            r'\b\d{9,12}\b',  # Account numbers
-            r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',  # Email
-            r'\b\d{3}-\d{3}-\d{4}\b',  # Phone
-            r'\b[A-Z][a-z]+ [A-Z][a-z]+\b',  # Names (basic pattern)
-        ]
-        
-        for pattern in pii_patterns:
-            if re.search(pattern, prompt):
-                return True
-        return False
+        """Double-check if prompt actually contains PII (cached by prompt text)"""
+        return self.detection_cache.get(prompt)
     
-    def generate_dataset(self, total_prompts=1000, pii_ratio=0.5):
-        """Generate the complete prompt dataset"""
-        print(f"Generating {total_prompts} employer prompts...")
+    def scan_pii_content(self, prompt):
+        """Whether any of the verification patterns matches the prompt (uncached)"""
+        return any(pattern.search(prompt) for pattern in self.verification_patterns)
+    
+    def reseed(self, seed, row_offset=0):
+        """Restart the generator's random streams from ``seed`` (one chunk of a parallel run, see pipeline.py)
         
-        dataset = []
-        pii_prompts_target = int(total_prompts * pii_ratio)
-        non_pii_prompts_target = total_prompts - pii_prompts_target
+        In 'permutation' row sampling the rows are read on from draw ``row_offset`` of the run's permutations.
+        """
+        reseed_fakers(self, seed)
+        random.seed(seed)
+        if self.entities is not None:
+            self.row_sampler.restart(seed, row_offset)
+    
+    def generate_prompt_record(self, contains_pii, number, template_id=None):
+        """Generate one prompt record, numbered ``number`` among the prompts with or without PII
         
-        # Generate PII prompts
-        print(f"Generating {pii_prompts_target} prompts with PII...")
-        for i in range(pii_prompts_target):
-            if (i + 1) % 100 == 0:
-                print(f"  Generated {i + 1}/{pii_prompts_target} PII prompts...")
-            
-            prompt, contains_pii, customer_ids = self.generate_pii_prompt()
-            
-            # Verify it actually contains PII
-            verified_pii = self.has_pii_content(prompt)
-            
+        ``template_id`` fixes the template (see template_catalog); by default it is drawn at random.
+        """
+        if contains_pii:
+            prompt, contains_pii_flag, customer_ids, pii_findings, template_id = self.generate_pii_prompt(template_id)
             record = {
-                'prompt_id': f"pii_{i+1:04d}",
+                'prompt_id': f"pii_{number:04d}",
                 'prompt': prompt,
-                'contains_pii': contains_pii,
-                'verified_pii': verified_pii,
+                'contains_pii': contains_pii_flag,
+                # Verify it actually contains PII
+                'verified_pii': self.has_pii_content(prompt),
                 'prompt_type': 'with_pii',
+                'template_id': template_id,
                 'source_customer_id': customer_ids,
-                'num_customers': len(customer_ids)
+                'num_customers': len(customer_ids),
+                'pii_findings': pii_findings,
+                'pii_count': len(pii_findings),
+                'unique_pii_types': list(dict.fromkeys(finding['pii_type'] for finding in pii_findings))
             }
-            dataset.append(record)
-        
-        # Generate non-PII prompts
-        print(f"Generating {non_pii_prompts_target} prompts without PII...")
-        for i in range(non_pii_prompts_target):
-            if (i + 1) % 100 == 0:
-                print(f"  Generated {i + 1}/{non_pii_prompts_target} non-PII prompts...")
-            
-            prompt, contains_pii, customer_data = self.generate_non_pii_prompt()
-            
-            # Verify it doesn't contain PII
-            verified_pii = self.has_pii_content(prompt)
-            
+        else:
+            prompt, contains_pii_flag, customer_data, pii_findings, template_id = self.generate_non_pii_prompt(template_id)
             record = {
-                'prompt_id': f"nopii_{i+1:04d}",
+                'prompt_id': f"nopii_{number:04d}",
                 'prompt': prompt,
-                'contains_pii': contains_pii,
-                'verified_pii': verified_pii,
+                'contains_pii': contains_pii_flag,
+                # Verify it doesn't contain PII
+                'verified_pii': self.has_pii_content(prompt),
                 'prompt_type': 'without_pii',
+                'template_id': template_id,
                 'source_customer_id': [],
-                'num_customers': 0
+                'num_customers': 0,
+                'pii_findings': [],
+                'pii_count': 0,
+                'unique_pii_types': []
             }
-            dataset.append(record)
-        
-        # Shuffle the dataset
-        random.shuffle(dataset)
+        return record
+    
+    def generate_prompt_records(self, contains_pii, count, start=0, progress=False):
+        """Generate ``count`` prompt records with or without PII, numbered from ``start``"""
+        records = []
+        for i in range(start, start + count):
+            if progress and (i + 1) % 100 == 0:
+                print(f"  Generated {i + 1}/{start + count} {'PII' if contains_pii else 'non-PII'} prompts...")
+            
+            records.append(self.generate_prompt_record(contains_pii, i + 1))
+        return records
+    
+    def template_catalog(self):
+        """Templates the coverage planner allocates prompts to (see coverage.py)
         
-        # Add final indices
+        Weights follow the random choice: 70% single-customer and 30% multi-customer PII prompts.
+        ``source_rows`` is the number of row positions a prompt of the template draws.
+        """
+        num_rows = len(self.entities) if self.entities is not None else 2
+        catalog = []
+        for templates, share, rows in ((self.compiled_single_templates, 0.7, 1),
+                                       (self.compiled_multi_templates, 0.3, min(2, num_rows))):
+            catalog.extend({'template_id': template.template_id, 'contains_pii': True,
+                            'pii_types': template.pii_types, 'weight': share / len(templates), 'source_rows': rows}
+                           for template in templates)
+        catalog.extend({'template_id': f"nopii-{index}", 'contains_pii': False, 'pii_types': [], 'weight': 1.0,
+                        'source_rows': 0}
+                       for index in range(1, len(self.non_pii_prompt_templates) + 1))
+        return catalog
+    
+    def coverage_contexts(self):
+        """Record context fields the coverage planner balances (customer prompts have none)"""
+        return {}
+    
+    def generate_planned_records(self, slots):
+        """Prompt records of coverage plan slots ((position, number, template_id, contexts), see coverage.py)"""
+        records = []
+        for position, number, template_id, contexts in slots:
+            record = self.generate_prompt_record(not template_id.startswith('nopii'), number, template_id)
+            record['final_index'] = position + 1
+            records.append(record)
+        return records
+    
+    def finalize_dataset(self, dataset, rng=random):
+        """Shuffle the dataset with ``rng`` and add final indices"""
+        rng.shuffle(dataset)
         for i, record in enumerate(dataset):
             record['final_index'] = i + 1
-        
         return dataset
     
+    def generate_dataset(self, total_prompts=1000, pii_ratio=0.5):
+        """Generate the complete prompt dataset"""
+        print(f"Generating {total_prompts} employer prompts...")
+        
+        pii_prompts_target = int(total_prompts * pii_ratio)
+        non_pii_prompts_target = total_prompts - pii_prompts_target
+        
+        # Generate PII prompts
+        print(f"Generating {pii_prompts_target} prompts with PII...")
+        dataset = self.generate_prompt_records(True, pii_prompts_target, progress=True)
+        
+        # Generate non-PII prompts
+        print(f"Generating {non_pii_prompts_target} prompts without PII...")
+        dataset.extend(self.generate_prompt_records(False, non_pii_prompts_target, progress=True))
+        
+        # Shuffle the dataset and add final indices
+        return self.finalize_dataset(dataset)
+    
     def save_dataset(self, dataset, filename_prefix='employer_prompts_finance'):
         """Save the prompt dataset"""
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -364,8 +486,16 @@ class EmployerPromptGenerator:
             json.dump(dataset, f, indent=2)
         print(f"Dataset saved as JSON: {json_filename}")
         
-        # Save as CSV
-        df = pd.DataFrame(dataset)
+        # Save as CSV (flattened version)
+        csv_records = []
+        for record in dataset:
+            csv_record = record.copy()
+            csv_record['pii_findings'] = json.dumps(record['pii_findings'])
+            csv_record['unique_pii_types'] = ', '.join(record['unique_pii_types'])
+            csv_records.append(csv_record)
+        
+        import pandas as pd
+        df = pd.DataFrame(csv_records)
         csv_filename = f"{filename_prefix}_{timestamp}.csv"
         df.to_csv(csv_filename, index=False)
         print(f"Dataset saved as CSV: {csv_filename}")
@@ -0,0 +1,159 @@
+"""Exact and near-duplicate removal for prompt corpora
+
+Every prompt generator fills a few dozen PII templates and copies a few dozen
+fixed non-PII templates verbatim, so large prompt datasets are full of exact
+duplicates and of near duplicates (one template filled with values that
+barely differ). These inflate training sets and leak across splits. A
+Deduplicator makes one streaming pass over the prompts:
+
+- exact duplicates are found by a 16-byte BLAKE2 digest of the text;
+- near duplicates by MinHash signatures of the text's character shingles
+  (lower-cased, whitespace collapsed), indexed with LSH banding. A prompt is
+  compared only with the kept prompts sharing at least one band with it, and
+  it is a duplicate when the estimated Jaccard similarity to one of them
+  reaches ``threshold``.
+
+A duplicate is still kept while its template (the record's ``template_id``)
+has room under its duplicate cap, so a non-PII template can be allowed a
+number of verbatim copies. Only prompts kept as originals are indexed; the
+index grows with them, not with the input.
+"""
+import hashlib
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_NUM_PERM = 64
+# Shingles are byte windows of the normalized text; 5 bytes fit in one uint64
+SHINGLE_SIZE = 5
+
+def lsh_bands(num_perm, threshold, false_positive_weight=0.5, false_negative_weight=0.5):
+    """(bands, rows) with bands * rows <= num_perm minimizing the weighted LSH error around ``threshold``
+
+    Two prompts of similarity s share a band with probability
+    1 - (1 - s ** rows) ** bands. The false positive area below the threshold
+    and the false negative area above it are summed over a grid of s.
+    """
+    step = 0.005
+    similarities = np.arange(0, 1 + step, step)
+    below = similarities <= threshold
+    best = None
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            candidate = 1 - (1 - similarities ** rows) ** bands
+            error = step * (false_positive_weight * candidate[below].sum()
+                            + false_negative_weight * (1 - candidate[~below]).sum())
+            if best is None or error < best[0]:
+                best = (error, bands, rows)
+    return best[1], best[2]
+
+def parse_duplicate_caps(items):
+    """Turn ``N`` / ``TEMPLATE_ID=N`` arguments into (default cap, {template_id: cap})"""
+    default_cap = 0
+    caps = {}
+    for item in items or []:
+        template_id, separator, cap = item.rpartition('=')
+        if not cap.strip().isdigit() or (separator and not template_id.strip()):
+            raise ValueError(f"Invalid duplicate cap '{item}', expected N or TEMPLATE_ID=N")
+        if separator:
+            caps[template_id.strip()] = int(cap)
+        else:
+            default_cap = int(cap)
+    return default_cap, caps
+
+class Deduplicator:
+    """Streaming exact and MinHash/LSH near-duplicate filter"""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM, default_cap=0, caps=None,
+                 shingle_size=SHINGLE_SIZE, seed=1):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"The similarity threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.default_cap = default_cap
+        self.caps = caps or {}
+        self.shingle_size = shingle_size
+        # Multiply-shift hash family: h(x) = (a * x + b mod 2**64) >> 32, a odd
+        rng = np.random.default_rng(seed)
+        self.multipliers = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.increments = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+        self.shifts = np.arange(shingle_size, dtype=np.uint64) * np.uint64(8)
+        self.bands, self.rows = lsh_bands(num_perm, threshold)
+        self.buckets = [{} for _ in range(self.bands)]
+        self.signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self.digests = set()
+        self.duplicates_kept = {}
+        self.seen = 0
+        self.unique = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+        self.kept_duplicates = 0
+
+    def signature(self, text):
+        """MinHash signature (num_perm uint32 values) of the text's shingles"""
+        data = np.frombuffer(' '.join(text.lower().split()).encode('utf-8'), dtype=np.uint8)
+        if len(data) < self.shingle_size:
+            data = np.concatenate([data, np.zeros(self.shingle_size - len(data), dtype=np.uint8)])
+        windows = np.lib.stride_tricks.sliding_window_view(data, self.shingle_size).astype(np.uint64)
+        shingles = (windows << self.shifts).sum(axis=1, dtype=np.uint64)
+        hashes = np.multiply.outer(self.multipliers, shingles) + self.increments[:, None]
+        return (hashes.min(axis=1) >> np.uint64(32)).astype(np.uint32)
+
+    def band_keys(self, signature):
+        rows = self.rows
+        return [hash(signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.bands)]
+
+    def similarity(self, signature, keys):
+        """Highest estimated similarity to a kept prompt sharing a band with ``signature`` (0 without one)"""
+        candidates = set()
+        for bucket, key in zip(self.buckets, keys):
+            candidates.update(bucket.get(key, ()))
+        if not candidates:
+            return 0.0
+        candidates = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        return float((self.signatures[candidates] == signature).mean(axis=1).max())
+
+    def index(self, signature, keys):
+        position = self.unique
+        if position == len(self.signatures):
+            self.signatures = np.concatenate([self.signatures, np.empty_like(self.signatures)])
+        self.signatures[position] = signature
+        for bucket, key in zip(self.buckets, keys):
+            bucket.setdefault(key, []).append(position)
+        self.unique += 1
+
+    def check(self, text):
+        """Classify ``text`` as 'unique', 'exact' or 'near' and index it when unique"""
+        digest = hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        if digest in self.digests:
+            return 'exact'
+        self.digests.add(digest)
+        signature = self.signature(text)
+        keys = self.band_keys(signature)
+        if self.similarity(signature, keys) >= self.threshold:
+            return 'near'
+        self.index(signature, keys)
+        return 'unique'
+
+    def keep(self, text, template_id=None):
+        """Whether to keep ``text``: it is unique, or its template has room for another duplicate"""
+        self.seen += 1
+        kind = self.check(text)
+        if kind == 'unique':
+            return True
+        if kind == 'exact':
+            self.exact_duplicates += 1
+        else:
+            self.near_duplicates += 1
+        kept = self.duplicates_kept.get(template_id, 0)
+        if kept < self.caps.get(template_id, self.default_cap):
+            self.duplicates_kept[template_id] = kept + 1
+            self.kept_duplicates += 1
+            return True
+        return False
+
+    def filter(self, records, text_field='prompt'):
+        """Yield the records to keep, in order"""
+        for record in records:
+            if self.keep(record[text_field], record.get('template_id')):
+                yield record
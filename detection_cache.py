@@ -0,0 +1,163 @@
+"""Memoized PII detection for prompt texts
+
+Half of every prompt dataset is drawn from a few dozen fixed non-PII
+templates, so the same strings reach the detectors again and again. A
+DetectionCache maps a text to its detection result, evicting the least
+recently used entry once it holds ``maxsize`` texts. A PromptAnalysis is the
+result for one text: the findings are scanned once and shared by labelling,
+verification and source-entity extraction, and each record gets its own
+copy of them.
+
+A DetectionStore persists results across runs, keyed by (text hash, pattern
+hash) per PII type, so rerunning detection after a pattern change rescans
+only the types whose pattern changed.
+"""
+import hashlib
+from array import array
+from collections import OrderedDict
+
+class PromptAnalysis:
+    """PII findings of one prompt text"""
+    __slots__ = ('text', 'findings')
+
+    def __init__(self, text, findings):
+        self.text = text
+        self.findings = tuple(findings)
+
+    @property
+    def contains_pii(self):
+        return bool(self.findings)
+
+    def pii_findings(self):
+        """A fresh copy of the findings for a record (records may be perturbed in place)"""
+        return [dict(finding) for finding in self.findings]
+
+class DetectionCache:
+    """Bounded LRU cache of ``detect(text)`` results keyed by text"""
+
+    def __init__(self, detect, maxsize=4096):
+        self.detect = detect
+        self.maxsize = maxsize
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text):
+        """Detection result of ``text``, computed on first request"""
+        results = self.results
+        if text in results:
+            self.hits += 1
+            results.move_to_end(text)
+            return results[text]
+        self.misses += 1
+        result = results[text] = self.detect(text)
+        if len(results) > self.maxsize:
+            results.popitem(last=False)
+        return result
+
+# Size the on-disk store is kept under (see DetectionStore.evict)
+DEFAULT_MAX_BYTES = 1 << 30
+
+class DetectionStore:
+    """Persistent detection results keyed by (text hash, pattern hash), in SQLite
+
+    A row holds the match spans of one PII pattern in one text, packed as
+    uint32 (start, end) pairs. The pattern hash covers the PII type, the
+    pattern and its flags, so after a pattern set changes only the changed
+    types miss and are rescanned; the other types are read back. Rows not
+    used for the most runs are deleted once the store outgrows ``max_bytes``.
+    Several processes may share one store.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, flush_every=2000):
+        import sqlite3
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS spans (text_hash BLOB, pattern_hash BLOB, '
+                                    'spans BLOB, used INTEGER, PRIMARY KEY (text_hash, pattern_hash)) WITHOUT ROWID')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS spans_used ON spans (used)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)')
+            self.connection.execute("INSERT OR IGNORE INTO meta VALUES ('run', 0)")
+            self.connection.execute("UPDATE meta SET value = value + 1 WHERE key = 'run'")
+            # Rows used by this run are stamped with its number; eviction removes the lowest stamps first
+            self.run = self.connection.execute("SELECT value FROM meta WHERE key = 'run'").fetchone()[0]
+        self.pattern_hashes = {}
+        self.inserts = []
+        self.touched = []
+        self.hits = 0
+        self.misses = 0
+
+    def pattern_hash(self, pii_type, pattern):
+        key = (pii_type, pattern.pattern, pattern.flags)
+        digest = self.pattern_hashes.get(key)
+        if digest is None:
+            digest = self.pattern_hashes[key] = hashlib.blake2b(
+                f"{pii_type}\0{pattern.pattern}\0{pattern.flags}".encode(), digest_size=8).digest()
+        return digest
+
+    def scan(self, patterns, text):
+        """(pii_type, start, end) of every match of compiled ``patterns`` ([(pii_type, pattern)]) in ``text``
+
+        Matches are grouped by PII type in ``patterns`` order, as
+        domain_engine.find_pii returns them.
+        """
+        text_hash = hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        cached = dict(self.connection.execute('SELECT pattern_hash, spans FROM spans WHERE text_hash = ?',
+                                              (text_hash,)))
+        matches = []
+        for pii_type, pattern in patterns:
+            pattern_hash = self.pattern_hash(pii_type, pattern)
+            positions = array('I')
+            blob = cached.get(pattern_hash)
+            if blob is None:
+                self.misses += 1
+                for match in pattern.finditer(text):
+                    positions.append(match.start())
+                    positions.append(match.end())
+                self.inserts.append((text_hash, pattern_hash, positions.tobytes(), self.run))
+            else:
+                self.hits += 1
+                positions.frombytes(blob)
+                self.touched.append((self.run, text_hash, pattern_hash))
+            for index in range(0, len(positions), 2):
+                matches.append((pii_type, positions[index], positions[index + 1]))
+        if len(self.inserts) + len(self.touched) >= self.flush_every:
+            self.flush()
+        return matches
+
+    def flush(self):
+        """Write new results and usage stamps, then evict if the store is over its size"""
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO spans VALUES (?, ?, ?, ?)', self.inserts)
+            self.connection.executemany('UPDATE spans SET used = ? WHERE text_hash = ? AND pattern_hash = ?',
+                                        self.touched)
+        self.inserts = []
+        self.touched = []
+        self.evict()
+
+    def size(self):
+        """Bytes of live pages in the store"""
+        page_count, = self.connection.execute('PRAGMA page_count').fetchone()
+        free_pages, = self.connection.execute('PRAGMA freelist_count').fetchone()
+        page_size, = self.connection.execute('PRAGMA page_size').fetchone()
+        return (page_count - free_pages) * page_size
+
+    def evict(self):
+        """Delete the least recently used rows until the store is back under 90% of max_bytes"""
+        size = self.size()
+        if size <= self.max_bytes:
+            return
+        rows, = self.connection.execute('SELECT count(*) FROM spans').fetchone()
+        excess = rows - int(rows * self.max_bytes * 0.9 / size)
+        with self.connection:
+            self.connection.execute('DELETE FROM spans WHERE (text_hash, pattern_hash) IN '
+                                    '(SELECT text_hash, pattern_hash FROM spans ORDER BY used LIMIT ?)', (excess,))
+
+    def close(self):
+        self.flush()
+        self.connection.close()
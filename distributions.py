@@ -0,0 +1,169 @@
+"""Weighted and conditional value distributions for the custom providers
+
+Each provider field has a spec of ``{value: weight}`` (or, for conditional
+fields, ``{condition: {value: weight}}``). Specs are compiled once per process
+into Walker alias tables, so a weighted draw costs one uniform number and one
+table lookup however many values the field has. Worker processes read the
+tables the parent published instead (see shared_tables.py).
+"""
+from functools import lru_cache
+
+class AliasTable:
+    """Walker/Vose alias table for O(1) sampling from a discrete distribution"""
+
+    def __init__(self, weights):
+        if not weights or any(weight < 0 for weight in weights.values()) or sum(weights.values()) <= 0:
+            raise ValueError(f"Invalid weights: {weights}")
+        self.values = list(weights)
+        self.weights = [float(weights[value]) for value in self.values]
+
+        size = len(self.values)
+        total = sum(self.weights)
+        scaled = [weight * size / total for weight in self.weights]
+        self.probabilities = [1.0] * size
+        self.aliases = list(range(size))
+
+        small = [index for index, weight in enumerate(scaled) if weight < 1.0]
+        large = [index for index, weight in enumerate(scaled) if weight >= 1.0]
+        while small and large:
+            low, high = small.pop(), large.pop()
+            self.probabilities[low] = scaled[low]
+            self.aliases[low] = high
+            scaled[high] -= 1.0 - scaled[low]
+            (small if scaled[high] < 1.0 else large).append(high)
+
+    @classmethod
+    def from_arrays(cls, values, weights, probabilities, aliases):
+        """Alias table from already built arrays (sequences or memoryviews, see shared_tables.py)"""
+        table = cls.__new__(cls)
+        table.values = values
+        table.weights = weights
+        table.probabilities = probabilities
+        table.aliases = aliases
+        return table
+
+    def sample(self, rng):
+        """Draw one value using ``rng`` (a random.Random)"""
+        position = rng.random() * len(self.values)
+        index = int(position)
+        if position - index < self.probabilities[index]:
+            return self.values[index]
+        return self.values[self.aliases[index]]
+
+    def sample_unique(self, rng, count, exclude=()):
+        """Draw ``count`` distinct values, weighted (Efraimidis-Spirakis keys)
+
+        Sampling without replacement cannot use the alias table directly, so
+        each value gets the key u ** (1 / weight) and the largest keys win.
+        Values in ``exclude`` are never drawn.
+        """
+        keyed = [(rng.random() ** (1.0 / weight), value)
+                 for value, weight in zip(self.values, self.weights) if weight > 0 and value not in exclude]
+        keyed.sort(reverse=True)
+        return [value for _, value in keyed[:count]]
+
+# Field distributions. Weights are relative; values must match the provider
+# tables and the PII regexes of each domain.
+DISTRIBUTIONS = {
+    # Medical
+    'blood_type': {'O+': 37.4, 'A+': 35.7, 'B+': 8.5, 'AB+': 3.4, 'O-': 6.6, 'A-': 6.3, 'B-': 1.5, 'AB-': 0.6},
+    'ethnicity': {
+        'Caucasian': 58.0, 'Hispanic/Latino': 19.0, 'African American': 12.5, 'Asian': 6.0,
+        'Mixed': 3.0, 'Native American': 1.1, 'Pacific Islander': 0.4,
+    },
+    'insurance_provider': {
+        'Medicare': 18, 'Medicaid': 17, 'UnitedHealthcare': 15, 'Blue Cross Blue Shield': 14,
+        'Anthem': 8, 'Aetna': 8, 'Humana': 7, 'Cigna': 6, 'Kaiser Permanente': 7,
+    },
+    'severity_level': {'Mild': 45, 'Moderate': 35, 'Severe': 15, 'Critical': 5},
+    # Finance
+    'credit_score_category': {
+        'Excellent (750+)': 45, 'Good (700-749)': 17, 'Fair (650-699)': 13,
+        'Poor (600-649)': 11, 'Bad (Below 600)': 14,
+    },
+    # Legal
+    'case_status': {
+        'Active': 25, 'Pending Discovery': 15, 'In Mediation': 8, 'Settlement Negotiations': 10,
+        'Trial Preparation': 6, 'On Appeal': 4, 'Closed - Settled': 18, 'Closed - Dismissed': 9,
+        'Closed - Judgment': 5,
+    },
+    # Education
+    'performance_level': {
+        'Excellent (3.8-4.0)': 15, 'Good (3.0-3.7)': 35, 'Average (2.5-2.9)': 25,
+        'Below Average (2.0-2.4)': 15, 'Poor (Below 2.0)': 10,
+    },
+    # HR
+    'employment_type': {'Full-Time': 78, 'Part-Time': 12, 'Contract': 7, 'Intern': 3},
+    'performance_rating': {
+        'Exceeds Expectations': 20, 'Meets Expectations': 60, 'Needs Improvement': 15, 'Unsatisfactory': 5,
+    },
+}
+
+CONDITIONAL_DISTRIBUTIONS = {
+    # Medication given department (commonly prescribed drugs weigh more)
+    'medication_for_department': {
+        'Cardiology': {'Atorvastatin': 22, 'Lisinopril': 20, 'Metoprolol': 16, 'Amlodipine': 14,
+                       'Losartan': 10, 'Clopidogrel': 7, 'Carvedilol': 6, 'Warfarin': 5},
+        'Neurology': {'Gabapentin': 30, 'Levetiracetam': 18, 'Donepezil': 14, 'Topiramate': 12,
+                      'Lamotrigine': 12, 'Carbidopa-Levodopa': 9, 'Phenytoin': 5},
+        'Orthopedics': {'Ibuprofen': 28, 'Naproxen': 18, 'Meloxicam': 16, 'Tramadol': 12,
+                        'Celecoxib': 10, 'Prednisone': 9, 'Diclofenac': 7},
+        'Pediatrics': {'Amoxicillin': 30, 'Acetaminophen': 20, 'Ibuprofen': 16, 'Albuterol': 12,
+                       'Azithromycin': 10, 'Fluticasone': 7, 'Prednisolone': 5},
+        'Emergency Medicine': {'Morphine': 20, 'Lorazepam': 18, 'Fentanyl': 16, 'Naloxone': 14,
+                               'Midazolam': 12, 'Epinephrine': 12, 'Atropine': 8},
+        'Internal Medicine': {'Metformin': 24, 'Omeprazole': 20, 'Levothyroxine': 18, 'Simvastatin': 14,
+                              'Hydrochlorothiazide': 13, 'Sertraline': 11},
+        'Psychiatry': {'Sertraline': 26, 'Escitalopram': 20, 'Fluoxetine': 18, 'Quetiapine': 12,
+                       'Clonazepam': 11, 'Risperidone': 8, 'Lithium': 5},
+        'Radiology': {'Iodinated contrast': 45, 'Gadolinium': 30, 'Barium sulfate': 12,
+                      'Diphenhydramine': 8, 'Lorazepam': 5},
+        'Oncology': {'Carboplatin': 20, 'Paclitaxel': 20, 'Cyclophosphamide': 16, 'Doxorubicin': 16,
+                     'Cisplatin': 15, 'Methotrexate': 13},
+        'Endocrinology': {'Metformin': 32, 'Insulin': 24, 'Levothyroxine': 20, 'Empagliflozin': 10,
+                          'Glipizide': 9, 'Pioglitazone': 5},
+        'Pulmonology': {'Albuterol': 30, 'Fluticasone': 20, 'Montelukast': 16, 'Tiotropium': 14,
+                        'Prednisone': 12, 'Azithromycin': 8},
+        'Gastroenterology': {'Omeprazole': 34, 'Mesalamine': 16, 'Adalimumab': 14, 'Infliximab': 12,
+                             'Lactulose': 12, 'Rifaximin': 12},
+    },
+    # Account types given income bracket (how likely each account is held)
+    'account_types_for_income': {
+        'Under $30k': {'Checking': 90, 'Savings': 40},
+        '$30k-$50k': {'Checking': 90, 'Savings': 55, 'Credit Card': 50},
+        '$50k-$75k': {'Checking': 90, 'Savings': 65, 'Credit Card': 60, 'Auto Loan': 30},
+        '$75k-$100k': {'Checking': 90, 'Savings': 70, 'Credit Card': 65, 'Investment': 35, 'Auto Loan': 30},
+        '$100k-$150k': {'Checking': 90, 'Savings': 75, 'Credit Card': 70, 'Investment': 50,
+                        'Mortgage': 45, 'Auto Loan': 25},
+        '$150k+': {'Checking': 90, 'Savings': 75, 'Credit Card': 70, 'Investment': 65, 'Mortgage': 50,
+                   'Personal Loan': 15, 'Business': 25},
+    },
+}
+
+@lru_cache(maxsize=None)
+def distribution(field):
+    """Compiled alias table of a field (built once per process, or read from the shared tables)"""
+    from shared_tables import shared_alias_table
+    return shared_alias_table(field) or AliasTable(DISTRIBUTIONS[field])
+
+@lru_cache(maxsize=None)
+def conditional_distribution(field, condition):
+    """Compiled alias table of a field given a condition, or None if the spec has no entry for it"""
+    from shared_tables import shared_alias_table
+    weights = CONDITIONAL_DISTRIBUTIONS[field].get(condition)
+    if not weights:
+        return None
+    return shared_alias_table(f"{field}:{condition}") or AliasTable(weights)
+
+def alias_tables():
+    """Alias tables of every field distribution, by name, for publishing to workers"""
+    tables = {field: AliasTable(weights) for field, weights in DISTRIBUTIONS.items()}
+    for field, conditions in CONDITIONAL_DISTRIBUTIONS.items():
+        tables.update((f"{field}:{condition}", AliasTable(weights)) for condition, weights in conditions.items())
+    return tables
+
+@lru_cache(maxsize=None)
+def restricted_distribution(field, values):
+    """Alias table of a field restricted to ``values`` (a tuple), keeping their relative weights"""
+    weights = DISTRIBUTIONS[field]
+    return AliasTable({value: weights[value] for value in values})
@@ -0,0 +1,447 @@
+"""Declarative domain specs for new domains, and the record generators' common base class
+
+A DomainSpec describes a domain as data: its Faker providers, the record
+fields (where each value comes from and which fields it depends on), the
+record text template and the PII type map. ``spec.generator_class()``
+compiles it into a generator class that plugs into the pipeline like the
+hand-written ones (population draws, unique identifiers, ``--where``
+constraints, sharding, resume, noise). New domains (hr) are specs; the
+medical, finance, legal and education generators keep their hand-written
+record builders, so their seeded output is unchanged, and share only the
+RecordEngine base class below.
+
+The work that does not depend on the domain lives in RecordEngine, the base
+class of every record generator:
+    - PII patterns are compiled once per process, not looked up per call
+    - fields are resolved to bound Faker methods once per generator and locale
+    - templates are parsed once into literal/field pieces
+    - constraints are compiled once per generator (compiled_constraints), not once per record
+    - dataset loop, saving and the summary report are written once
+
+Field sources:
+    'method'            a Faker method (custom providers included); called with
+                        the values of ``depends_on`` as positional arguments
+    'id:<space>'        the next identifier of an identifiers.ID_SPACES space
+    callable            called as ``source(fake, *dependency_values)``
+``person='<column>'`` takes the value from the shared population when one is
+attached. ``options`` (values, or the name of a provider attribute) makes a
+field constrainable; for a field with one dependency it may map each value
+of the dependency to the values it allows, and the dependency is narrowed
+when the field is constrained.
+"""
+import json
+import re
+import string
+from collections import Counter
+from collections.abc import Mapping
+from datetime import datetime
+
+from constraints import choose, choose_from, compile_constraints, narrow
+from distributions import AliasTable
+from identifiers import IdAllocator
+from lazy_loading import DEFAULT_LOCALE, LazyFaker
+from locales import check_locale, localize_pii_types
+
+# Compiled PII type maps, shared by every generator of the process
+_compiled_pii_types = {}
+
+class CheckedPattern:
+    """A PII pattern whose matches must also pass ``check`` (e.g. a checksum)
+
+    Written in a PII type map as ``(pattern, check)``. ``pattern`` and
+    ``flags`` name the check too, so detection caches keep its spans apart
+    from those of the bare regex.
+    """
+
+    def __init__(self, pattern, check):
+        self.regex = re.compile(pattern, re.IGNORECASE)
+        self.check = check
+        self.pattern = f"{pattern}\0{check.__module__}.{check.__qualname__}"
+        self.flags = self.regex.flags
+
+    def finditer(self, text):
+        check = self.check
+        return (match for match in self.regex.finditer(text) if check(match.group()))
+
+def compile_pii_types(pii_types):
+    """[(pii_type, compiled pattern)] of a PII type map, compiled once per process"""
+    key = tuple(pii_types.items())
+    compiled = _compiled_pii_types.get(key)
+    if compiled is None:
+        compiled = [(pii_type, re.compile(pattern, re.IGNORECASE) if isinstance(pattern, str) else CheckedPattern(*pattern))
+                    for pii_type, pattern in pii_types.items()]
+        _compiled_pii_types[key] = compiled
+    return compiled
+
+def find_pii(patterns, text):
+    """Findings of compiled ``patterns`` in ``text``, grouped by PII type in map order"""
+    findings = []
+    append = findings.append
+    for pii_type, pattern in patterns:
+        for match in pattern.finditer(text):
+            value = match.group()
+            append({
+                'pii_type': pii_type,
+                'value': value,
+                'start_index': match.start(),
+                'end_index': match.end(),
+                'length': len(value)
+            })
+    return findings
+
+def alternation(values):
+    """Word-bounded pattern matching any of ``values`` literally"""
+    return r'\b(' + '|'.join(re.escape(value) for value in sorted(set(values), key=len, reverse=True)) + r')\b'
+
+def parse_template(template):
+    """Split a str.format template into (literal, field, format_spec) pieces"""
+    pieces = []
+    for literal, field, format_spec, conversion in string.Formatter().parse(template):
+        if conversion:
+            raise ValueError(f"Template field '{field}' uses a conversion (!{conversion}); use a format spec")
+        if field is not None and not field.isidentifier():
+            raise ValueError(f"Template field '{field}' must be a plain field name")
+        pieces.append((literal, field, format_spec or ''))
+    return pieces
+
+class Field:
+    """One record field of a DomainSpec (see the module docstring for sources)"""
+
+    def __init__(self, source, depends_on=(), person=None, options=None, distribution=None, fmt=None):
+        self.source = source
+        self.depends_on = tuple(depends_on)
+        self.person = person
+        self.options = options
+        self.distribution = distribution
+        self.fmt = fmt
+
+class DomainSpec:
+    """A domain described as data; compiled (validated and ordered) on construction
+
+    ``fields`` maps record field names to Field objects; names starting with
+    '_' are available to the template and other fields but are not stored.
+    ``pii_types`` maps PII types to patterns, ``(pattern, check)`` pairs (see
+    CheckedPattern), or callables taking the domain's first custom provider
+    and returning a pattern.
+    """
+
+    def __init__(self, name, providers, fields, template, pii_types, record_label, dataset_prefix,
+                 output_dir=None, list_fields=(), summary_fields=(), title=None):
+        self.name = name
+        self.providers = tuple(providers)
+        self.fields = dict(fields)
+        self.template = template.strip()
+        self.pii_types = dict(pii_types)
+        self.record_label = record_label
+        self.dataset_prefix = dataset_prefix
+        self.output_dir = output_dir
+        self.list_fields = ['unique_pii_types'] + list(list_fields)
+        self.summary_fields = list(summary_fields)
+        self.title = title or f"{name.upper()} DATASET"
+
+        self.order = self._resolve_order()
+        self.template_pieces = parse_template(self.template)
+        missing = [field for _, field, _ in self.template_pieces if field and field not in self.fields]
+        if missing:
+            raise ValueError(f"Template of the {name} spec uses undefined field(s) {missing}")
+
+    def _resolve_order(self):
+        """Field names in an order where every field follows its dependencies (declaration order otherwise)"""
+        order = []
+        state = {}
+
+        def visit(field_name, chain):
+            if state.get(field_name) == 'done':
+                return
+            if state.get(field_name) == 'visiting':
+                raise ValueError(f"Fields of the {self.name} spec depend on each other: {' -> '.join(chain)}")
+            if field_name not in self.fields:
+                raise ValueError(f"Field '{chain[-2]}' depends on undefined field '{field_name}'")
+            state[field_name] = 'visiting'
+            for dependency in self.fields[field_name].depends_on:
+                visit(dependency, chain + [dependency])
+            state[field_name] = 'done'
+            order.append(field_name)
+
+        for field_name in self.fields:
+            visit(field_name, [field_name])
+        return order
+
+    def generator_class(self, class_name=None):
+        """Build the record generator class of this domain"""
+        return type(class_name or f"{self.name.title()}DatasetGenerator", (SpecDatasetGenerator,), {
+            'fake': LazyFaker(*self.providers),
+            'spec': self,
+            'record_label': self.record_label,
+            'dataset_prefix': self.dataset_prefix,
+            'output_dir': self.output_dir,
+            'list_fields': self.list_fields,
+        })
+
+class RecordEngine:
+    """Detection, dataset loop and saving shared by the record generators
+
+    Subclasses define ``pii_types`` (an instance attribute), ``record_method``
+    (the name of their per-record builder) and the class attributes below.
+    """
+    record_method = 'generate_record'
+    record_label = 'records'
+    dataset_prefix = 'dataset'
+    output_dir = None
+    list_fields = ['unique_pii_types']
+    # Locale of the record being built, and the locale mix set by use_locales()
+    locale = DEFAULT_LOCALE
+    locale_table = None
+    # Persistent detection results shared across runs (detection_cache.DetectionStore), if any
+    detection_store = None
+    # Last constraints passed to compiled_constraints() and their compiled form
+    _constraints = (None, None)
+
+    def compiled_constraints(self, constraints):
+        """``self.compile_constraints(constraints)``, reused while the same constraints object is passed"""
+        if constraints is not self._constraints[0]:
+            self._constraints = (constraints, self.compile_constraints(constraints))
+        return self._constraints[1]
+
+    def use_locales(self, weights):
+        """Build records in the locales of ``weights`` ({locale: weight}, see locales.parse_locales)
+
+        Records are tagged with their locale. With several locales, each
+        record's locale is drawn from the weights; switching only swaps the
+        generator's cached Faker and PII patterns for that locale.
+        """
+        for locale in weights:
+            check_locale(locale)
+        self.locale_table = AliasTable(weights)
+        if len(weights) == 1:
+            self.set_locale(next(iter(weights)))
+
+    def set_locale(self, locale):
+        """Switch Faker and the PII type map to ``locale`` (each built once per generator)"""
+        self.__dict__['fake'] = type(self).fake.build(self, locale)
+        base = self.__dict__.setdefault('_base_pii_types', self.pii_types)
+        self.pii_types = localize_pii_types(base, locale)
+        self._pii_patterns = compile_pii_types(self.pii_types)
+        self.locale = locale
+
+    def record_maker(self):
+        """The per-record builder; with use_locales() it picks and tags each record's locale"""
+        make_record = getattr(self, self.record_method)
+        if self.locale_table is None:
+            return make_record
+        table = self.locale_table
+        several = len(table.values) > 1
+
+        def make_localized_record(constraints=None):
+            if several:
+                self.set_locale(table.sample(self.fake.random))
+            record = make_record(constraints)
+            record['locale'] = self.locale
+            return record
+
+        return make_localized_record
+
+    def find_pii_in_text(self, text):
+        """Find PII types and their indices in a text"""
+        patterns = self.__dict__.get('_pii_patterns')
+        if patterns is None:
+            patterns = self._pii_patterns = compile_pii_types(self.pii_types)
+        if self.detection_store is not None:
+            return [{'pii_type': pii_type, 'value': text[start:end], 'start_index': start, 'end_index': end,
+                     'length': end - start}
+                    for pii_type, start, end in self.detection_store.scan(patterns, text)]
+        return find_pii(patterns, text)
+
+    def generate_dataset(self, num_records=1000, constraints=None):
+        """Generate a complete dataset (optionally constrained, see the record builder)"""
+        print(f"Generating {num_records} {self.record_label}...")
+        make_record = self.record_maker()
+
+        records = []
+        for i in range(num_records):
+            if (i + 1) % 100 == 0:
+                print(f"Generated {i + 1}/{num_records} records...")
+
+            records.append(make_record(constraints))
+
+        return records
+
+    def save_dataset(self, records, filename_prefix=None):
+        """Save the dataset in multiple formats"""
+        filename_prefix = filename_prefix or self.dataset_prefix
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+        directory = ''
+        if self.output_dir:
+            import os
+            os.makedirs(self.output_dir, exist_ok=True)
+            directory = f"{self.output_dir}/"
+
+        # Save as JSON
+        json_filename = f"{directory}{filename_prefix}_{timestamp}.json"
+        with open(json_filename, 'w') as f:
+            json.dump(records, f, indent=2, default=str)
+        print(f"Dataset saved as JSON: {json_filename}")
+
+        # Save as CSV (flattened version)
+        csv_records = []
+        for record in records:
+            csv_record = record.copy()
+            csv_record['pii_findings'] = json.dumps(record['pii_findings'])
+            for field in self.list_fields:
+                csv_record[field] = ', '.join(record[field])
+            csv_records.append(csv_record)
+
+        import pandas as pd
+        df = pd.DataFrame(csv_records)
+        csv_filename = f"{directory}{filename_prefix}_{timestamp}.csv"
+        df.to_csv(csv_filename, index=False)
+        print(f"Dataset saved as CSV: {csv_filename}")
+
+        # Generate summary statistics
+        self.generate_summary_report(records, f"{directory}{filename_prefix}_summary_{timestamp}.txt")
+
+        return json_filename, csv_filename
+
+class SpecDatasetGenerator(RecordEngine):
+    """Record generator driven by a DomainSpec (see DomainSpec.generator_class)"""
+    spec = None
+
+    def __init__(self, seed=42, population=None, population_offset=0, id_allocator=None):
+        """Initialize the generator
+
+        With a PopulationStore, fields with a ``person`` column are drawn from
+        the shared population starting at ``population_offset``. ``id:``
+        fields come from ``id_allocator`` (an IdAllocator).
+        """
+        self.seed = seed
+        self.people = population.iter_from(population_offset) if population is not None else None
+        self.ids = id_allocator if id_allocator is not None else IdAllocator(seed)
+
+        spec = self.spec
+        custom = [p for p in self.fake.providers if spec.providers and isinstance(p, spec.providers[0])]
+        self.provider = custom[0] if custom else None
+        self.pii_types = {pii_type: pattern(self.provider) if callable(pattern) else pattern
+                          for pii_type, pattern in spec.pii_types.items()}
+
+        # Field name -> allowed values (or {dependency value: values}) of the constrainable fields
+        self.options = {}
+        for field_name, field in spec.fields.items():
+            options = field.options
+            if isinstance(options, str):
+                options = getattr(self.provider, options)
+            if options is not None:
+                self.options[field_name] = options
+        for field_name, options in self.options.items():
+            depends_on = spec.fields[field_name].depends_on
+            if isinstance(options, Mapping) and (len(depends_on) != 1 or depends_on[0] not in self.options):
+                raise ValueError(f"Field '{field_name}' maps its options by dependency, so it needs exactly "
+                                 f"one dependency with options (has {list(depends_on)})")
+
+        self._plans = {}
+
+    def field_plan(self):
+        """One entry per field, in dependency order, with the samplers bound (once per locale)"""
+        plan = self._plans.get(self.locale)
+        if plan is not None:
+            return plan
+        plan = self._plans[self.locale] = []
+        for field_name in self.spec.order:
+            field = self.spec.fields[field_name]
+            if callable(field.source):
+                source = field.source
+                sample = lambda *values, source=source: source(self.fake, *values)
+            elif field.source.startswith('id:'):
+                sample = lambda space=field.source[3:]: self.ids.next(space)
+            else:
+                sample = getattr(self.fake, field.source)
+            plan.append((field_name, sample, field.depends_on, field.person, field.distribution, field.fmt))
+        return plan
+
+    def compile_constraints(self, constraints):
+        """Validate record constraints and narrow the dependencies of constrained fields"""
+        options = {field_name: sorted({value for values in allowed.values() for value in values})
+                   if isinstance(allowed, Mapping) else list(allowed)
+                   for field_name, allowed in self.options.items()}
+        compiled = compile_constraints(constraints, options)
+        for field_name, allowed in self.options.items():
+            if isinstance(allowed, Mapping) and field_name in compiled:
+                dependency = self.spec.fields[field_name].depends_on[0]
+                candidates = [value for value in options[dependency] if set(allowed[value]) & set(compiled[field_name])]
+                narrow(compiled, dependency, candidates, field_name)
+        return compiled
+
+    def generate_record(self, constraints=None):
+        """Generate a single record; ``constraints`` maps constrainable fields to allowed values"""
+        compiled = self.compiled_constraints(constraints) if constraints else {}
+        rng = self.fake.random
+        person = next(self.people) if self.people is not None else None
+
+        values = {}
+        for field_name, sample, depends_on, column, distribution, fmt in self.field_plan():
+            if person is not None and column:
+                value = person[column]
+            elif field_name in compiled and depends_on and isinstance(self.options[field_name], Mapping):
+                allowed = self.options[field_name][values[depends_on[0]]]
+                value = choose_from([item for item in compiled[field_name] if item in allowed], rng, distribution)
+            elif depends_on:
+                value = choose(compiled, field_name, lambda: sample(*[values[name] for name in depends_on]),
+                               rng, distribution)
+            else:
+                value = choose(compiled, field_name, sample, rng, distribution)
+            values[field_name] = format(value, fmt) if fmt else value
+
+        parts = []
+        for literal, field_name, format_spec in self.spec.template_pieces:
+            parts.append(literal)
+            if field_name is not None:
+                parts.append(format(values[field_name], format_spec))
+        record_text = ''.join(parts)
+
+        # Find PII in the record
+        pii_findings = self.find_pii_in_text(record_text)
+
+        record = {'record_id': self.fake.uuid4(), 'person_index': person['person_index'] if person else None}
+        record.update((field_name, value) for field_name, value in values.items() if not field_name.startswith('_'))
+        record.update({
+            'full_record_text': record_text,
+            'pii_findings': pii_findings,
+            'pii_count': len(pii_findings),
+            'unique_pii_types': list(dict.fromkeys(finding['pii_type'] for finding in pii_findings))
+        })
+        return record
+
+    def generate_summary_report(self, records, filename):
+        """Generate a summary report of PII findings and the spec's summary fields"""
+        pii_type_counts = Counter(finding['pii_type'] for record in records for finding in record['pii_findings'])
+        total_pii_instances = sum(pii_type_counts.values())
+
+        with open(filename, 'w') as f:
+            f.write(f"{self.spec.title} - ANALYSIS REPORT\n")
+            f.write("="*70 + "\n\n")
+            f.write(f"Total Records Generated: {len(records)}\n")
+            f.write(f"Total PII Instances Found: {total_pii_instances}\n")
+            f.write(f"Average PII per Record: {total_pii_instances/len(records):.2f}\n\n")
+
+            f.write("PII Type Distribution:\n")
+            f.write("-" * 30 + "\n")
+            for pii_type, count in sorted(pii_type_counts.items()):
+                percentage = (count / total_pii_instances) * 100
+                f.write(f"{pii_type}: {count} ({percentage:.1f}%)\n")
+
+            f.write(f"\nDIVERSITY STATISTICS:\n")
+            f.write("=" * 30 + "\n")
+            for field_name in self.spec.summary_fields:
+                f.write(f"\n{field_name.replace('_', ' ').title()} Distribution:\n")
+                for value, count in Counter(record[field_name] for record in records).most_common():
+                    percentage = (count / len(records)) * 100
+                    f.write(f"  {value}: {count} ({percentage:.1f}%)\n")
+
+            f.write(f"\nSample PII Findings from First Record:\n")
+            f.write("-" * 40 + "\n")
+            if records:
+                for finding in records[0]['pii_findings'][:15]:  # Show first 15 findings
+                    f.write(f"Type: {finding['pii_type']}, Value: {finding['value']}, "
+                           f"Position: {finding['start_index']}-{finding['end_index']}\n")
+
+        print(f"Comprehensive summary report saved: {filename}")
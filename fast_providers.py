@@ -0,0 +1,148 @@
+"""Fast drop-in replacements for Faker's en_US address, phone and email generation
+
+Faker builds an address by picking a format string and parsing its
+``{{...}}`` tokens on every call, recursing through street, city and name
+formats, and fills phone numbers by regex substitution. The provider below
+compiles the same en_US tables (formats, weights, name frequencies, street
+suffixes, states) once per process and assembles values by direct indexing,
+so the output follows Faker's en_US distribution at a fraction of the cost.
+"""
+import re
+
+from faker.providers import BaseProvider
+from faker.providers.address.en_US import Provider as AddressProvider
+from faker.providers.person.en_US import Provider as PersonProvider
+from faker.providers.phone_number.en_US import Provider as PhoneProvider
+
+from distributions import AliasTable
+
+# Weighted pools of the contact tables, published to worker processes (see shared_tables.py)
+CONTACT_ALIAS_TABLES = ['first_names', 'last_names', 'address_kinds']
+
+class CompiledTables:
+    """en_US tables compiled once and shared by every FastContactProvider
+
+    The weighted pools are taken from the shared tables when a worker has
+    attached them, and built here otherwise.
+    """
+
+    def __init__(self):
+        from shared_tables import shared_alias_table
+        self.first_names = shared_alias_table('first_names') or AliasTable(PersonProvider.first_names)
+        self.last_names = shared_alias_table('last_names') or AliasTable(PersonProvider.last_names)
+        self.street_suffixes = list(AddressProvider.street_suffixes)
+        self.city_prefixes = list(AddressProvider.city_prefixes)
+        self.city_suffixes = list(AddressProvider.city_suffixes)
+        self.states = (list(AddressProvider.states_abbr) + list(AddressProvider.territories_abbr)
+                       + list(AddressProvider.freely_associated_states_abbr))
+        self.military_states = list(AddressProvider.military_state_abbr)
+        self.military_ships = list(AddressProvider.military_ship_prefix)
+        self.address_kinds = shared_alias_table('address_kinds') or AliasTable({
+            kind: weight for kind, weight in zip(['civilian', 'apo', 'fpo', 'dpo'],
+                                                 AddressProvider.address_formats.values())
+        })
+        self.phone_formats = [compile_digit_template(template) for template in PhoneProvider.formats]
+
+    def alias_tables(self):
+        """The weighted pools by name, for publishing to workers"""
+        return {name: getattr(self, name) for name in CONTACT_ALIAS_TABLES}
+
+_compiled_tables = None
+
+def compiled_tables():
+    """Compile the en_US tables on first use"""
+    global _compiled_tables
+    if _compiled_tables is None:
+        _compiled_tables = CompiledTables()
+    return _compiled_tables
+
+def compile_digit_template(template):
+    """Turn a Faker numerify template into a %-format string and digit ranges
+
+    Each run of '#' becomes one zero-padded field drawn from [0, 10**n); each
+    '$' becomes one digit drawn from [2, 10), as Faker's numerify does.
+    """
+    fields = []
+    parts = []
+    for match in re.finditer(r'#+|\$|[^#$]+', template):
+        token = match.group()
+        if token == '$':
+            parts.append('%d')
+            fields.append((2, 10))
+        elif token.startswith('#'):
+            parts.append(f'%0{len(token)}d')
+            fields.append((0, 10 ** len(token)))
+        else:
+            parts.append(token.replace('%', '%%'))
+    return ''.join(parts), fields
+
+def fill_digit_template(rng, compiled):
+    """Fill a template produced by compile_digit_template"""
+    pattern, fields = compiled
+    return pattern % tuple(rng.randrange(low, high) for low, high in fields)
+
+def name_based_email(rng, first_name, last_name, domain, dotted_number_max=999):
+    """Name-based email address in one of six username formats
+
+    The format is chosen first and only that username is built.
+    """
+    first, last = first_name.lower(), last_name.lower()
+    choice = rng.randrange(6)
+    if choice == 0:
+        username = f"{first}.{last}"
+    elif choice == 1:
+        username = f"{first}{last}"
+    elif choice == 2:
+        username = f"{first[0]}{last}"
+    elif choice == 3:
+        username = f"{first}{last[0]}"
+    elif choice == 4:
+        username = f"{first}.{last}{rng.randint(1, dotted_number_max)}"
+    else:
+        username = f"{first}{rng.randint(1, 999)}"
+    return f"{username}@{domain}"
+
+class FastContactProvider(BaseProvider):
+    """Precompiled en_US address() and phone_number() (tables are compiled on first call)"""
+
+    def _street_address(self, rng):
+        tables = compiled_tables()
+        digits = rng.choice((5, 4, 3))
+        building = '%0*d' % (digits, rng.randrange(10 ** digits))
+        name = tables.first_names.sample(rng) if rng.random() < 0.5 else tables.last_names.sample(rng)
+        street = f"{building} {name} {rng.choice(tables.street_suffixes)}"
+        if rng.random() < 0.5:
+            unit = 'Apt.' if rng.random() < 0.5 else 'Suite'
+            street = f"{street} {unit} {rng.randrange(1000):03d}"
+        return street
+
+    def _city(self, rng):
+        tables = compiled_tables()
+        kind = rng.randrange(4)
+        if kind == 0:
+            return f"{rng.choice(tables.city_prefixes)} {tables.first_names.sample(rng)}{rng.choice(tables.city_suffixes)}"
+        if kind == 1:
+            return f"{rng.choice(tables.city_prefixes)} {tables.first_names.sample(rng)}"
+        if kind == 2:
+            return f"{tables.first_names.sample(rng)}{rng.choice(tables.city_suffixes)}"
+        return f"{tables.last_names.sample(rng)}{rng.choice(tables.city_suffixes)}"
+
+    def address(self):
+        """Full address with the same format mix as Faker en_US (incl. military addresses)"""
+        rng = self.generator.random
+        tables = compiled_tables()
+        postcode = '%05d' % rng.randint(501, 99950)
+        kind = tables.address_kinds.sample(rng)
+        if kind == 'civilian':
+            return f"{self._street_address(rng)}\n{self._city(rng)}, {rng.choice(tables.states)} {postcode}"
+        state = rng.choice(tables.military_states)
+        if kind == 'apo':
+            return f"PSC {rng.randrange(10000):04d}, Box {rng.randrange(10000):04d}\nAPO {state} {postcode}"
+        if kind == 'fpo':
+            return f"{rng.choice(tables.military_ships)} {tables.last_names.sample(rng)}\nFPO {state} {postcode}"
+        return f"Unit {rng.randrange(10000):04d} Box {rng.randrange(10000):04d}\nDPO {state} {postcode}"
+
+    def phone_number(self):
+        """Phone number in one of Faker's en_US formats"""
+        rng = self.generator.random
+        return fill_digit_template(rng, rng.choice(compiled_tables().phone_formats))
@@ -0,0 +1,109 @@
+"""Collision-free identifier allocation for the record generators
+
+Each identifier kind (MRN, insurance ID, case number, ...) is a finite space
+of integers with a formatter. The n-th identifier of a run is
+``format(permutation[n])``, where the permutation of the space is keyed by the
+run seed. Distinct positions always map to distinct identifiers, so shards
+that use disjoint position ranges (see pipeline.generate_record_shard) never
+collide, whichever worker produces them. There is no rejection loop: every
+allocation costs the same regardless of how full the space is.
+"""
+import hashlib
+
+MASK64 = (1 << 64) - 1
+
+def _mix64(value):
+    """SplitMix64 finalizer used as the round function of the permutation"""
+    value = ((value ^ (value >> 30)) * 0xbf58476d1ce4e5b9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94d049bb133111eb) & MASK64
+    return value ^ (value >> 31)
+
+class SeededPermutation:
+    """Keyed bijection on range(size), using the swap-or-not shuffle
+
+    Each round pairs x with (K - x) mod size and swaps the pair when a keyed
+    bit of the pair is set. Every round is an involution, so the composition
+    is a permutation for any size, with no cycle-walking or retries.
+    """
+
+    def __init__(self, size, key, rounds=24):
+        self.size = size
+        self.round_keys = []
+        for round_index in range(rounds):
+            round_key = _mix64((key + round_index * 0x9e3779b97f4a7c15) & MASK64)
+            self.round_keys.append((round_key % size, _mix64(round_key)))
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        x = index
+        for offset, salt in self.round_keys:
+            partner = (offset - x) % self.size
+            if _mix64(max(x, partner) ^ salt) & 1:
+                x = partner
+        return x
+
+class IdSpace:
+    """A finite identifier space: ``size`` integers and how to format one"""
+
+    def __init__(self, size, formatter):
+        self.size = size
+        self.formatter = formatter
+
+def _ssn(n):
+    """Mixed-radix SSN: area 100-999, group 10-99, serial 1000-9999"""
+    area, rest = divmod(n, 90 * 9000)
+    group, serial = divmod(rest, 9000)
+    return f"{100 + area}-{10 + group}-{1000 + serial}"
+
+def _case_number(n):
+    """Case number: filing year 2020-2024, sequence 1000-9999"""
+    year, sequence = divmod(n, 9000)
+    return f"CV-{2020 + year}-{1000 + sequence}"
+
+# Identifier spaces, matching the formats of the original provider methods
+ID_SPACES = {
+    'medical_record_number': IdSpace(900000, lambda n: f"MRN-{100000 + n}"),
+    'insurance_id': IdSpace(9000000, lambda n: f"INS-{1000000 + n}"),
+    'case_number': IdSpace(5 * 9000, _case_number),
+    'docket_number': IdSpace(900000, lambda n: f"DC-{100000 + n}"),
+    'student_id': IdSpace(900000, lambda n: f"STU{100000 + n}"),
+    'employee_id': IdSpace(900000, lambda n: f"EMP-{100000 + n}"),
+    'account_number': IdSpace(900000000, lambda n: f"{100000000 + n}"),
+    'ssn': IdSpace(900 * 90 * 9000, _ssn),
+}
+
+class IdAllocator:
+    """Hands out unique identifiers per space, starting at position ``start``
+
+    Allocators built with the same seed share the same permutations, so a
+    shard whose records start at ``start`` and draw one identifier of each kind
+    per record uses positions [start, start + count) and cannot collide with
+    any other shard of the run.
+    """
+
+    def __init__(self, seed=42, start=0):
+        self.seed = seed
+        self.start = start
+        self._permutations = {}
+        self._positions = {}
+
+    def _permutation(self, space_name):
+        if space_name not in self._permutations:
+            digest = hashlib.sha256(f"{self.seed}:{space_name}".encode()).digest()
+            key = int.from_bytes(digest[:8], 'big')
+            self._permutations[space_name] = SeededPermutation(ID_SPACES[space_name].size, key)
+        return self._permutations[space_name]
+
+    def next(self, space_name):
+        """Allocate the next identifier of a space"""
+        space = ID_SPACES[space_name]
+        position = self._positions.get(space_name, self.start)
+        if position >= space.size:
+            raise ValueError(f"Identifier space '{space_name}' exhausted: only {space.size} unique values exist")
+        self._positions[space_name] = position + 1
+        return space.formatter(self._permutation(space_name)[position])
+
+def id_capacity(space_names):
+    """Largest number of records that can draw one identifier from each of the given spaces"""
+    return min(ID_SPACES[name].size for name in space_names)
@@ -0,0 +1,84 @@
+"""Deferred construction of heavy dependencies shared by the dataset generators"""
+from faker import Faker
+
+from fast_providers import FastContactProvider
+
+DEFAULT_LOCALE = 'en_US'
+
+# Standard Faker providers the generators actually call. Everything else in
+# Faker's default set (lorem, python, profile, automotive, ...) is never loaded.
+CORE_FAKER_PROVIDERS = [
+    'faker.providers.person',
+    'faker.providers.address',
+    'faker.providers.phone_number',
+    'faker.providers.ssn',
+    'faker.providers.date_time',
+    'faker.providers.misc',
+    'faker.providers.company',
+    'faker.providers.internet',
+]
+
+
+class LazyFaker:
+    """Class attribute that builds a seeded Faker instance on first access
+
+    The owning generator must set ``self.seed`` in its ``__init__``. The
+    Faker instance (with the given custom providers registered) is cached on
+    the generator, so only the first access pays the construction cost.
+    FastContactProvider replaces Faker's address() and phone_number().
+    """
+
+    def __init__(self, *provider_classes, providers=None):
+        self.provider_classes = provider_classes
+        self.providers = providers or CORE_FAKER_PROVIDERS
+        self.name = 'fake'
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+
+        # Cache on the instance so later lookups bypass the descriptor
+        fake = self.build(instance)
+        instance.__dict__[self.name] = fake
+        return fake
+
+    def build(self, instance, locale=DEFAULT_LOCALE):
+        """The generator's Faker for ``locale``, built on first use and cached per locale
+
+        All Faker instances draw from Faker's shared random source, which is
+        seeded when the generator's first one is built, so switching locales
+        between records keeps the run reproducible.
+        """
+        fakers = instance.__dict__.setdefault('_fakers', {})
+        fake = fakers.get(locale)
+        if fake is not None:
+            return fake
+
+        if locale == DEFAULT_LOCALE:
+            fake = Faker(providers=list(self.providers))
+            fake.add_provider(FastContactProvider)
+            for provider_class in self.provider_classes:
+                fake.add_provider(provider_class)
+        else:
+            # Locale providers go last: their ssn() (the national identifier) wins
+            from locales import LOCALE_FAKER_PROVIDERS, LOCALES, check_locale
+            fake = Faker(check_locale(locale), providers=list(self.providers) + LOCALE_FAKER_PROVIDERS)
+            for provider_class in list(self.provider_classes) + LOCALES[locale]['providers']:
+                fake.add_provider(provider_class)
+        if not fakers:
+            Faker.seed(instance.seed)
+        fakers[locale] = fake
+        return fake
+
+def reseed_fakers(instance, seed):
+    """Restart a generator's Faker random source from ``seed``
+
+    Fakers already built are reseeded now; otherwise the first one is seeded
+    with ``seed`` when it is built.
+    """
+    instance.seed = seed
+    if instance.__dict__.get('_fakers'):
+        Faker.seed(seed)
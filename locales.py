@@ -0,0 +1,238 @@
+"""Locales for record generation: Faker locale, national identifiers and PII patterns
+
+The generators are written for en_US. For every other locale a generator
+builds a second Faker (lazily, once per locale, see LazyFaker.build) whose
+names, addresses, phone numbers and IBANs come from Faker's locale
+providers, and whose ``ssn()`` returns the locale's national identifier. The
+domain's PII type map is localized the same way: US-specific patterns (SSN,
+phone, ZIP code) are replaced by the locale's and locale identifiers such as
+IBAN and NHS numbers are added. Each localized map is compiled once per
+process (domain_engine.compile_pii_types).
+
+Record templates, dates and amounts stay in the generators' US format; only
+the identity and identifier values change with the locale.
+"""
+from faker.providers import BaseProvider
+from faker.providers.ssn.fr_FR import Provider as FRSsnProvider
+from faker.providers.ssn.it_IT import Provider as ITSsnProvider
+from faker.providers.ssn.nl_NL import Provider as NLSsnProvider
+
+from lazy_loading import DEFAULT_LOCALE
+
+def bsn_is_valid(number):
+    """Dutch BSN 11-proof: 9*d1 + 8*d2 + ... + 2*d8 - d9 is a multiple of 11"""
+    digits = [int(digit) for digit in number]
+    return sum(weight * digit for weight, digit in zip((9, 8, 7, 6, 5, 4, 3, 2, -1), digits)) % 11 == 0
+
+# Letters of name-like words in any alphabet (the en_US patterns only cover A-Z)
+WORD = r'[^\W\d_]'
+
+def phone_pattern(country_code):
+    """International (+CC, optional (0)) or national (0..., (0...)) phone numbers of a country"""
+    return (rf'(?:\+{country_code}\s?(?:\(0\)\s?)?\d[\d .-]{{5,13}}\d|\(0\d{{1,5}}\)[\s-]?\d[\d .-]{{3,11}}\d'
+            rf'|\b0\d[\d .-]{{5,13}}\d)\b')
+
+IBAN_PATTERN = r'\b[A-Z]{2}\d{2}(?: ?[A-Z0-9]{4}){2,7}(?: ?[A-Z0-9]{1,3})?\b'
+
+# Patterns shared by the non-US locales
+EU_PII_TYPES = {
+    'PERSON_NAME': rf'\b{WORD}{WORD}+ {WORD}{WORD}+\b',
+    'IBAN': IBAN_PATTERN,
+}
+
+class GBIdentifierProvider(BaseProvider):
+    """en_GB national identifiers: National Insurance and NHS numbers"""
+    prefix_first = 'ABCEGHJKLMNOPRSTWXYZ'
+    prefix_second = 'ABCEGHJKLMNPRSTWXYZ'
+    invalid_prefixes = {'BG', 'GB', 'KN', 'NK', 'NT', 'TN', 'ZZ'}
+
+    def ssn(self):
+        """National Insurance number, e.g. 'AB 12 34 56 C'"""
+        rng = self.generator.random
+        while True:
+            prefix = rng.choice(self.prefix_first) + rng.choice(self.prefix_second)
+            if prefix not in self.invalid_prefixes:
+                break
+        digits = f"{rng.randrange(10 ** 6):06d}"
+        return f"{prefix} {digits[:2]} {digits[2:4]} {digits[4:]} {rng.choice('ABCD')}"
+
+    def nhs_number(self):
+        """NHS number with a valid modulus 11 check digit, e.g. '943 476 5919'"""
+        rng = self.generator.random
+        while True:
+            digits = [rng.randrange(10) for _ in range(9)]
+            check = 11 - sum(digit * (10 - position) for position, digit in enumerate(digits)) % 11
+            if check == 11:
+                check = 0
+            if check != 10:
+                break
+        number = ''.join(map(str, digits)) + str(check)
+        return f"{number[:3]} {number[3:6]} {number[6:]}"
+
+class DEIdentifierProvider(BaseProvider):
+    """de_DE national identifier: the tax identification number (Steuer-ID)"""
+
+    def ssn(self):
+        """Steuerliche Identifikationsnummer with an ISO 7064 check digit, e.g. '12 345 678 903'"""
+        rng = self.generator.random
+        digits = [rng.randrange(1, 10)] + [rng.randrange(10) for _ in range(9)]
+        product = 10
+        for digit in digits:
+            total = (digit + product) % 10 or 10
+            product = total * 2 % 11
+        check = (11 - product) % 10
+        number = ''.join(map(str, digits)) + str(check)
+        return f"{number[:2]} {number[2:5]} {number[5:8]} {number[8:]}"
+
+class ESIdentifierProvider(BaseProvider):
+    """es_ES national identifier: DNI number with its check letter"""
+
+    def ssn(self):
+        """DNI, e.g. '12345678Z'"""
+        number = self.generator.random.randrange(10 ** 7, 10 ** 8)
+        return f"{number}{'TRWAGMYFPDXBNJZSQVHLCKE'[number % 23]}"
+
+class ITCityProvider(BaseProvider):
+    """it_IT city names in a fixed order
+
+    Faker's it_IT address provider collects its cities in a set, so their
+    order (and the city a seeded run draws) changes with PYTHONHASHSEED.
+    The sorted list is built on the first call, not when locales is imported.
+    """
+    cities = None
+
+    def city(self):
+        if ITCityProvider.cities is None:
+            from faker.providers.address.it_IT import Provider as ITAddressProvider
+            ITCityProvider.cities = tuple(sorted(ITAddressProvider.cities))
+        return self.random_element(self.cities)
+
+# Locale registry. 'providers' are added after the domain's own providers, so
+# their ssn() (the national identifier; Faker's where it has a correct one)
+# wins; 'pii_types' replace or extend the domain's map (a pattern, or a
+# (pattern, check) pair, see domain_engine.CheckedPattern), 'replaces'
+# renames US-specific types, 'health_id' is the (label, method) of a national
+# health number carried by medical records.
+LOCALES = {
+    'en_US': {
+        'providers': [],
+        'pii_types': {},
+        'replaces': {},
+        'health_id': None,
+        'iban': False,
+    },
+    'en_GB': {
+        'providers': [GBIdentifierProvider],
+        'pii_types': {
+            **EU_PII_TYPES,
+            'PHONE': phone_pattern(44),
+            'NATIONAL_INSURANCE_NUMBER': r'\b[A-Z]{2} ?\d{2} ?\d{2} ?\d{2} ?[A-D]\b',
+            'POSTCODE': r'\b[A-Z]{1,2}\d[A-Z\d]? ?\d[A-Z]{2}\b',
+            'NHS_NUMBER': r'\b\d{3} \d{3} \d{4}\b',
+        },
+        'replaces': {'SSN': 'NATIONAL_INSURANCE_NUMBER', 'ZIP_CODE': 'POSTCODE'},
+        'health_id': ('NHS Number', 'nhs_number'),
+        'iban': True,
+    },
+    'de_DE': {
+        'providers': [DEIdentifierProvider],
+        'pii_types': {
+            **EU_PII_TYPES,
+            'PHONE': phone_pattern(49),
+            'TAX_ID': r'\b\d{2} ?\d{3} ?\d{3} ?\d{3}\b',
+            'ADDRESS': rf'\d+\s+\w+\s+\w+|\b{WORD}+(?:straße|str\.|gasse|weg|platz|allee|ring|damm)\s+\d+(?:-\d+)?\b',
+        },
+        'replaces': {'SSN': 'TAX_ID'},
+        'health_id': None,
+        'iban': True,
+    },
+    'fr_FR': {
+        'providers': [FRSsnProvider],
+        'pii_types': {
+            **EU_PII_TYPES,
+            'PHONE': phone_pattern(33),
+            'NIR': r'\b[12] ?\d{2} ?\d{2} ?(?:\d{2}|2[AB]) ?\d{3} ?\d{3} ?\d{2}\b',
+            'ADDRESS': rf'\d+\s+\w+\s+\w+|\b\d+,\s+(?:rue|avenue|boulevard|chemin|place|impasse|allée|quai|route)\s+{WORD}+',
+        },
+        'replaces': {'SSN': 'NIR'},
+        'health_id': None,
+        'iban': True,
+    },
+    'es_ES': {
+        'providers': [ESIdentifierProvider],
+        'pii_types': {
+            **EU_PII_TYPES,
+            'PHONE': phone_pattern(34) + r'|\b[6789]\d{2}(?: ?\d{2,3}){2,3}\b',
+            'DNI': r'\b\d{8}-?[A-Z]\b',
+        },
+        'replaces': {'SSN': 'DNI'},
+        'health_id': None,
+        'iban': True,
+    },
+    'it_IT': {
+        'providers': [ITSsnProvider, ITCityProvider],
+        'pii_types': {
+            **EU_PII_TYPES,
+            'PHONE': phone_pattern(39) + r'|\b3\d{8,10}\b',
+            'CODICE_FISCALE': r'\b[A-Z]{6}\d{2}[A-Z]\d{2}[A-Z]\d{3}[A-Z]\b',
+        },
+        'replaces': {'SSN': 'CODICE_FISCALE'},
+        'health_id': None,
+        'iban': True,
+    },
+    'nl_NL': {
+        'providers': [NLSsnProvider],
+        'pii_types': {
+            **EU_PII_TYPES,
+            'PHONE': phone_pattern(31),
+            # Only 11-proof numbers, so 9-digit account numbers are not also found as BSNs
+            'BSN': (r'\b\d{9}\b', bsn_is_valid),
+            'POSTCODE': r'\b\d{4} ?[A-Z]{2}\b',
+        },
+        'replaces': {'SSN': 'BSN', 'ZIP_CODE': 'POSTCODE'},
+        'health_id': None,
+        'iban': True,
+    },
+}
+
+# Faker providers a non-US locale needs on top of the generators' core set
+LOCALE_FAKER_PROVIDERS = ['faker.providers.bank']
+
+def check_locale(locale):
+    if locale not in LOCALES:
+        raise ValueError(f"Unsupported locale '{locale}'; supported: {', '.join(LOCALES)}")
+    return locale
+
+def parse_locales(spec):
+    """Parse 'de_DE' or 'en_GB:2,de_DE,fr_FR:0.5' into {locale: weight}"""
+    weights = {}
+    for item in spec.split(','):
+        locale, _, weight = item.strip().partition(':')
+        weights[check_locale(locale)] = float(weight) if weight else 1.0
+        if weights[locale] <= 0:
+            raise ValueError(f"Locale weight for {locale} must be positive, got {weights[locale]}")
+    return weights
+
+_localized_pii_types = {}
+
+def localize_pii_types(pii_types, locale):
+    """The PII type map of a domain for ``locale`` (cached per map and locale)
+
+    US-specific types listed in the locale's 'replaces' are swapped in place
+    for their local equivalents (so findings keep the map's order); the
+    locale's other patterns override or follow the domain's own.
+    """
+    if locale == DEFAULT_LOCALE:
+        return pii_types
+    key = (tuple(pii_types.items()), locale)
+    localized = _localized_pii_types.get(key)
+    if localized is None:
+        spec = LOCALES[locale]
+        localized = {}
+        for pii_type, pattern in pii_types.items():
+            pii_type = spec['replaces'].get(pii_type, pii_type)
+            localized[pii_type] = spec['pii_types'].get(pii_type, pattern)
+        for pii_type, pattern in spec['pii_types'].items():
+            localized.setdefault(pii_type, pattern)
+        _localized_pii_types[key] = localized
+    return localized
@@ -0,0 +1,90 @@
+"""Long documents for detector throughput testing
+
+A long document chains many record sections (each a complete
+``full_record_text``) into one file of a requested size, the way a discharge
+summary, case file or account statement accumulates entries. For the domains
+whose prompt generator runs without a source file (legal, education), PII
+prompts are interleaved as correspondence notes between the sections.
+
+The text is written as it is produced and every finding is written to a
+JSONL span file with its offset shifted to the document position, so neither
+the document nor its findings are ever held in memory as a whole. Offsets
+are character positions in the document, like ``pii_findings`` in records.
+"""
+import json
+import re
+
+# Heading of each domain's long document and the label of its sections
+DOCUMENT_TITLES = {
+    'medical': ('CONTINUITY OF CARE RECORD', 'PATIENT ENCOUNTER'),
+    'finance': ('CONSOLIDATED CUSTOMER STATEMENT', 'CUSTOMER FILE'),
+    'legal': ('CASE FILE COMPILATION', 'MATTER'),
+    'education': ('DISTRICT STUDENT RECORDS FILE', 'STUDENT FILE'),
+    'hr': ('EMPLOYEE PERSONNEL FILE', 'EMPLOYEE'),
+}
+
+# A correspondence note follows every NOTE_INTERVAL-th section
+NOTE_INTERVAL = 3
+
+def parse_size(value):
+    """Parse a size such as '500KB', '10MB' or '2048' into bytes"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?)B?\s*', str(value).upper())
+    if not match:
+        raise ValueError(f"Invalid size '{value}'; expected e.g. 100KB, 10MB or a number of bytes")
+    number, unit = match.groups()
+    return int(float(number) * {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}[unit])
+
+class LongDocumentWriter:
+    """Append text fragments to a document file and their findings to a span file"""
+
+    def __init__(self, text_file, spans_file):
+        self.text_file = text_file
+        self.spans_file = spans_file
+        self.characters = 0
+        self.bytes = 0
+        self.findings = 0
+
+    def write(self, text, findings=(), section=None):
+        """Append ``text``; ``findings`` carry offsets relative to it"""
+        for finding in findings:
+            span = dict(finding)
+            span['start_index'] += self.characters
+            span['end_index'] += self.characters
+            if section is not None:
+                span['section'] = section
+            self.spans_file.write(json.dumps(span) + '\n')
+            self.findings += 1
+        self.text_file.write(text)
+        self.characters += len(text)
+        self.bytes += len(text.encode('utf-8'))
+
+def write_long_document(domain, make_record, make_note, target_bytes, text_path, spans_path):
+    """Chain records (and notes) into a document of at least ``target_bytes`` bytes
+
+    ``make_record()`` returns a record with ``full_record_text`` and
+    ``pii_findings``; ``make_note()`` returns a prompt record (with ``prompt``
+    and ``pii_findings``) or is None. Returns the document statistics.
+    """
+    title, section_label = DOCUMENT_TITLES[domain]
+    sections = 0
+    notes = 0
+    with open(text_path, 'w', encoding='utf-8', newline='') as text_file, \
+            open(spans_path, 'w', encoding='utf-8') as spans_file:
+        writer = LongDocumentWriter(text_file, spans_file)
+        writer.write(f"{title}\n{'=' * len(title)}\n\n")
+        while writer.bytes < target_bytes:
+            record = make_record()
+            sections += 1
+            writer.write(f"--- {section_label} {sections} ---\n")
+            writer.write(record['full_record_text'], record['pii_findings'], section=sections)
+            writer.write('\n\n')
+            if make_note is not None and sections % NOTE_INTERVAL == 0:
+                note = make_note()
+                notes += 1
+                writer.write(f"Correspondence note {notes}: ")
+                writer.write(note['prompt'], note['pii_findings'], section=sections)
+                writer.write('\n\n')
+        writer.write(f"END OF {title} ({sections} sections)\n")
+    return {'path': text_path, 'spans_path': spans_path, 'bytes': writer.bytes,
+            'characters': writer.characters, 'sections': sections, 'notes': notes,
+            'pii_findings': writer.findings}
@@ -0,0 +1,199 @@
+"""Seeded noise for rendered texts, with PII offsets remapped in the same pass
+
+Detectors see typos, OCR confusions, odd casing and whitespace, and SSNs or
+phone numbers written in other formats; the generated texts are clean. The
+Perturber applies these at configurable rates:
+
+    typo        per letter: keyboard-neighbour substitution, deletion or doubling
+    ocr         per confusable character: O/0, l/1, S/5, B/8, ... and m -> rn
+    casing      per word: the whole word upper- or lower-cased
+    whitespace  per space: doubled, dropped or turned into a line break
+    reformat    per SSN/PHONE finding: the value rewritten in another format
+
+Same-length changes are made on the code point array with numpy. Changes
+that alter the length are collected as (start, end, replacement) edits whose
+length deltas go into one array; its cumulative sum maps every original
+offset to its new position, so all ``pii_findings`` are remapped with two
+array lookups instead of rescanning the text.
+"""
+import numpy as np
+
+NOISE_KINDS = ['typo', 'ocr', 'casing', 'whitespace', 'reformat']
+DEFAULT_NOISE_RATES = {'typo': 0.01, 'ocr': 0.005, 'casing': 0.02, 'whitespace': 0.01, 'reformat': 0.3}
+
+KEYBOARD_NEIGHBOURS = {
+    'q': 'wa', 'w': 'qes', 'e': 'wrd', 'r': 'etf', 't': 'ryg', 'y': 'tuh', 'u': 'yij', 'i': 'uok',
+    'o': 'ipl', 'p': 'ol', 'a': 'qsz', 's': 'awdz', 'd': 'sefx', 'f': 'drgc', 'g': 'fthv', 'h': 'gyjb',
+    'j': 'hukn', 'k': 'jilm', 'l': 'kop', 'z': 'asx', 'x': 'zsdc', 'c': 'xdfv', 'v': 'cfgb', 'b': 'vghn',
+    'n': 'bhjm', 'm': 'njk',
+}
+OCR_CONFUSIONS = {
+    'O': '0', '0': 'O', 'o': '0', 'l': '1', '1': 'l', 'I': 'l', 'S': '5', '5': 'S',
+    'B': '8', '8': 'B', 'Z': '2', '2': 'Z', 'g': '9', 'e': 'c',
+}
+
+SSN_FORMATS = ['{0}{1}{2}-{3}{4}-{5}{6}{7}{8}', '{0}{1}{2} {3}{4} {5}{6}{7}{8}', '{0}{1}{2}{3}{4}{5}{6}{7}{8}',
+               '{0}{1}{2}.{3}{4}.{5}{6}{7}{8}']
+PHONE_FORMATS = ['{0}{1}{2}-{3}{4}{5}-{6}{7}{8}{9}', '({0}{1}{2}) {3}{4}{5}-{6}{7}{8}{9}',
+                 '{0}{1}{2}.{3}{4}{5}.{6}{7}{8}{9}', '{0}{1}{2}{3}{4}{5}{6}{7}{8}{9}',
+                 '+1 {0}{1}{2} {3}{4}{5} {6}{7}{8}{9}']
+REFORMATS = {'SSN': (9, SSN_FORMATS), 'PHONE': (10, PHONE_FORMATS)}
+
+def _lookup_tables():
+    """ASCII lookup tables for neighbour typos and OCR substitutions"""
+    neighbours = np.zeros((128, 4), dtype=np.uint32)
+    neighbour_counts = np.zeros(128, dtype=np.int64)
+    for letter, keys in KEYBOARD_NEIGHBOURS.items():
+        for case in (str.lower, str.upper):
+            code = ord(case(letter))
+            neighbour_counts[code] = len(keys)
+            neighbours[code, :len(keys)] = [ord(case(key)) for key in keys]
+    ocr = np.arange(128, dtype=np.uint32)
+    for source, target in OCR_CONFUSIONS.items():
+        ocr[ord(source)] = ord(target)
+    ocr_eligible = ocr != np.arange(128)
+    ocr_eligible[ord('m')] = True
+    return neighbours, neighbour_counts, ocr, ocr_eligible
+
+NEIGHBOURS, NEIGHBOUR_COUNTS, OCR_TABLE, OCR_ELIGIBLE = _lookup_tables()
+
+def parse_noise_rates(spec):
+    """Parse 'default' or 'typo=0.02,casing=0.05,...' (unlisted kinds are off)"""
+    if spec in (None, '', 'default'):
+        return dict(DEFAULT_NOISE_RATES)
+    rates = dict.fromkeys(NOISE_KINDS, 0.0)
+    for item in spec.split(','):
+        kind, separator, value = item.partition('=')
+        kind = kind.strip()
+        if kind not in rates or not separator:
+            raise ValueError(f"Invalid noise rate '{item}'; expected KIND=RATE with KIND in {', '.join(NOISE_KINDS)}")
+        rate = float(value)
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError(f"Noise rate for {kind} must be between 0 and 1, got {rate}")
+        rates[kind] = rate
+    return rates
+
+class Perturber:
+    """Apply seeded noise to texts and remap their PII findings"""
+
+    def __init__(self, rates=None):
+        self.rates = dict(DEFAULT_NOISE_RATES if rates is None else rates)
+        unknown = set(self.rates) - set(NOISE_KINDS)
+        if unknown:
+            raise ValueError(f"Unknown noise kind(s) {sorted(unknown)}; expected {NOISE_KINDS}")
+
+    def _reformat_edits(self, text, findings, rng):
+        """(start, end, replacement) edits rewriting SSN and phone findings, non-overlapping"""
+        rate = self.rates.get('reformat', 0.0)
+        edits = []
+        if not rate:
+            return edits
+        last_end = -1
+        for finding in sorted(findings, key=lambda finding: finding['start_index']):
+            spec = REFORMATS.get(finding['pii_type'])
+            if spec is None or finding['start_index'] < last_end or rng.random() >= rate:
+                continue
+            value = text[finding['start_index']:finding['end_index']]
+            digits = [character for character in value if character.isdigit()]
+            size, formats = spec
+            if len(digits) != size:
+                continue
+            alternatives = [fmt for fmt in formats if fmt.format(*digits) != value]
+            replacement = alternatives[int(rng.integers(len(alternatives)))].format(*digits)
+            edits.append((finding['start_index'], finding['end_index'], replacement))
+            last_end = finding['end_index']
+        return edits
+
+    def perturb(self, text, findings, rng):
+        """Return (noisy_text, remapped_findings); ``rng`` is a numpy Generator"""
+        length = len(text)
+        if not length:
+            return text, [dict(finding) for finding in findings]
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).copy()
+        ascii_codes = np.where(codes < 128, codes, 0)
+        edits = self._reformat_edits(text, findings, rng)
+        protected = np.zeros(length, dtype=bool)
+        for start, end, _ in edits:
+            protected[start:end] = True
+
+        # Casing: whole words upper- or lower-cased (no length change)
+        is_letter = ((ascii_codes | 32) >= 97) & ((ascii_codes | 32) <= 122)
+        casing_rate = self.rates.get('casing', 0.0)
+        if casing_rate:
+            word_starts = is_letter & ~np.concatenate(([False], is_letter[:-1]))
+            word_ids = np.cumsum(word_starts) - 1
+            word_count = int(word_starts.sum())
+            picked = rng.random(word_count) < casing_rate
+            upper = rng.random(word_count) < 0.5
+            chosen = is_letter & ~protected & picked[word_ids]
+            codes[chosen & upper[word_ids]] &= ~np.uint32(32)
+            codes[chosen & ~upper[word_ids]] |= np.uint32(32)
+
+        # One uniform draw per character decides typo / OCR / whitespace noise
+        draws = rng.random(length)
+        actions = rng.random(length)
+        typo_rate = self.rates.get('typo', 0.0)
+        ocr_rate = self.rates.get('ocr', 0.0)
+        whitespace_rate = self.rates.get('whitespace', 0.0)
+        typo = is_letter & ~protected & (draws < typo_rate)
+        ocr = OCR_ELIGIBLE[ascii_codes] & (codes < 128) & ~protected & (draws >= typo_rate) & (draws < typo_rate + ocr_rate)
+        space = (codes == 32) & ~protected & (draws < whitespace_rate)
+
+        # Same-length substitutions on the code point array
+        substitute = typo & (actions < 0.6) & (NEIGHBOUR_COUNTS[ascii_codes] > 0)
+        positions = np.flatnonzero(substitute)
+        choice = (rng.random(len(positions)) * NEIGHBOUR_COUNTS[ascii_codes[positions]]).astype(np.int64)
+        codes[positions] = NEIGHBOURS[ascii_codes[positions], choice]
+        ocr_same = ocr & (ascii_codes != ord('m'))
+        codes[ocr_same] = OCR_TABLE[ascii_codes[ocr_same]]
+        codes[space & (actions >= 2 / 3)] = ord('\n')
+        noisy = codes.tobytes().decode('utf-32-le')
+
+        # Length-changing edits: typo deletions/doublings, m -> rn, doubled/dropped spaces
+        for position in np.flatnonzero(typo & (actions >= 0.6) & (actions < 0.8)):
+            edits.append((position, position + 1, ''))
+        for position in np.flatnonzero(typo & (actions >= 0.8)):
+            edits.append((position, position + 1, noisy[position] * 2))
+        for position in np.flatnonzero(ocr & (ascii_codes == ord('m'))):
+            edits.append((position, position + 1, 'rn' if noisy[position] == 'm' else 'RN'))
+        for position in np.flatnonzero(space & (actions < 1 / 3)):
+            edits.append((position, position + 1, '  '))
+        for position in np.flatnonzero(space & (actions >= 1 / 3) & (actions < 2 / 3)):
+            edits.append((position, position + 1, ''))
+        if not edits and not findings:
+            return noisy, []
+
+        edits.sort(key=lambda edit: edit[0])
+        pieces = []
+        previous = 0
+        deltas = np.zeros(length, dtype=np.int64)
+        for start, end, replacement in edits:
+            pieces.append(noisy[previous:start])
+            pieces.append(replacement)
+            previous = end
+            deltas[end - 1] += len(replacement) - (end - start)
+        pieces.append(noisy[previous:])
+        result = ''.join(pieces)
+
+        # Offset i moves by the length change of every edit ending before it
+        shift = np.concatenate(([0], np.cumsum(deltas)))
+        starts = np.fromiter((finding['start_index'] for finding in findings), dtype=np.int64, count=len(findings))
+        ends = np.fromiter((finding['end_index'] for finding in findings), dtype=np.int64, count=len(findings))
+        new_starts = (starts + shift[starts]).tolist()
+        new_ends = (ends + shift[ends]).tolist()
+        remapped = []
+        for finding, start, end in zip(findings, new_starts, new_ends):
+            finding = dict(finding)
+            finding.update(start_index=start, end_index=end, value=result[start:end], length=end - start)
+            remapped.append(finding)
+        return result, remapped
+
+    def perturb_record(self, record, text_field, rng):
+        """Perturb ``record[text_field]`` in place, along with its findings and length"""
+        text, findings = self.perturb(record[text_field], record.get('pii_findings', []), rng)
+        record[text_field] = text
+        if 'pii_findings' in record:
+            record['pii_findings'] = findings
+        if 'prompt_length' in record:
+            record['prompt_length'] = len(text)
+        return record
@@ -0,0 +1,297 @@
+"""Unified command-line entry point for the PII dataset generators
+
+Stages and domains are subcommands; the scale knobs (record count, workers,
+output format, shard size, seed) are arguments instead of values hard-coded
+in each script's main().
+
+Examples:
+    python piigen.py records medical --count 50000 --workers 8 --format jsonl --shard-size 5000
+    python piigen.py population --size 100000 --output people.pop
+    python piigen.py records finance --count 100000 --population people.pop
+    python piigen.py records medical --count 10000 --where department=Oncology --where condition_severity=Critical
+    python piigen.py records finance --count 10000 --locale en_GB:2,de_DE,fr_FR
+    python piigen.py plan medical --count 10000000 --workers 16 --format jsonl --memory-budget 32GB --disk-budget 500GB
+    python piigen.py coordinator medical --queue /shared/queue --count 1000000 --output-dir /shared/out
+    python piigen.py worker --queue /shared/queue        # on every node, as many times as wanted
+    python piigen.py prompts legal --count 1000 --noise typo=0.02,casing=0.05,reformat=0.5
+    python piigen.py documents legal --size 10MB --count 2 --workers 2
+    python piigen.py prompts finance --source finance/financial_dataset.csv --count 1000
+    python piigen.py prompts legal --count 1000000 --workers 8 --format jsonl
+    python piigen.py prompts medical --source medical_org_dataset.csv --count 1000 --row-sampling permutation
+    python piigen.py prompts finance --source-records 20000 --count 100000 --workers 4
+    python piigen.py prompts legal --count 1000 --pii-ratio 0.5 --format csv
+    python piigen.py prompts legal --count 10000 --target pii_type:BAR_NUMBER=1000 --target role_context:Paralegal=2000
+    python piigen.py report medical out/medical_org_dataset-*.jsonl --output medical_summary.txt
+    python piigen.py detect medical out/medical_org_dataset-*.jsonl --output-dir relabelled --detection-cache pii.cache
+    python piigen.py dedup out/employer_prompts_legal-*.jsonl --output-dir deduped --threshold 0.8 --duplicate-cap 50
+"""
+import argparse
+import os
+import sys
+import time
+
+from long_documents import parse_size
+from pipeline import (DOMAINS, OUTPUT_FORMATS, PROMPT_CHUNK_SIZE, build_population, dedup_files, detect_files,
+                      generate_long_documents, generate_prompts, generate_records, stream_records, write_report)
+from row_sampling import ROW_SAMPLING_MODES
+
+def add_output_arguments(parser):
+    """Arguments shared by the stages that write datasets"""
+    parser.add_argument('domain', choices=sorted(DOMAINS))
+    parser.add_argument('--count', type=int, default=1000, help='number of records/prompts to generate')
+    parser.add_argument('--seed', type=int, default=42, help='seed for reproducible output')
+    parser.add_argument('--format', dest='output_format', choices=OUTPUT_FORMATS, default='json',
+                        help='output file format')
+    parser.add_argument('--shard-size', type=int, default=10000, help='records per output file')
+    parser.add_argument('--output-dir', default='.', help='directory for the output files')
+    parser.add_argument('--prefix', default=None, help='output file prefix (defaults to the domain prefix)')
+    parser.add_argument('--noise', nargs='?', const='default', default=None, metavar='KIND=RATE,...',
+                        help='perturb the rendered texts (typo, ocr, casing, whitespace, reformat); '
+                             'without rates the defaults are used')
+
+def parse_constraints(items):
+    """Turn ``FIELD=VALUE[|VALUE...]`` arguments into a constraints dict"""
+    constraints = {}
+    for item in items or []:
+        field, separator, values = item.partition('=')
+        if not separator or not field or not values:
+            raise argparse.ArgumentTypeError(f"invalid constraint '{item}', expected FIELD=VALUE[|VALUE...]")
+        constraints.setdefault(field.strip(), []).extend(value.strip() for value in values.split('|'))
+    return constraints
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='piigen', description='Generate PII detection datasets')
+    stages = parser.add_subparsers(dest='stage', required=True)
+
+    population = stages.add_parser('population', help='generate the shared person table used across domains')
+    population.add_argument('--size', type=int, default=100000, help='number of people in the population')
+    population.add_argument('--seed', type=int, default=42, help='seed for reproducible output')
+    population.add_argument('--output', default='population.pop', help='population file to write')
+
+    records = stages.add_parser('records', help='generate source records (patients, customers, cases, students)')
+    add_output_arguments(records)
+    records.add_argument('--workers', type=int, default=1, help='worker processes generating shards in parallel')
+    records.add_argument('--population', default=None,
+                         help='population file to draw patients/customers/clients/parents from')
+    records.add_argument('--no-resume', dest='resume', action='store_false',
+                         help='ignore an existing checkpoint and regenerate every shard')
+    records.add_argument('--where', action='append', metavar='FIELD=VALUE[|VALUE...]',
+                         help='only generate records matching this constraint (repeatable); '
+                              'for account_types, case_types and courses the values are required members')
+    records.add_argument('--detection-cache', default=None, metavar='PATH',
+                         help='persistent PII detection cache to reuse and extend (see detection_cache.py)')
+    records.add_argument('--locale', dest='locales', default=None, metavar='LOCALE[:WEIGHT],...',
+                         help='locale mix of the records, e.g. de_DE or en_GB:2,de_DE,fr_FR (default en_US)')
+
+    coordinator = stages.add_parser('coordinator', help='queue a records run for workers on several machines')
+    add_output_arguments(coordinator)
+    coordinator.add_argument('--queue', required=True, help='queue directory on a filesystem shared by all nodes')
+    coordinator.add_argument('--population', default=None,
+                             help='population file to draw patients/customers/clients/parents from')
+    coordinator.add_argument('--where', action='append', metavar='FIELD=VALUE[|VALUE...]',
+                             help='only generate records matching this constraint (repeatable)')
+    coordinator.add_argument('--locale', dest='locales', default=None, metavar='LOCALE[:WEIGHT],...',
+                             help='locale mix of the records (default en_US)')
+    coordinator.add_argument('--stale-after', type=float, default=600.0,
+                             help='seconds without a heartbeat from its worker after which a claimed shard is handed to '
+                                  'another worker')
+    coordinator.add_argument('--no-wait', dest='wait', action='store_false',
+                             help='only queue the shards; rerun without --no-wait to collect the results')
+
+    worker = stages.add_parser('worker', help='generate shards from a queue created by the coordinator')
+    worker.add_argument('--queue', required=True, help='queue directory on a filesystem shared by all nodes')
+    worker.add_argument('--worker-id', default=None, help='name recorded for finished shards (default host-pid)')
+    worker.add_argument('--poll-interval', type=float, default=1.0,
+                        help='seconds between checks while the remaining shards are claimed elsewhere')
+
+    plan = stages.add_parser('plan', help='estimate time, memory and output size of a records run without running it')
+    plan.add_argument('domain', choices=sorted(DOMAINS))
+    plan.add_argument('--count', type=int, default=1000, help='number of records the run would generate')
+    plan.add_argument('--workers', type=int, default=1, help='worker processes the run would use')
+    plan.add_argument('--shard-size', type=int, default=10000, help='records per output file')
+    plan.add_argument('--format', dest='output_format', choices=OUTPUT_FORMATS, default='json',
+                      help='output file format')
+    plan.add_argument('--memory-budget', type=parse_size, default=None, help='RAM available to the run, e.g. 16GB')
+    plan.add_argument('--disk-budget', type=parse_size, default=None, help='disk space for the output, e.g. 200GB')
+    plan.add_argument('--calibration-records', type=int, default=200,
+                      help='records generated to measure per-record costs')
+    plan.add_argument('--seed', type=int, default=42, help='seed for the calibration sample')
+
+    documents = stages.add_parser('documents', help='generate long documents (with span files) for throughput tests')
+    documents.add_argument('domain', choices=sorted(DOMAINS))
+    documents.add_argument('--size', type=parse_size, default=parse_size('1MB'),
+                           help='minimum size of each document, e.g. 100KB or 10MB')
+    documents.add_argument('--count', type=int, default=1, help='number of documents')
+    documents.add_argument('--seed', type=int, default=42, help='seed for reproducible output')
+    documents.add_argument('--workers', type=int, default=1, help='worker processes writing documents in parallel')
+    documents.add_argument('--output-dir', default='.', help='directory for the output files')
+    documents.add_argument('--prefix', default=None, help='output file prefix (defaults to <records prefix>_long)')
+
+    prompts = stages.add_parser('prompts', help='generate employer prompts with PII labels')
+    add_output_arguments(prompts)
+    prompts.add_argument('--pii-ratio', type=float, default=0.5, help='fraction of prompts containing PII')
+    prompts.add_argument('--source', default=None,
+                         help='records CSV to draw entities from (medical and finance need it or --source-records)')
+    prompts.add_argument('--source-records', type=int, default=None, metavar='COUNT',
+                         help='generate COUNT source records (as the records stage would with --seed) in this '
+                              'process and draw entities from them directly, with no CSV in between')
+    prompts.add_argument('--row-sampling', choices=ROW_SAMPLING_MODES, default='random',
+                         help="how source rows are drawn: 'random' (with replacement) or 'permutation' "
+                              "(every row once before any repeats)")
+    prompts.add_argument('--detection-cache', default=None, metavar='PATH',
+                         help='persistent PII detection cache to reuse and extend (legal and education)')
+    prompts.add_argument('--workers', type=int, default=1, help='worker processes generating prompt chunks in parallel')
+    prompts.add_argument('--chunk-size', type=int, default=PROMPT_CHUNK_SIZE,
+                         help='prompts per seeded generation chunk (the output depends on it, not on --workers)')
+    prompts.add_argument('--target', action='append', default=None, metavar='KIND:NAME=COUNT',
+                         help='minimum prompts per template, PII type or context value, e.g. pii_type:SSN=2000, '
+                              'template:pii-3=500, role_context:Paralegal=300 (repeatable)')
+
+    detect = stages.add_parser('detect', help='rerun PII detection over generated JSON/JSONL files')
+    detect.add_argument('domain', choices=sorted(DOMAINS))
+    detect.add_argument('inputs', nargs='+', help='generated .json or .jsonl files')
+    detect.add_argument('--kind', choices=['records', 'prompts'], default='records',
+                        help='whether the inputs are source records or prompts')
+    detect.add_argument('--output-dir', required=True, help='directory for the relabelled files')
+    detect.add_argument('--detection-cache', default=None, metavar='PATH',
+                        help='persistent cache; only PII types whose pattern changed since it was filled are rescanned')
+
+    dedup = stages.add_parser('dedup', help='drop exact and near-duplicate prompts from generated JSON/JSONL files')
+    dedup.add_argument('inputs', nargs='+', help='generated .json or .jsonl prompt files, in order')
+    dedup.add_argument('--output-dir', required=True, help='directory for the deduplicated files')
+    dedup.add_argument('--threshold', type=float, default=0.8,
+                       help='estimated Jaccard similarity (character shingles) from which prompts are near duplicates')
+    dedup.add_argument('--num-perm', type=int, default=64, help='MinHash permutations per signature')
+    dedup.add_argument('--duplicate-cap', action='append', default=None, metavar='[TEMPLATE_ID=]N',
+                       help='duplicates kept per template: N for every template, TEMPLATE_ID=N for one (repeatable)')
+
+    report = stages.add_parser('report', help='rebuild the summary report from generated JSON/JSONL files')
+    report.add_argument('domain', choices=sorted(DOMAINS))
+    report.add_argument('inputs', nargs='+', help='generated .json or .jsonl files, in order')
+    report.add_argument('--kind', choices=['records', 'prompts'], default='records',
+                        help='whether the inputs are source records or prompts')
+    report.add_argument('--output', default=None, help='report file name')
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, 'noise', None):
+        from perturbation import parse_noise_rates
+        try:
+            args.noise = parse_noise_rates(args.noise)
+        except ValueError as error:
+            print(f"Error: {error}")
+            return 2
+    if getattr(args, 'locales', None):
+        from locales import parse_locales
+        try:
+            args.locales = parse_locales(args.locales)
+        except ValueError as error:
+            print(f"Error: {error}")
+            return 2
+    start = time.perf_counter()
+
+    if args.stage == 'population':
+        paths = [build_population(args.size, seed=args.seed, path=args.output)]
+    elif args.stage == 'records':
+        try:
+            constraints = parse_constraints(args.where)
+        except argparse.ArgumentTypeError as error:
+            print(f"Error: {error}")
+            return 2
+        try:
+            paths = generate_records(args.domain, args.count, seed=args.seed, shard_size=args.shard_size,
+                                     workers=args.workers, output_format=args.output_format,
+                                     output_dir=args.output_dir, prefix=args.prefix,
+                                     population_path=args.population, resume=args.resume,
+                                     constraints=constraints, noise=args.noise, locales=args.locales,
+                                     detection_cache=args.detection_cache)
+        except ValueError as error:
+            print(f"Error: {error}")
+            return 2
+    elif args.stage == 'coordinator':
+        from work_queue import submit_job, wait_for_job
+        try:
+            constraints = parse_constraints(args.where)
+        except argparse.ArgumentTypeError as error:
+            print(f"Error: {error}")
+            return 2
+        try:
+            job = submit_job(args.queue, args.domain, args.count, seed=args.seed, shard_size=args.shard_size,
+                             output_format=args.output_format, output_dir=args.output_dir, prefix=args.prefix,
+                             population_path=args.population, constraints=constraints, noise=args.noise,
+                             locales=args.locales)
+        except ValueError as error:
+            print(f"Error: {error}")
+            return 2
+        print(f"Queued {job['shards']} shards in {args.queue}")
+        if not args.wait:
+            return 0
+        stats = wait_for_job(args.queue, stale_after=args.stale_after)['stats']
+        print(f"{stats['records']} records, {stats['pii_findings']} PII findings")
+        paths = [job['checkpoint']]
+    elif args.stage == 'worker':
+        from work_queue import run_worker
+        generated = run_worker(args.queue, worker_id=args.worker_id, poll_interval=args.poll_interval)
+        print(f"Generated {generated} shard(s); all shards of the job are done")
+        paths = []
+    elif args.stage == 'plan':
+        from planner import plan_run
+        print(plan_run(args.domain, args.count, workers=args.workers, shard_size=args.shard_size,
+                       output_format=args.output_format, memory_budget=args.memory_budget,
+                       disk_budget=args.disk_budget, sample_size=args.calibration_records, seed=args.seed))
+        return 0
+    elif args.stage == 'documents':
+        paths = generate_long_documents(args.domain, args.count, args.size, seed=args.seed, workers=args.workers,
+                                        output_dir=args.output_dir, prefix=args.prefix)
+    elif args.stage == 'prompts':
+        if DOMAINS[args.domain]['prompts_module'] is None:
+            print(f"Error: the {args.domain} domain has no prompt generator")
+            return 2
+        if args.source and args.source_records:
+            print("Error: use either --source or --source-records, not both")
+            return 2
+        if DOMAINS[args.domain]['prompts_need_source'] and not (args.source or args.source_records):
+            print(f"Error: the {args.domain} prompt generator needs --source <records CSV> or --source-records COUNT")
+            return 2
+        from coverage import parse_targets
+        source = args.source
+        if args.source_records:
+            source = stream_records(args.domain, args.source_records, seed=args.seed)
+        try:
+            paths = generate_prompts(args.domain, args.count, seed=args.seed, pii_ratio=args.pii_ratio,
+                                     source=source, shard_size=args.shard_size,
+                                     output_format=args.output_format, output_dir=args.output_dir,
+                                     prefix=args.prefix, noise=args.noise, row_sampling=args.row_sampling,
+                                     detection_cache=args.detection_cache, workers=args.workers,
+                                     chunk_size=args.chunk_size, targets=parse_targets(args.target))
+        except ValueError as error:
+            print(f"Error: {error}")
+            return 2
+    elif args.stage == 'detect':
+        try:
+            paths = detect_files(args.domain, args.kind, args.inputs, args.output_dir,
+                                 detection_cache=args.detection_cache)
+        except ValueError as error:
+            print(f"Error: {error}")
+            return 2
+    elif args.stage == 'dedup':
+        from dedup import parse_duplicate_caps
+        try:
+            default_cap, caps = parse_duplicate_caps(args.duplicate_cap)
+            paths = dedup_files(args.inputs, args.output_dir, threshold=args.threshold, num_perm=args.num_perm,
+                                default_cap=default_cap, caps=caps)
+        except ValueError as error:
+            print(f"Error: {error}")
+            return 2
+    else:
+        filename = args.output or f"{args.domain}_{args.kind}_report.txt"
+        paths = [write_report(args.domain, args.kind, args.inputs, filename)]
+
+    elapsed = time.perf_counter() - start
+    print(f"\n{args.stage.capitalize()} stage complete in {elapsed:.1f}s")
+    print(f"Files created: {', '.join(paths)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
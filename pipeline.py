@@ -0,0 +1,728 @@
+"""Shard-based generation pipeline shared by the piigen CLI"""
+import hashlib
+import importlib
+import json
+import os
+import random
+import socket
+
+OUTPUT_FORMATS = ['json', 'jsonl', 'csv']
+
+# Registry of the domains. Generator classes are referenced by module name so
+# that a run only imports the domain it actually generates. Domains defined by
+# a DomainSpec (domain_engine.py) have no prompt generator.
+DOMAINS = {
+    'medical': {
+        'records_module': 'create_dataset',
+        'records_class': 'MedicalDatasetGenerator',
+        'record_method': 'generate_patient_record',
+        'records_prefix': 'medical_org_dataset',
+        'records_list_fields': ['unique_pii_types'],
+        'records_id_spaces': ['medical_record_number', 'insurance_id'],
+        'records_provider': 'MedicalProvider',
+        'records_shared_tables': ['dept_medications', 'dept_diagnoses'],
+        'prompts_module': 'create_medical_prompt_dataset',
+        'prompts_class': 'MedicalPromptGenerator',
+        'prompts_prefix': 'employer_prompts_medical',
+        'prompts_need_source': True,
+        'prompts_json_fields': ['pii_findings'],
+        'prompts_list_fields': ['unique_pii_types'],
+    },
+    'finance': {
+        'records_module': 'create_financial_dataset',
+        'records_class': 'FinancialDatasetGenerator',
+        'record_method': 'generate_customer_record',
+        'records_prefix': 'financial_dataset',
+        'records_list_fields': ['unique_pii_types', 'account_types'],
+        'records_id_spaces': ['account_number', 'ssn'],
+        'records_provider': 'FinancialProvider',
+        'records_shared_tables': ['account_transactions', 'income_account_mapping', 'credit_products',
+                                  'investment_products', 'bank_branches'],
+        'prompts_module': 'create_prompt_dataset',
+        'prompts_class': 'EmployerPromptGenerator',
+        'prompts_prefix': 'employer_prompts_finance',
+        'prompts_need_source': True,
+        'prompts_json_fields': ['pii_findings'],
+        'prompts_list_fields': ['unique_pii_types'],
+    },
+    'legal': {
+        'records_module': 'create_legal_dataset',
+        'records_class': 'LegalDatasetGenerator',
+        'record_method': 'generate_legal_record',
+        'records_prefix': 'legal_dataset',
+        'records_list_fields': ['unique_pii_types', 'case_types', 'credentials'],
+        'records_id_spaces': ['case_number', 'docket_number'],
+        'records_provider': 'LegalProvider',
+        'records_shared_tables': ['practice_area_cases', 'client_service_mapping', 'court_jurisdictions',
+                                  'legal_documents'],
+        'prompts_module': 'create_legal_prompt_dataset',
+        'prompts_class': 'LegalPromptGenerator',
+        'prompts_prefix': 'employer_prompts_legal',
+        'prompts_need_source': False,
+        'prompts_json_fields': ['pii_findings', 'source_entities'],
+        'prompts_list_fields': ['unique_pii_types'],
+    },
+    'education': {
+        'records_module': 'create_education_dataset',
+        'records_class': 'EducationDatasetGenerator',
+        'record_method': 'generate_student_record',
+        'records_prefix': 'education_dataset',
+        'records_list_fields': ['unique_pii_types', 'courses', 'interventions', 'services'],
+        'records_id_spaces': ['student_id'],
+        'records_provider': 'EducationProvider',
+        'records_shared_tables': ['grade_level_courses', 'performance_interventions', 'student_services',
+                                  'institution_types', 'academic_departments', 'assessments', 'extracurriculars'],
+        'prompts_module': 'create_education_prompt_dataset',
+        'prompts_class': 'EducationPromptGenerator',
+        'prompts_prefix': 'employer_prompts_education',
+        'prompts_need_source': False,
+        'prompts_json_fields': ['pii_findings', 'source_entities'],
+        'prompts_list_fields': ['unique_pii_types'],
+    },
+    'hr': {
+        'records_module': 'create_hr_dataset',
+        'records_class': 'HRDatasetGenerator',
+        'record_method': 'generate_record',
+        'records_prefix': 'hr_dataset',
+        'records_list_fields': ['unique_pii_types'],
+        'records_id_spaces': ['employee_id'],
+        'records_provider': 'HRProvider',
+        'records_shared_tables': ['department_titles'],
+        'prompts_module': None,
+        'prompts_class': None,
+        'prompts_prefix': None,
+        'prompts_need_source': False,
+        'prompts_json_fields': [],
+        'prompts_list_fields': [],
+    },
+}
+
+def load_generator_class(domain, stage):
+    """Import and return the generator class for a domain and stage ('records' or 'prompts')"""
+    spec = DOMAINS[domain]
+    if spec[f'{stage}_module'] is None:
+        raise ValueError(f"The {domain} domain has no {stage} generator")
+    module = importlib.import_module(spec[f'{stage}_module'])
+    return getattr(module, spec[f'{stage}_class'])
+
+def publish_shared_tables(domain, path):
+    """Write the domain provider's mapping tables and the weighted pools to a file the workers map read-only"""
+    from distributions import alias_tables
+    from fast_providers import CompiledTables
+    from shared_tables import write_shared_tables
+    spec = DOMAINS[domain]
+    provider = getattr(importlib.import_module(spec['records_module']), spec['records_provider'])(None)
+    tables = {name: getattr(provider, name) for name in spec['records_shared_tables']}
+    return write_shared_tables(tables, path, {**alias_tables(), **CompiledTables().alias_tables()})
+
+def derive_seed(seed, shard_index):
+    """Derive an independent, reproducible seed for one shard of a run"""
+    digest = hashlib.sha256(f"{seed}:{shard_index}".encode()).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+def plan_shards(total, shard_size):
+    """Split a run into (shard_index, start, count) tuples"""
+    shard_size = max(1, shard_size)
+    return [(index, start, min(shard_size, total - start))
+            for index, start in enumerate(range(0, total, shard_size))]
+
+def shard_path(output_dir, prefix, shard_index, output_format):
+    """Path of one output shard"""
+    return os.path.join(output_dir, f"{prefix}-{shard_index:05d}.{output_format}")
+
+def generate_record_shard(domain, seed, shard_index, num_records, start=0, population_path=None, constraints=None,
+                          locales=None, detection_cache=None):
+    """Generate the records of one shard
+
+    Both Faker's random source and the module-level ``random`` used by some
+    providers are seeded from (seed, shard_index), so a shard's content does
+    not depend on which worker produces it or in what order. Identifiers are
+    allocated from run-wide permutations at positions [start, start + n), so
+    they are unique across all shards. With a population file, record
+    ``start + i`` of the run is person ``start + i``. ``constraints`` is
+    passed to the domain's record builder (see its compile_constraints).
+    ``locales`` ({locale: weight}) sets the locale mix of the records.
+    ``detection_cache`` is the path of a persistent detection store
+    (detection_cache.DetectionStore) that PII findings are read from and
+    added to.
+    """
+    from identifiers import IdAllocator
+    shard_seed = derive_seed(seed, shard_index)
+    random.seed(shard_seed)
+    generator_class = load_generator_class(domain, 'records')
+    id_allocator = IdAllocator(seed, start=start)
+    if population_path:
+        from population import open_population
+        generator = generator_class(seed=shard_seed, population=open_population(population_path),
+                                    population_offset=start, id_allocator=id_allocator)
+    else:
+        generator = generator_class(seed=shard_seed, id_allocator=id_allocator)
+    if locales:
+        generator.use_locales(locales)
+    make_record = generator.record_maker()
+    if not detection_cache:
+        return [make_record(constraints) for _ in range(num_records)]
+    from detection_cache import DetectionStore
+    generator.detection_store = DetectionStore(detection_cache)
+    try:
+        return [make_record(constraints) for _ in range(num_records)]
+    finally:
+        generator.detection_store.close()
+
+def stream_records(domain, total, seed=42, shard_size=10000):
+    """Records of a records run, generated shard by shard in this process and nothing written
+
+    Yields the records generate_records would write with the same seed and
+    shard size, so prompt generators can read them without a CSV round trip
+    (see generate_prompts).
+    """
+    for shard_index, start, count in plan_shards(total, shard_size):
+        yield from generate_record_shard(domain, seed, shard_index, count, start)
+
+def perturb_records(records, text_field, rates, seed):
+    """Apply seeded noise to each record's text and remap its findings (see perturbation.py)"""
+    import numpy as np
+    from perturbation import Perturber
+    perturber = Perturber(rates)
+    rng = np.random.default_rng(derive_seed(seed, 'noise'))
+    for record in records:
+        perturber.perturb_record(record, text_field, rng)
+    return records
+
+def build_population(size, seed=42, path='population.pop'):
+    """Generate the shared person table once and persist it for the record stage"""
+    from population import PopulationStore
+    population = PopulationStore.generate(size, seed=seed)
+    return population.save(path)
+
+def flatten_for_csv(records, json_fields, list_fields):
+    """Flatten nested fields the same way the generators' save_dataset does"""
+    csv_records = []
+    for record in records:
+        csv_record = record.copy()
+        for field in json_fields:
+            if field in csv_record:
+                csv_record[field] = json.dumps(record[field])
+        for field in list_fields:
+            if field in csv_record:
+                csv_record[field] = ', '.join(record[field])
+        csv_records.append(csv_record)
+    return csv_records
+
+def write_records(records, path, output_format, json_fields=('pii_findings',), list_fields=()):
+    """Write records to a single file in the requested format"""
+    if output_format == 'json':
+        with open(path, 'w') as f:
+            json.dump(records, f, indent=2, default=str)
+    elif output_format == 'jsonl':
+        with open(path, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record, default=str) + '\n')
+    elif output_format == 'csv':
+        import pandas as pd
+        df = pd.DataFrame(flatten_for_csv(records, json_fields, list_fields))
+        df.to_csv(path, index=False)
+    else:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    return path
+
+def iter_records(path):
+    """Records of one JSON or JSONL output file; JSONL files are streamed line by line"""
+    if path.endswith('.jsonl'):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif path.endswith('.json'):
+        with open(path) as f:
+            yield from json.load(f)
+    else:
+        raise ValueError(f"Cannot read records from {path}: expected .json or .jsonl")
+
+def read_records(paths):
+    """Read records back from JSON or JSONL output files, in the given order"""
+    records = []
+    for path in paths:
+        records.extend(iter_records(path))
+    return records
+
+def replace_durably(temp_path, path):
+    """Flush ``temp_path`` to disk and atomically move it to ``path``"""
+    with open(temp_path, 'rb+') as f:
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+def worker_temp_path(path):
+    """Temporary name of ``path`` unique to this host and process
+
+    Two workers writing the same shard (a claim that went stale, see
+    work_queue.py) then never write the same file; each moves a complete
+    copy into place.
+    """
+    return f"{path}.{socket.gethostname()}-{os.getpid()}.part"
+
+def write_json_atomic(data, path):
+    """Write a small JSON file so that readers only ever see a complete version"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    replace_durably(temp_path, path)
+
+def shard_stats(records):
+    """Per-shard statistics kept in the checkpoint so a resumed run can report totals"""
+    pii_types = {}
+    for record in records:
+        for finding in record.get('pii_findings', []):
+            pii_types[finding['pii_type']] = pii_types.get(finding['pii_type'], 0) + 1
+    return {
+        'records': len(records),
+        'pii_findings': sum(pii_types.values()),
+        'pii_types': pii_types,
+    }
+
+def merge_stats(stats_list):
+    """Sum per-shard statistics"""
+    merged = {'records': 0, 'pii_findings': 0, 'pii_types': {}}
+    for stats in stats_list:
+        merged['records'] += stats['records']
+        merged['pii_findings'] += stats['pii_findings']
+        for pii_type, count in stats['pii_types'].items():
+            merged['pii_types'][pii_type] = merged['pii_types'].get(pii_type, 0) + count
+    merged['pii_types'] = dict(sorted(merged['pii_types'].items(), key=lambda item: (-item[1], item[0])))
+    return merged
+
+def run_record_shard(task):
+    """Worker entry point: generate one shard and write it to disk
+
+    ``task`` is a (domain, seed, shard_index, start, num_records, path,
+    output_format, population_path, constraints, noise, locales,
+    detection_cache) tuple. With
+    ``noise`` rates the rendered texts are perturbed before the shard is
+    written. The shard is written to a temporary file of this process and
+    moved into place once it is on disk, so a shard path only ever holds a
+    complete shard, even when two workers generate the same shard.
+    Returns (shard_index, path, stats).
+    """
+    (domain, seed, shard_index, start, num_records, path, output_format, population_path, constraints, noise,
+     locales, detection_cache) = task
+    records = generate_record_shard(domain, seed, shard_index, num_records, start, population_path, constraints,
+                                    locales, detection_cache)
+    if noise:
+        perturb_records(records, 'full_record_text', noise, derive_seed(seed, shard_index))
+    spec = DOMAINS[domain]
+    temp_path = worker_temp_path(path)
+    write_records(records, temp_path, output_format, list_fields=spec['records_list_fields'])
+    replace_durably(temp_path, path)
+    return shard_index, path, shard_stats(records)
+
+def checkpoint_path(output_dir, prefix):
+    """Path of the checkpoint file of a record run"""
+    return os.path.join(output_dir, f"{prefix}.checkpoint.json")
+
+def load_checkpoint(path, run):
+    """Return the completed shards recorded for ``run``, or an empty dict
+
+    A checkpoint written by a run with different parameters is refused rather
+    than silently mixed with the new output.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint['run'] != run:
+        raise ValueError(f"{path} belongs to a run with different parameters "
+                         f"({checkpoint['run']}); use another output directory or --no-resume")
+    return {int(index): stats for index, stats in checkpoint['completed'].items()}
+
+def plan_record_run(domain, total, seed=42, shard_size=10000, output_format='json', output_dir='.', prefix=None,
+                    population_path=None, constraints=None, noise=None, locales=None, detection_cache=None):
+    """Validate a record run and split it into shard tasks
+
+    Returns (run, tasks, progress_path): the run parameters recorded in the
+    checkpoint, one run_record_shard task per shard, and the checkpoint path.
+    The detection cache does not change the output, so it is not part of the
+    run parameters.
+    """
+    from identifiers import id_capacity
+    capacity = id_capacity(DOMAINS[domain]['records_id_spaces'])
+    if total > capacity:
+        raise ValueError(f"{domain} identifiers allow at most {capacity} unique records, {total} requested")
+    if population_path:
+        from population import open_population
+        size = len(open_population(population_path))
+        if total > size:
+            raise ValueError(f"The population {population_path} has {size} people but {total} records were "
+                             f"requested; every record needs its own person")
+
+    if constraints:
+        constraints = {field: [value] if isinstance(value, str) else list(value)
+                       for field, value in constraints.items()}
+        load_generator_class(domain, 'records')(seed=seed).compile_constraints(constraints)
+    
+    if locales:
+        from locales import check_locale
+        for locale in locales:
+            check_locale(locale)
+    
+    prefix = prefix or DOMAINS[domain]['records_prefix']
+    tasks = [(domain, seed, index, start, count, shard_path(output_dir, prefix, index, output_format),
+              output_format, population_path, constraints or None, noise or None, locales or None,
+              detection_cache or None)
+             for index, start, count in plan_shards(total, shard_size)]
+    run = {'domain': domain, 'total': total, 'seed': seed, 'shard_size': shard_size,
+           'output_format': output_format, 'population': population_path, 'constraints': constraints or None,
+           'noise': noise or None, 'locales': locales or None}
+    return run, tasks, checkpoint_path(output_dir, prefix)
+
+def checkpoint_data(run, shard_count, completed):
+    """Checkpoint contents for a run with ``completed`` {shard_index: stats}"""
+    return {
+        'run': run,
+        'next_shard': min((index for index in range(shard_count) if index not in completed), default=shard_count),
+        'completed': {str(index): completed[index] for index in sorted(completed)},
+        'stats': merge_stats(completed.values()),
+    }
+
+def generate_records(domain, total, seed=42, shard_size=10000, workers=1,
+                     output_format='json', output_dir='.', prefix=None, population_path=None,
+                     resume=True, constraints=None, noise=None, locales=None, detection_cache=None):
+    """Generate ``total`` records as shard files, optionally across worker processes
+
+    ``population_path`` points at a file written by build_population; the
+    primary person of each record is then drawn from that shared population.
+    ``constraints`` maps record fields to a value or a list of allowed values
+    (e.g. ``{'department': 'Oncology', 'condition_severity': 'Critical'}``);
+    every record satisfies them and they are checked before any shard starts.
+    ``noise`` maps noise kinds to rates (see perturbation.py); the record
+    texts are then perturbed and their findings remapped. ``locales`` maps
+    locales to weights (see locales.parse_locales); records are then drawn
+    from that locale mix and tagged with their locale. ``detection_cache``
+    is a persistent detection store shared by all workers (see
+    detection_cache.DetectionStore).
+
+    Progress is recorded in ``<prefix>.checkpoint.json`` after every shard.
+    Rerunning the same command skips the shards already on disk; since every
+    shard depends only on (seed, shard index), the result is identical to an
+    uninterrupted run. Returns the list of shard paths in shard order.
+    """
+    run, tasks, progress_path = plan_record_run(domain, total, seed, shard_size, output_format, output_dir, prefix,
+                                                population_path, constraints, noise, locales, detection_cache)
+    os.makedirs(output_dir, exist_ok=True)
+    paths = [task[5] for task in tasks]
+
+    # Shards recorded in the checkpoint and still on disk are not regenerated
+    completed = load_checkpoint(progress_path, run) if resume else {}
+    completed = {index: stats for index, stats in completed.items() if os.path.exists(paths[index])}
+    pending = [task for task in tasks if task[2] not in completed]
+    if completed:
+        print(f"Resuming from checkpoint: {len(completed)}/{len(tasks)} shards already complete")
+
+    def record_progress(shard_index, path, stats):
+        completed[shard_index] = stats
+        write_json_atomic(checkpoint_data(run, len(tasks), completed), progress_path)
+        print(f"Shard {shard_index + 1}/{len(tasks)} written: {path} ({stats['records']} records)")
+
+    if workers > 1 and len(pending) > 1:
+        # Workers map one copy of the provider tables instead of each building their own
+        import multiprocessing
+        import tempfile
+        from shared_tables import attach_shared_tables
+        with tempfile.TemporaryDirectory() as tables_dir:
+            tables_path = publish_shared_tables(domain, os.path.join(tables_dir, f"{domain}.tables"))
+            with multiprocessing.Pool(processes=min(workers, len(pending)), initializer=attach_shared_tables,
+                                      initargs=(tables_path,)) as pool:
+                for result in pool.imap(run_record_shard, pending):
+                    record_progress(*result)
+    else:
+        for task in pending:
+            record_progress(*run_record_shard(task))
+
+    stats = merge_stats(completed.values())
+    print(f"{stats['records']} records, {stats['pii_findings']} PII findings")
+    return paths
+
+def write_sharded(records, output_dir, prefix, output_format, shard_size, json_fields=(), list_fields=()):
+    """Split an in-memory dataset into shard files and return their paths"""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for index, start, count in plan_shards(len(records), shard_size):
+        path = shard_path(output_dir, prefix, index, output_format)
+        write_records(records[start:start + count], path, output_format, json_fields, list_fields)
+        paths.append(path)
+    return paths
+
+# Prompts per generation chunk. Chunks are seeded from (seed, chunk index), so a
+# prompt run depends on the chunk size but not on the number of workers.
+PROMPT_CHUNK_SIZE = 5000
+
+# The prompt generator built by this process: ((domain, seed, source, row_sampling), generator)
+_prompt_generator = (None, None)
+
+def prompt_generator(domain, seed=42, source=None, row_sampling='random'):
+    """The domain's prompt generator, built once per process and run
+
+    generate_prompts builds it before starting its workers, so forked workers
+    share the parent's source entity table (copy-on-write, never written to)
+    instead of each reading the CSV again. ``source`` is a records CSV path or
+    in-memory records (see generate_prompts); records are read into a new
+    generator on every call, which is then kept under ``source=None``.
+    """
+    global _prompt_generator
+    in_memory = source is not None and not isinstance(source, str)
+    key = (domain, seed, None if in_memory else source, row_sampling)
+    if in_memory or _prompt_generator[0] != key:
+        generator_class = load_generator_class(domain, 'prompts')
+        if in_memory:
+            generator = generator_class(seed=seed, row_sampling=row_sampling, records=source)
+        elif DOMAINS[domain]['prompts_need_source']:
+            generator = generator_class(source, seed=seed, row_sampling=row_sampling)
+        else:
+            generator = generator_class(seed=seed)
+        _prompt_generator = (key, generator)
+    return _prompt_generator[1]
+
+def run_prompt_chunk(task):
+    """Worker entry point: generate the prompt records of one chunk of a coverage plan
+
+    ``task`` is a (domain, seed, source, row_sampling, chunk_index, slots,
+    row_offset, detection_cache) tuple, ``slots`` the chunk's coverage plan
+    slots (see coverage.CoveragePlan.slots). The generator's random streams
+    (the module-level ``random``, Faker and the row sampler) are reseeded
+    from (seed, chunk index), so a chunk's content does not depend on which
+    worker produces it or in what order. In 'permutation' row sampling the
+    chunk reads the run's row permutations from draw ``row_offset`` on.
+    """
+    domain, seed, source, row_sampling, chunk_index, slots, row_offset, detection_cache = task
+    generator = prompt_generator(domain, seed, source, row_sampling)
+    generator.reseed(derive_seed(seed, f"prompts:{chunk_index}"), row_offset)
+    if not (detection_cache and hasattr(generator, 'find_pii_in_prompt')):
+        return generator.generate_planned_records(slots)
+    from detection_cache import DetectionStore
+    generator.detection_store = DetectionStore(detection_cache)
+    try:
+        return generator.generate_planned_records(slots)
+    finally:
+        generator.detection_store.close()
+        generator.detection_store = None
+
+def generate_prompts(domain, total, seed=42, pii_ratio=0.5, source=None, shard_size=10000,
+                     output_format='json', output_dir='.', prefix=None, noise=None, row_sampling='random',
+                     detection_cache=None, workers=1, chunk_size=PROMPT_CHUNK_SIZE, targets=None):
+    """Generate a prompt dataset for a domain and write it as shard files (perturbed with ``noise`` rates)
+
+    ``source`` is the records CSV of the domains whose prompts are filled from
+    source records (medical, finance), or the records themselves: a list or
+    iterator of records (e.g. stream_records) or a prompt generator's entity
+    table, read in this process without a CSV round trip. Workers inherit
+    in-memory records by forking; where processes cannot fork they run in
+    this process. ``row_sampling`` selects how the source rows are drawn:
+    'random' or 'permutation' (see row_sampling.py). Generators that
+    scan their prompts for PII read and add findings to the persistent
+    ``detection_cache`` store when one is given.
+
+    A coverage plan (coverage.py) fixes the template and context values of
+    every prompt and their order, meeting ``targets`` ({kind: {name: count}},
+    see coverage.parse_targets) exactly. Prompts are generated in plan chunks
+    of ``chunk_size``, each seeded from (seed, chunk index), optionally across
+    ``workers`` processes, and merged in plan order, so the output does not
+    depend on ``workers``.
+    """
+    from coverage import plan_coverage
+    import multiprocessing
+    spec = DOMAINS[domain]
+    in_memory = source is not None and not isinstance(source, str)
+    if spec['prompts_need_source'] and source is None:
+        raise ValueError(f"The {domain} prompt generator needs a source records CSV or records")
+    if in_memory and not spec['prompts_need_source']:
+        raise ValueError(f"The {domain} prompt generator does not read source records")
+    if in_memory and 'fork' not in multiprocessing.get_all_start_methods():
+        workers = 1
+
+    generator = prompt_generator(domain, seed, source, row_sampling)
+    catalog = generator.template_catalog()
+    plan = plan_coverage(catalog, total, pii_ratio, targets, generator.coverage_contexts(),
+                         seed=derive_seed(seed, 'coverage'))
+    # Workers find in-memory records in the generator they inherit, kept under source=None
+    task_source = None if in_memory else source
+    tasks = [(domain, seed, task_source, row_sampling, chunk_index, plan.slots(start, start + count),
+              plan.row_offset(start), detection_cache)
+             for chunk_index, start, count in plan_shards(total, chunk_size)]
+    print(f"Generating {total} {domain} prompts over {len(catalog)} templates in {len(tasks)} chunks...")
+    
+    dataset = []
+    def collect(task, records):
+        dataset.extend(records)
+        print(f"Chunk {task[4] + 1}/{len(tasks)} generated ({len(records)} prompts)")
+    
+    if workers > 1 and len(tasks) > 1:
+        context = multiprocessing.get_context('fork') if in_memory else multiprocessing
+        with context.Pool(processes=min(workers, len(tasks))) as pool:
+            for task, records in zip(tasks, pool.imap(run_prompt_chunk, tasks)):
+                collect(task, records)
+    else:
+        for task in tasks:
+            collect(task, run_prompt_chunk(task))
+    if noise:
+        perturb_records(dataset, 'prompt', noise, seed)
+
+    return write_sharded(dataset, output_dir, prefix or spec['prompts_prefix'], output_format, shard_size,
+                         spec['prompts_json_fields'], spec['prompts_list_fields'])
+
+def run_long_document(task):
+    """Worker entry point: write one long document and its span file
+
+    ``task`` is a (domain, seed, document_index, target_bytes, text_path,
+    spans_path) tuple. Both files are written under temporary names and moved
+    into place once complete. Returns the document statistics.
+    """
+    from long_documents import write_long_document
+    domain, seed, document_index, target_bytes, text_path, spans_path = task
+    spec = DOMAINS[domain]
+    document_seed = derive_seed(seed, document_index)
+    random.seed(document_seed)
+    records = load_generator_class(domain, 'records')(seed=document_seed)
+    make_record = getattr(records, spec['record_method'])
+    make_note = None
+    if spec['prompts_module'] and not spec['prompts_need_source']:
+        prompts = load_generator_class(domain, 'prompts')(seed=document_seed)
+        make_note = lambda: prompts.generate_prompt_record(target_contains_pii=True)
+    
+    stats = write_long_document(domain, make_record, make_note, target_bytes,
+                                text_path + '.part', spans_path + '.part')
+    replace_durably(spans_path + '.part', spans_path)
+    replace_durably(text_path + '.part', text_path)
+    stats.update(path=text_path, spans_path=spans_path)
+    return stats
+
+def generate_long_documents(domain, count, size, seed=42, workers=1, output_dir='.', prefix=None):
+    """Write ``count`` long documents of at least ``size`` bytes each
+
+    Each document is ``<prefix>-<index>.txt`` with its findings (global
+    character offsets) in ``<prefix>-<index>.spans.jsonl``. Documents are
+    seeded from (seed, document index), so the output does not depend on
+    ``workers``. Returns the document paths.
+    """
+    prefix = prefix or f"{DOMAINS[domain]['records_prefix']}_long"
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(domain, seed, index, size, shard_path(output_dir, prefix, index, 'txt'),
+              shard_path(output_dir, prefix, index, 'spans.jsonl'))
+             for index in range(count)]
+    
+    def report(stats):
+        print(f"Document written: {stats['path']} ({stats['bytes']} bytes, "
+              f"{stats['sections']} sections, {stats['pii_findings']} PII findings)")
+    
+    if workers > 1 and count > 1:
+        import multiprocessing
+        with multiprocessing.Pool(processes=min(workers, count)) as pool:
+            for stats in pool.imap(run_long_document, tasks):
+                report(stats)
+    else:
+        for task in tasks:
+            report(run_long_document(task))
+    return [task[4] for task in tasks]
+
+def redetect_records(records, generator, stage):
+    """Replace the findings of generated records (or prompts) with the generator's current detection"""
+    from lazy_loading import DEFAULT_LOCALE
+    for record in records:
+        if stage == 'records':
+            locale = record.get('locale', DEFAULT_LOCALE)
+            if locale != generator.locale:
+                generator.set_locale(locale)
+            findings = generator.find_pii_in_text(record['full_record_text'])
+        else:
+            findings = generator.find_pii_in_prompt(record['prompt'])
+            record['contains_pii'] = bool(findings)
+            if 'source_entities' in record:
+                record['source_entities'] = generator.extract_source_entities(record['prompt'], findings)
+                record['entity_count'] = len(record['source_entities'])
+        record['pii_findings'] = findings
+        record['pii_count'] = len(findings)
+        record['unique_pii_types'] = list(dict.fromkeys(finding['pii_type'] for finding in findings))
+    return records
+
+def detect_files(domain, stage, paths, output_dir, detection_cache=None):
+    """Rerun PII detection over generated JSON/JSONL files with the current patterns
+
+    Each input is rewritten to ``output_dir`` under its own name. With a
+    ``detection_cache`` store, texts and patterns seen by an earlier run are
+    read back instead of rescanned, so after a pattern change only the
+    changed PII types are scanned again. Returns the output paths.
+    """
+    for path in paths:
+        if os.path.abspath(os.path.join(output_dir, os.path.basename(path))) == os.path.abspath(path):
+            raise ValueError(f"Refusing to overwrite the input {path}; choose another output directory")
+    generator = load_generator_class(domain, stage)(seed=0)
+    if stage == 'prompts' and not hasattr(generator, 'find_pii_in_prompt'):
+        raise ValueError(f"{domain} prompts are labelled while they are built; there is no detection to rerun")
+    store = None
+    if detection_cache:
+        from detection_cache import DetectionStore
+        store = generator.detection_store = DetectionStore(detection_cache)
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = []
+    try:
+        for path in paths:
+            records = redetect_records(read_records([path]), generator, stage)
+            output_path = os.path.join(output_dir, os.path.basename(path))
+            write_records(records, output_path, 'jsonl' if path.endswith('.jsonl') else 'json')
+            outputs.append(output_path)
+            print(f"Relabelled {path}: {len(records)} records, "
+                  f"{sum(record['pii_count'] for record in records)} PII findings")
+    finally:
+        if store is not None:
+            store.close()
+            print(f"Detection cache {detection_cache}: {store.hits} pattern results reused, {store.misses} scanned")
+    return outputs
+
+def dedup_files(paths, output_dir, threshold=0.8, num_perm=64, default_cap=0, caps=None, text_field='prompt'):
+    """Drop exact and near-duplicate prompts from generated JSON/JSONL files (see dedup.py)
+
+    The inputs are read in order as one stream, so a prompt is a duplicate of
+    any earlier prompt in any of the files. Each input is written to
+    ``output_dir`` under its own name with the kept records; JSONL files are
+    streamed record by record. ``default_cap`` and ``caps``
+    ({template_id: cap}) set how many duplicates of a template are kept.
+    Returns the output paths.
+    """
+    from dedup import Deduplicator
+    for path in paths:
+        if os.path.abspath(os.path.join(output_dir, os.path.basename(path))) == os.path.abspath(path):
+            raise ValueError(f"Refusing to overwrite the input {path}; choose another output directory")
+    deduplicator = Deduplicator(threshold, num_perm, default_cap, caps)
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = []
+    for path in paths:
+        output_path = os.path.join(output_dir, os.path.basename(path))
+        seen = deduplicator.seen
+        kept = deduplicator.filter(iter_records(path), text_field)
+        if path.endswith('.jsonl'):
+            kept_count = 0
+            with open(output_path + '.part', 'w') as f:
+                for record in kept:
+                    f.write(json.dumps(record, default=str) + '\n')
+                    kept_count += 1
+        else:
+            records = list(kept)
+            kept_count = len(records)
+            write_records(records, output_path + '.part', 'json')
+        replace_durably(output_path + '.part', output_path)
+        outputs.append(output_path)
+        print(f"Deduplicated {path}: kept {kept_count}/{deduplicator.seen - seen} prompts")
+    print(f"{deduplicator.unique} unique prompts, {deduplicator.exact_duplicates} exact and "
+          f"{deduplicator.near_duplicates} near duplicates ({deduplicator.kept_duplicates} kept under the caps)")
+    return outputs
+
+def write_report(domain, stage, paths, filename):
+    """Rebuild the domain's summary (records) or analysis (prompts) report from output files"""
+    records = read_records(paths)
+    if not records:
+        raise ValueError("No records found in the given files")
+
+    generator_class = load_generator_class(domain, stage)
+    if stage == 'records':
+        generator_class(seed=0).generate_summary_report(records, filename)
+    else:
+        generator_class(seed=0).generate_analysis_report(records, filename)
+    return filename
@@ -0,0 +1,203 @@
+"""Dry-run planning for record runs
+
+A short calibration generates a sample of records in this process and
+measures, per record: generation time (split into rendering and PII
+detection), findings, serialized bytes in each output format and peak
+Python memory while a shard is built and written. The plan extrapolates
+these to the requested run and recommends a shard size and worker count
+that fit a memory and disk budget.
+
+The model is linear in the number of records: a worker holds one shard in
+memory at a time, so its peak is its baseline plus one shard's worth of
+records; output size is records times bytes per record.
+"""
+import math
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from pipeline import DOMAINS, OUTPUT_FORMATS, derive_seed, load_generator_class, write_records
+
+# Largest shard the planner recommends; bigger shards only lengthen the time between checkpoints
+MAX_SHARD_SIZE = 50000
+# Share of the memory budget the recommendation plans to use (the model ignores allocator slack)
+MEMORY_HEADROOM = 0.8
+
+def current_rss():
+    """Resident set size of this process in bytes (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+def calibrate(domain, sample_size=200, seed=42):
+    """Measure per-record costs of a domain's records stage on ``sample_size`` records"""
+    spec = DOMAINS[domain]
+    random.seed(derive_seed(seed, 0))
+    generator = load_generator_class(domain, 'records')(seed=derive_seed(seed, 0))
+    make_record = getattr(generator, spec['record_method'])
+    make_record()  # builds Faker and the providers, so the baseline includes them
+    baseline_rss = current_rss()
+
+    start = time.perf_counter()
+    records = [make_record() for _ in range(sample_size)]
+    generation_seconds = (time.perf_counter() - start) / sample_size
+
+    start = time.perf_counter()
+    for record in records:
+        generator.find_pii_in_text(record['full_record_text'])
+    detection_seconds = (time.perf_counter() - start) / sample_size
+
+    bytes_per_record = {}
+    memory_per_record = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for output_format in OUTPUT_FORMATS:
+            path = os.path.join(temp_dir, f"sample.{output_format}")
+            write_records(records[:1], path, output_format, list_fields=spec['records_list_fields'])  # imports pandas for csv
+            tracemalloc.start()
+            batch = [make_record() for _ in range(max(1, sample_size // 4))]
+            write_records(batch, path, output_format, list_fields=spec['records_list_fields'])
+            memory_per_record[output_format] = tracemalloc.get_traced_memory()[1] / len(batch)
+            tracemalloc.stop()
+            bytes_per_record[output_format] = os.path.getsize(path) / len(batch)
+
+    return {
+        'domain': domain,
+        'sample_size': sample_size,
+        'generation_seconds': generation_seconds,
+        'detection_seconds': detection_seconds,
+        'findings_per_record': sum(len(record['pii_findings']) for record in records) / sample_size,
+        'bytes_per_record': bytes_per_record,
+        'memory_per_record': memory_per_record,
+        'worker_baseline_rss': baseline_rss,
+    }
+
+def estimate(calibration, total, workers, shard_size, output_format):
+    """Extrapolate wall time, peak RSS and output size of a run
+
+    ``workers`` is kept as requested; 'active_workers' is how many can run at
+    once (no more than the shards or the CPUs) and 'worker_cap' says why it
+    is lower, if it is.
+    """
+    shards = max(1, math.ceil(total / shard_size))
+    cpus = os.cpu_count() or 1
+    active_workers = max(1, min(workers, shards, cpus))
+    worker_cap = None
+    if active_workers < workers:
+        worker_cap = f"this machine has {cpus} CPU(s)" if cpus <= shards else f"the run has only {shards} shard(s)"
+    shard_rss = calibration['worker_baseline_rss'] + min(shard_size, total) * calibration['memory_per_record'][output_format]
+    # Shards run in waves of active_workers; the last wave may be partial
+    waves = math.ceil(shards / active_workers)
+    wall_seconds = waves * min(shard_size, total) * calibration['generation_seconds']
+    peak_rss = shard_rss * active_workers + (calibration['worker_baseline_rss'] if active_workers > 1 else 0)
+    return {
+        'total': total,
+        'shards': shards,
+        'workers': workers,
+        'active_workers': active_workers,
+        'worker_cap': worker_cap,
+        'shard_size': shard_size,
+        'output_format': output_format,
+        'wall_seconds': wall_seconds,
+        'cpu_seconds': total * calibration['generation_seconds'],
+        'peak_rss': peak_rss,
+        'output_bytes': total * calibration['bytes_per_record'][output_format],
+        'pii_findings': total * calibration['findings_per_record'],
+    }
+
+def recommend(calibration, total, output_format, memory_budget=None, disk_budget=None, max_workers=None):
+    """Pick the worker count and shard size for the fastest run that fits the budgets
+
+    Returns (estimate, notes). More workers are preferred over bigger shards;
+    shards are kept small enough that every worker gets several of them.
+    """
+    notes = []
+    max_workers = max_workers or os.cpu_count() or 1
+    baseline = calibration['worker_baseline_rss']
+    per_record = calibration['memory_per_record'][output_format]
+    best = None
+    for workers in range(max_workers, 0, -1):
+        shard_size = min(MAX_SHARD_SIZE, max(1, math.ceil(total / (workers * 4))))
+        if memory_budget:
+            # workers * (baseline + shard * per_record) + parent baseline <= budget
+            room = memory_budget * MEMORY_HEADROOM / workers - baseline - (baseline / workers if workers > 1 else 0)
+            if room < per_record:
+                continue
+            shard_size = min(shard_size, int(room // per_record))
+        best = estimate(calibration, total, workers, shard_size, output_format)
+        break
+    if best is None:
+        notes.append(f"Memory budget is below one worker's baseline ({baseline / 2 ** 20:.0f} MiB); "
+                     f"planning for one worker with 1-record shards")
+        best = estimate(calibration, total, 1, 1, output_format)
+
+    if disk_budget and best['output_bytes'] > disk_budget:
+        fitting = [fmt for fmt in OUTPUT_FORMATS if total * calibration['bytes_per_record'][fmt] <= disk_budget]
+        if fitting:
+            notes.append(f"Output exceeds the disk budget in {output_format}; fits as {', '.join(fitting)}")
+        else:
+            notes.append(f"Output exceeds the disk budget in every format; at most "
+                         f"{int(disk_budget / min(calibration['bytes_per_record'].values()))} records fit")
+    return best, notes
+
+def plan_run(domain, total, workers=1, shard_size=10000, output_format='json', memory_budget=None,
+             disk_budget=None, sample_size=200, seed=42):
+    """Calibrate, then estimate the requested run and a recommended one; returns the report text"""
+    calibration = calibrate(domain, sample_size, seed)
+    requested = estimate(calibration, total, workers, shard_size, output_format)
+    recommended, notes = recommend(calibration, total, output_format, memory_budget, disk_budget)
+    if memory_budget and requested['peak_rss'] > memory_budget:
+        notes.insert(0, f"The requested run needs ~{format_bytes(requested['peak_rss'])}, "
+                        f"over the {format_bytes(memory_budget)} memory budget")
+    return describe_plan(calibration, requested, recommended, notes)
+
+def format_bytes(value):
+    for unit in ('B', 'KiB', 'MiB', 'GiB', 'TiB'):
+        if value < 1024 or unit == 'TiB':
+            return f"{value:.1f} {unit}"
+        value /= 1024
+
+def format_seconds(value):
+    if value < 120:
+        return f"{value:.1f}s"
+    if value < 7200:
+        return f"{value / 60:.1f}min"
+    return f"{value / 3600:.1f}h"
+
+def describe_plan(calibration, requested, recommended, notes):
+    """Human-readable plan report"""
+    lines = [
+        f"Calibration ({calibration['domain']}, {calibration['sample_size']} records):",
+        f"  generation        {calibration['generation_seconds'] * 1000:.2f} ms/record "
+        f"(of which PII detection {calibration['detection_seconds'] * 1000:.2f} ms)",
+        f"  PII findings      {calibration['findings_per_record']:.1f} per record",
+        f"  serialized size   " + ', '.join(f"{fmt} {size:.0f} B" for fmt, size in calibration['bytes_per_record'].items()),
+        f"  shard memory      " + ', '.join(f"{fmt} {format_bytes(size)}" for fmt, size in calibration['memory_per_record'].items())
+        + " per record",
+        f"  worker baseline   {format_bytes(calibration['worker_baseline_rss'])} RSS",
+        '',
+    ]
+    for title, plan in (('Requested', requested), ('Recommended', recommended)):
+        lines += [
+            f"{title}: {plan['total']} records, {plan['workers']} worker(s), shard size {plan['shard_size']} "
+            f"({plan['shards']} shards), {plan['output_format']}",
+        ]
+        if plan['worker_cap']:
+            lines.append(f"  effective workers {plan['active_workers']} ({plan['worker_cap']}; the estimates assume "
+                         f"{plan['active_workers']} run at once)")
+        lines += [
+            f"  wall time         ~{format_seconds(plan['wall_seconds'])} "
+            f"({format_seconds(plan['cpu_seconds'])} CPU)",
+            f"  peak RSS          ~{format_bytes(plan['peak_rss'])}",
+            f"  output size       ~{format_bytes(plan['output_bytes'])}",
+            f"  PII findings      ~{plan['pii_findings']:.0f}",
+            '',
+        ]
+    lines += notes
+    return '\n'.join(lines).rstrip() + '\n'
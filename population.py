@@ -0,0 +1,142 @@
+"""Shared synthetic population drawn on by all four domain generators
+
+A population is a person table (name, date of birth, SSN, address, phone,
+email) generated once and persisted in a compact indexed file. The record
+generators draw identities from it by index, so person ``i`` can appear as a
+patient, a bank customer, a legal client and a parent across the domains.
+
+File layout (all integers little-endian):
+    magic      b'PIIPOP1\\n'
+    uint32     header length
+    header     JSON: {"fields": [...], "size": n, "seed": s}
+    uint64[n+1] row offsets into the data block
+    data       UTF-8 rows, fields separated by '\\x1f'
+"""
+import json
+import mmap
+import struct
+import sys
+from array import array
+from datetime import date
+
+from faker import Faker
+
+from fast_providers import FastContactProvider, name_based_email
+from identifiers import IdAllocator
+
+POPULATION_FIELDS = ['first_name', 'last_name', 'date_of_birth', 'ssn', 'address', 'phone', 'email']
+
+POPULATION_MAGIC = b'PIIPOP1\n'
+FIELD_SEPARATOR = '\x1f'
+
+# Personal email domains shared by the people in the population
+PERSONAL_EMAIL_DOMAINS = ['gmail.com', 'outlook.com', 'yahoo.com', 'hotmail.com', 'icloud.com', 'aol.com']
+
+POPULATION_FAKER_PROVIDERS = [
+    'faker.providers.person',
+    'faker.providers.address',
+    'faker.providers.phone_number',
+    'faker.providers.date_time',
+]
+
+class PopulationStore:
+    """Person table with O(1) lookup by index"""
+
+    def __init__(self, offsets, data, seed=None, source=None):
+        self._offsets = offsets
+        self._data = data
+        self._source = source
+        self.seed = seed
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    @classmethod
+    def generate(cls, size, seed=42, min_age=18, max_age=90):
+        """Generate a population of ``size`` adults with unique SSNs"""
+        fake = Faker(providers=POPULATION_FAKER_PROVIDERS)
+        fake.add_provider(FastContactProvider)
+        fake.seed_instance(seed)
+        ids = IdAllocator(seed)
+
+        offsets = array('Q', [0])
+        data = bytearray()
+        for _ in range(size):
+            first_name = fake.first_name()
+            last_name = fake.last_name()
+            row = FIELD_SEPARATOR.join([
+                first_name,
+                last_name,
+                fake.date_of_birth(minimum_age=min_age, maximum_age=max_age).isoformat(),
+                ids.next('ssn'),
+                fake.address().replace('\n', ', '),
+                fake.phone_number(),
+                name_based_email(fake.random, first_name, last_name, fake.random_element(PERSONAL_EMAIL_DOMAINS)),
+            ])
+            data += row.encode('utf-8')
+            offsets.append(len(data))
+        return cls(offsets, bytes(data), seed=seed)
+
+    def save(self, path):
+        """Persist the population to ``path``"""
+        header = json.dumps({'fields': POPULATION_FIELDS, 'size': len(self), 'seed': self.seed}).encode('utf-8')
+        offsets = array('Q', self._offsets)
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+        with open(path, 'wb') as f:
+            f.write(POPULATION_MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            f.write(offsets.tobytes())
+            f.write(self._data)
+        return path
+
+    @classmethod
+    def open(cls, path):
+        """Memory-map a saved population; rows are decoded only when accessed"""
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapped[:len(POPULATION_MAGIC)] != POPULATION_MAGIC:
+            raise ValueError(f"{path} is not a population file")
+
+        position = len(POPULATION_MAGIC)
+        (header_length,) = struct.unpack_from('<I', mapped, position)
+        position += 4
+        header = json.loads(mapped[position:position + header_length])
+        if header['fields'] != POPULATION_FIELDS:
+            raise ValueError(f"{path} has unexpected fields: {header['fields']}")
+        position += header_length
+
+        offsets_end = position + 8 * (header['size'] + 1)
+        offsets = array('Q', mapped[position:offsets_end])
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+        data = memoryview(mapped)[offsets_end:]
+        return cls(offsets, data, seed=header['seed'], source=path)
+
+    def person(self, index):
+        """Return person ``index`` as a dict (date_of_birth as a date)"""
+        values = bytes(self._data[self._offsets[index]:self._offsets[index + 1]]).decode('utf-8').split(FIELD_SEPARATOR)
+        person = dict(zip(POPULATION_FIELDS, values))
+        person['person_index'] = index
+        person['date_of_birth'] = date.fromisoformat(person['date_of_birth'])
+        return person
+
+    def iter_from(self, start=0):
+        """Iterator over people ``start``, ``start + 1``, ... to the end of the table
+
+        People are never reused: drawing past the last person raises
+        ValueError instead of wrapping around to person 0.
+        """
+        for index in range(start, len(self)):
+            yield self.person(index)
+        raise ValueError(f"The population has only {len(self)} people; every person has been used")
+
+# Populations opened in this process, keyed by path (shared by worker shards)
+_opened_populations = {}
+
+def open_population(path):
+    """Open a population file once per process"""
+    if path not in _opened_populations:
+        _opened_populations[path] = PopulationStore.open(path)
+    return _opened_populations[path]
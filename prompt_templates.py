@@ -0,0 +1,95 @@
+"""Prompt templates parsed once and filled with only the fields they reference
+
+The legal and education prompt generators used to build every fake value a
+template might need (25-40 names, addresses, dates, ...) for each prompt and
+then fill a template that references two or three of them. A PromptTemplate
+lists its fields once, with string.Formatter().parse (domain_engine.
+parse_template), and binds each to a zero-argument provider, so filling it
+generates exactly the referenced values. Templates referencing a field that
+has no provider are rejected when the generator is built, not per prompt.
+
+The finance and medical prompt generators fill templates from source
+entities instead. Given the PII type of each field, ``render`` builds the
+prompt piece by piece and records where every substituted slot landed, so
+the prompt's ``pii_findings`` come from its construction rather than from
+scanning the text. Suffixed fields (``{ssn_2}``) take the type of their base
+field.
+"""
+from domain_engine import parse_template
+
+# Substituted values that stand for a missing field, not for PII
+EMPTY_VALUES = {'', 'None', 'Not Available'}
+
+def slot_type(field, field_types):
+    """PII type of a template field, looking through a ``_<n>`` entity suffix"""
+    if field in field_types:
+        return field_types[field]
+    base, _, number = field.rpartition('_')
+    return field_types.get(base) if number.isdigit() else None
+
+class PromptTemplate:
+    """A str.format prompt template, optionally bound to the providers of the fields it references"""
+
+    def __init__(self, template, providers=None, field_types=None, template_id=None):
+        self.template = template
+        # Stable name of the template within its generator, carried by the prompts built from it
+        self.template_id = template_id
+        self.pieces = parse_template(template)
+        # A field used twice gets one value; values are generated in order of first use
+        self.fields = list(dict.fromkeys(field for _, field, _ in self.pieces if field is not None))
+        if providers is not None:
+            missing = [field for field in self.fields if field not in providers]
+            if missing:
+                raise ValueError(f"Prompt template {template!r} references fields without a provider: "
+                                 f"{', '.join(missing)}")
+            self.field_providers = [(field, providers[field]) for field in self.fields]
+        field_types = field_types or {}
+        self.slots = [(literal, field, format_spec, field is not None and slot_type(field, field_types))
+                      for literal, field, format_spec in self.pieces]
+
+    @property
+    def pii_types(self):
+        """PII types of the template's slots, in order of first use"""
+        return list(dict.fromkeys(pii_type for _, _, _, pii_type in self.slots if pii_type))
+
+    def values(self):
+        """A fresh value for every referenced field"""
+        return {field: provider() for field, provider in self.field_providers}
+
+    def fill(self):
+        """Render the template with freshly generated values"""
+        return self.template.format_map(self.values())
+
+    def render(self, values):
+        """(text, pii_findings) of the template filled from ``values``
+
+        Raises KeyError like ``format_map`` when a field has no value.
+        """
+        parts = []
+        findings = []
+        offset = 0
+        for literal, field, format_spec, pii_type in self.slots:
+            parts.append(literal)
+            offset += len(literal)
+            if field is None:
+                continue
+            value = format(values[field], format_spec)
+            if pii_type and value not in EMPTY_VALUES:
+                findings.append({
+                    'pii_type': pii_type,
+                    'value': value,
+                    'start_index': offset,
+                    'end_index': offset + len(value),
+                    'length': len(value)
+                })
+            parts.append(value)
+            offset += len(value)
+        return ''.join(parts), findings
+
+def compile_templates(templates, providers=None, field_types=None, id_prefix=None):
+    """PromptTemplates for ``templates``, checked against ``providers`` ({field: callable}) when given
+
+    With ``id_prefix`` the templates are named ``<id_prefix>-1``, ``<id_prefix>-2``, ... in list order.
+    """
+    return [PromptTemplate(template, providers, field_types, f"{id_prefix}-{index}" if id_prefix else None)
+            for index, template in enumerate(templates, 1)]
@@ -0,0 +1,182 @@
+"""Source rows and batched row sampling for the CSV-driven prompt generators
+
+The finance and medical prompt generators fill their templates from rows of
+a records CSV. Instead of asking pandas for a random row per prompt, the rows
+are converted once to a list of plain dicts (``SourceRows``), cleaned once
+into template-ready entities (``EntityTable``) and the row positions are
+drawn in batches from a seeded ``random.Random`` (``RowSampler``), so a
+prompt costs one list index and one ``format_map``. The rows may also be
+records straight from a records generator (a list or any iterable of
+dicts), without a CSV in between.
+
+Two sampling modes are supported:
+
+- ``'random'``: positions are drawn independently (with replacement), as
+  ``DataFrame.sample`` did.
+- ``'permutation'``: positions follow successive seeded permutations of the
+  rows, so every row is used once before any row is used again. Permutation
+  p is seeded from (seed, p), so a chunk of a parallel run can start reading
+  the run's stream at its own draw offset (``restart``), and two consecutive
+  positions always differ, so a two-row prompt never has to skip one.
+"""
+import random
+from collections.abc import Mapping
+
+ROW_SAMPLING_MODES = ['random', 'permutation']
+
+# Positions drawn per batch in 'random' mode
+BATCH_SIZE = 4096
+
+class SourceRows:
+    """Rows of a records table as plain dicts, read by position"""
+
+    def __init__(self, df):
+        self.rows = df.to_dict('records')
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, position):
+        return self.rows[position]
+
+def source_value(value, missing='Not Available'):
+    """A source field as a template value
+
+    CSV rows and in-memory records spell the same field differently: lists
+    are joined as the CSV writer joins list fields, and None, NaN (an empty
+    CSV cell) and empty lists become ``missing``.
+    """
+    if isinstance(value, (list, tuple)):
+        value = ', '.join(str(item) for item in value) if value else None
+    # NaN is the only value not equal to itself
+    if value is None or value != value:
+        return missing
+    return value
+
+class EntityTable:
+    """Template-ready entities of a source table, cleaned once by ``extract(row)``
+
+    ``rows`` is any iterable of row dicts (SourceRows, a list of records, a
+    generator of records); it is read once and not kept.
+    """
+
+    def __init__(self, rows, extract):
+        self.entities = [extract(row) for row in rows]
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __getitem__(self, position):
+        return self.entities[position]
+
+    def suffixed(self, positions):
+        """View of the entities at ``positions`` under the keys ``<field>_1``, ``<field>_2``, ..."""
+        return SuffixedView([self.entities[position] for position in positions])
+
+class SuffixedView(Mapping):
+    """Read-only mapping of ``<field>_<n>`` to field ``<field>`` of the n-th entity (1-based)
+
+    Multi-entity templates are filled with ``template.format_map(view)``;
+    nothing is copied, a key is resolved when the template asks for it.
+    """
+
+    def __init__(self, entities):
+        self.entities = entities
+
+    def __getitem__(self, key):
+        field, _, number = key.rpartition('_')
+        if number.isdigit() and 1 <= int(number) <= len(self.entities):
+            entity = self.entities[int(number) - 1]
+            if field in entity:
+                return entity[field]
+        raise KeyError(key)
+
+    def __iter__(self):
+        for number, entity in enumerate(self.entities, 1):
+            for field in entity:
+                yield f"{field}_{number}"
+
+    def __len__(self):
+        return sum(len(entity) for entity in self.entities)
+
+class RowSampler:
+    """Seeded stream of row positions in range(num_rows), drawn a batch at a time"""
+
+    def __init__(self, num_rows, seed, mode='random', batch_size=BATCH_SIZE):
+        if mode not in ROW_SAMPLING_MODES:
+            raise ValueError(f"Unknown row sampling mode '{mode}'; choose from {', '.join(ROW_SAMPLING_MODES)}")
+        if num_rows < 1:
+            raise ValueError("The source table has no rows to sample")
+        self.num_rows = num_rows
+        self.mode = mode
+        self.batch_size = batch_size
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.batch = []
+        self.position = 0
+        # Index of the current permutation ('permutation' mode)
+        self.permutation = -1
+
+    def permutation_rows(self, index):
+        """Permutation ``index`` of the run's row stream
+
+        Its first row is moved back one place when the previous permutation
+        ended on it. With two rows or less the rows are not shuffled at all.
+        """
+        rows = list(range(self.num_rows))
+        if self.num_rows <= 2:
+            return rows
+        random.Random(f"{self.seed}:{index}").shuffle(rows)
+        if index > 0:
+            # The swap below only touches the first two places, so the last row is the shuffled one
+            previous = list(range(self.num_rows))
+            random.Random(f"{self.seed}:{index - 1}").shuffle(previous)
+            if rows[0] == previous[-1]:
+                rows[0], rows[1] = rows[1], rows[0]
+        return rows
+
+    def refill(self):
+        """Draw the next batch: the next permutation of the rows, or batch_size independent positions"""
+        if self.mode == 'permutation':
+            self.permutation += 1
+            self.batch = self.permutation_rows(self.permutation)
+        else:
+            self.batch = self.rng.choices(range(self.num_rows), k=self.batch_size)
+        self.position = 0
+
+    def restart(self, seed, offset=0):
+        """Restart for one chunk of a run
+
+        In 'random' mode the positions are drawn afresh from ``seed``; in
+        'permutation' mode the run's stream is read on from draw ``offset``,
+        so the chunks of a run together use every row once before any repeats.
+        """
+        if self.mode == 'permutation':
+            self.permutation, self.position = divmod(offset, self.num_rows)
+            self.batch = self.permutation_rows(self.permutation)
+        else:
+            self.rng = random.Random(seed)
+            self.batch = []
+            self.position = 0
+
+    def next(self):
+        """Next row position"""
+        if self.position == len(self.batch):
+            self.refill()
+        position = self.batch[self.position]
+        self.position += 1
+        return position
+
+    def distinct(self, count):
+        """Next ``count`` pairwise distinct row positions (all rows when the table is smaller)
+
+        In 'permutation' mode consecutive positions differ, so up to two
+        positions take exactly one draw each.
+        """
+        count = min(count, self.num_rows)
+        positions = []
+        while len(positions) < count:
+            position = self.next()
+            if position not in positions:
+                positions.append(position)
+        return positions
@@ -0,0 +1,145 @@
+"""Read-only lookup tables shared by worker processes through a memory-mapped file
+
+The parent process packs the providers' mapping tables (department to
+medications, income bracket to account types, practice area to case types,
+grade level to courses, ...) and the alias tables of the weighted pools
+(first and last names, address kinds, the field distributions) into one
+file. Each worker maps that file when it attaches:
+
+- the strings are decoded once, so a table lookup is a dict lookup;
+- the alias tables' weights, probabilities and aliases are read in place
+  through memoryviews, so those arrays occupy a single copy of page cache
+  however many workers attach.
+
+Providers fall back to building their own tables when nothing is attached
+(single-process runs).
+
+File layout (all integers little-endian, arrays 8-byte aligned):
+    magic      b'PIITAB2\\n'
+    uint32     header length
+    header     JSON, space-padded: {'tables': {table: {key: [first_string, string_count]}},
+                                    'alias': {name: [first_string, size, array_offset]}}
+    uint32     number of strings n
+    uint64[n+1] string offsets into the data block
+    arrays     per alias table: float64[size] weights, float64[size]
+               probabilities, uint32[size] aliases (padded to 8 bytes)
+    data       UTF-8 strings
+"""
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from distributions import AliasTable
+
+TABLES_MAGIC = b'PIITAB2\n'
+
+def write_shared_tables(tables, path, alias_tables=None):
+    """Pack ``{table: {key: [str, ...]}}`` and ``{name: AliasTable}`` into a shared tables file"""
+    strings = []
+    header = {'tables': {}, 'alias': {}}
+    for table_name, table in tables.items():
+        header['tables'][table_name] = {}
+        for key, values in table.items():
+            header['tables'][table_name][key] = [len(strings), len(values)]
+            strings.extend(values)
+
+    arrays = bytearray()
+    for name, table in (alias_tables or {}).items():
+        size = len(table.values)
+        header['alias'][name] = [len(strings), size, len(arrays)]
+        strings.extend(table.values)
+        aliases = array('I', table.aliases)
+        numbers = [array('d', table.weights), array('d', table.probabilities), aliases]
+        for block in numbers:
+            if sys.byteorder != 'little':
+                block.byteswap()
+            arrays += block.tobytes()
+        arrays += bytes(-len(arrays) % 8)
+
+    offsets = array('Q', [0])
+    data = bytearray()
+    for value in strings:
+        data += value.encode('utf-8')
+        offsets.append(len(data))
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    # Pad the header so the offsets and arrays start 8-byte aligned
+    header_bytes += b' ' * (-(len(TABLES_MAGIC) + 4 + len(header_bytes) + 4) % 8)
+    with open(path, 'wb') as f:
+        f.write(TABLES_MAGIC)
+        f.write(struct.pack('<I', len(header_bytes)))
+        f.write(header_bytes)
+        f.write(struct.pack('<I', len(strings)))
+        f.write(offsets.tobytes())
+        f.write(arrays)
+        f.write(data)
+    return path
+
+class SharedTables:
+    """Memory-mapped shared tables file, decoded once when opened"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mapped[:len(TABLES_MAGIC)] != TABLES_MAGIC:
+            raise ValueError(f"{path} is not a shared tables file")
+
+        position = len(TABLES_MAGIC)
+        (header_length,) = struct.unpack_from('<I', self._mapped, position)
+        position += 4
+        header = json.loads(self._mapped[position:position + header_length])
+        position += header_length
+        (string_count,) = struct.unpack_from('<I', self._mapped, position)
+        position += 4
+
+        offsets_end = position + 8 * (string_count + 1)
+        offsets = self._numbers(position, 'Q', string_count + 1)
+        arrays_start = offsets_end
+        data_start = arrays_start + sum(8 * size * 2 + 4 * size + (-4 * size % 8)
+                                        for _, size, _ in header['alias'].values())
+        data = self._mapped[data_start:]
+        strings = [data[offsets[index]:offsets[index + 1]].decode('utf-8') for index in range(string_count)]
+
+        self.tables = {name: {key: strings[first:first + count] for key, (first, count) in table.items()}
+                       for name, table in header['tables'].items()}
+        self.alias_tables = {}
+        for name, (first, size, offset) in header['alias'].items():
+            start = arrays_start + offset
+            self.alias_tables[name] = AliasTable.from_arrays(
+                strings[first:first + size],
+                self._numbers(start, 'd', size),
+                self._numbers(start + 8 * size, 'd', size),
+                self._numbers(start + 16 * size, 'I', size))
+
+    def _numbers(self, start, typecode, count):
+        """``count`` numbers at ``start``: a view of the mapping, or a copy on big-endian machines"""
+        end = start + array(typecode).itemsize * count
+        if sys.byteorder == 'little':
+            return memoryview(self._mapped)[start:end].cast(typecode)
+        numbers = array(typecode, self._mapped[start:end])
+        numbers.byteswap()
+        return numbers
+
+# Tables attached in this process (set by the worker pool initializer)
+_attached_tables = None
+
+def attach_shared_tables(path):
+    """Pool initializer: map and decode the shared tables file for this worker's providers"""
+    global _attached_tables
+    _attached_tables = SharedTables(path)
+
+def shared_table(name):
+    """The attached table ``name`` ({key: [str, ...]}), or None when no shared tables are attached"""
+    if _attached_tables is None:
+        return None
+    return _attached_tables.tables.get(name)
+
+def shared_alias_table(name):
+    """The attached AliasTable ``name``, or None when no shared tables are attached"""
+    if _attached_tables is None:
+        return None
+    return _attached_tables.alias_tables.get(name)
@@ -0,0 +1,27 @@
+import piigen
+
+def test_records_with_an_invalid_constraint_prints_an_error(tmp_path, capsys):
+    code = piigen.main(['records', 'medical', '--count', '5', '--output-dir', str(tmp_path),
+                        '--where', 'department=Astrology'])
+    assert code == 2
+    assert capsys.readouterr().out.startswith('Error: ')
+
+def test_coordinator_with_an_invalid_constraint_prints_an_error(tmp_path, capsys):
+    code = piigen.main(['coordinator', 'medical', '--queue', str(tmp_path / 'queue'), '--count', '5',
+                        '--output-dir', str(tmp_path / 'out'), '--where', 'no_such_field=1', '--no-wait'])
+    assert code == 2
+    assert capsys.readouterr().out.startswith('Error: ')
+    assert not (tmp_path / 'queue').exists()
+
+def test_resuming_with_other_parameters_prints_an_error(tmp_path, capsys):
+    assert piigen.main(['records', 'hr', '--count', '4', '--format', 'jsonl', '--output-dir', str(tmp_path)]) == 0
+    capsys.readouterr()
+    code = piigen.main(['records', 'hr', '--count', '6', '--format', 'jsonl', '--output-dir', str(tmp_path)])
+    assert code == 2
+    assert 'different parameters' in capsys.readouterr().out
+
+def test_more_records_than_identifiers_prints_an_error(tmp_path, capsys):
+    code = piigen.main(['records', 'legal', '--count', '45001', '--output-dir', str(tmp_path)])
+    assert code == 2
+    output = capsys.readouterr().out
+    assert output.startswith('Error: ') and 'unique records' in output
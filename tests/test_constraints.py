@@ -0,0 +1,18 @@
+import pytest
+
+from pipeline import load_generator_class
+
+@pytest.mark.parametrize('domain, constraints', [
+    ('medical', {'blood_type': ['O+', 'A-']}),
+    ('finance', {'account_types': ['Savings']}),
+    ('legal', {'case_types': ['Divorce']}),
+    ('education', {'courses': ['Algebra I']}),
+])
+def test_constraints_are_compiled_once_per_generator(domain, constraints, monkeypatch):
+    generator = load_generator_class(domain, 'records')(seed=5)
+    calls = []
+    compile_constraints = generator.compile_constraints
+    monkeypatch.setattr(generator, 'compile_constraints',
+                        lambda constraints: calls.append(constraints) or compile_constraints(constraints))
+    generator.generate_dataset(num_records=20, constraints=constraints)
+    assert calls == [constraints]
@@ -0,0 +1,36 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import json
+from pipeline import generate_record_shard
+records = generate_record_shard('medical', 11, 0, 30, locales={'it_IT': 1.0})
+print(json.dumps(records, sort_keys=True, default=str))
+"""
+
+def run_with_hash_seed(hash_seed):
+    env = dict(os.environ, PYTHONHASHSEED=str(hash_seed))
+    result = subprocess.run([sys.executable, '-c', SCRIPT], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_it_IT_records_do_not_depend_on_the_hash_seed():
+    first = run_with_hash_seed(1)
+    assert first == run_with_hash_seed(2)
+    assert len({record['hospital_name'] for record in first}) > 1
+
+def test_nl_NL_account_numbers_are_not_found_as_BSNs():
+    from locales import bsn_is_valid
+    from pipeline import generate_record_shard
+
+    records = generate_record_shard('finance', 7, 0, 60, locales={'nl_NL': 1.0})
+    account_numbers = {record['account_number'] for record in records if not bsn_is_valid(record['account_number'])}
+    assert account_numbers
+    for record in records:
+        bsns = [finding['value'] for finding in record['pii_findings'] if finding['pii_type'] == 'BSN']
+        assert record['ssn'] in bsns
+        assert not account_numbers & set(bsns)
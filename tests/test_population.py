@@ -0,0 +1,18 @@
+import pytest
+
+from pipeline import build_population, generate_records
+from population import PopulationStore
+
+def test_records_beyond_the_population_are_rejected(tmp_path):
+    path = build_population(50, seed=3, path=str(tmp_path / 'people.pop'))
+    with pytest.raises(ValueError, match='50 people'):
+        generate_records('finance', 120, seed=3, output_format='jsonl', output_dir=str(tmp_path / 'out'),
+                         population_path=path)
+    assert not (tmp_path / 'out').exists()
+
+def test_iter_from_does_not_reuse_people(tmp_path):
+    population = PopulationStore.open(build_population(5, seed=3, path=str(tmp_path / 'people.pop')))
+    people = population.iter_from(3)
+    assert [next(people)['person_index'] for _ in range(2)] == [3, 4]
+    with pytest.raises(ValueError):
+        next(people)
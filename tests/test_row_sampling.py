@@ -0,0 +1,25 @@
+from pipeline import generate_prompts, read_records, stream_records
+from row_sampling import RowSampler
+
+def test_restart_continues_the_run_permutation():
+    whole = RowSampler(10, seed=3, mode='permutation')
+    draws = [whole.next() for _ in range(35)]
+    chunk = RowSampler(10, seed=3, mode='permutation')
+    chunk.restart(seed=99, offset=17)
+    assert [chunk.next() for _ in range(18)] == draws[17:]
+
+def test_consecutive_positions_differ_across_permutations():
+    sampler = RowSampler(5, seed=1, mode='permutation')
+    draws = [sampler.next() for _ in range(500)]
+    assert all(a != b for a, b in zip(draws, draws[1:]))
+
+def test_chunked_permutation_prompts_use_every_row_before_repeating(tmp_path):
+    num_rows = 200
+    paths = generate_prompts('finance', 1000, seed=5, source=stream_records('finance', num_rows, seed=5),
+                             output_format='jsonl', output_dir=str(tmp_path), row_sampling='permutation',
+                             chunk_size=50)
+    records = sorted(read_records(paths), key=lambda record: record['final_index'])
+    draws = [customer_id for record in records for customer_id in record['source_customer_id']]
+    assert len(draws) > 2 * num_rows
+    for start in range(0, len(draws) - num_rows + 1, num_rows):
+        assert len(set(draws[start:start + num_rows])) == num_rows
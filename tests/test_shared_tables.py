@@ -0,0 +1,26 @@
+import random
+
+from distributions import alias_tables
+from fast_providers import CompiledTables
+from pipeline import generate_records, publish_shared_tables, read_records
+from shared_tables import SharedTables
+
+def test_published_tables_match_the_built_ones(tmp_path):
+    shared = SharedTables(publish_shared_tables('finance', str(tmp_path / 'finance.tables')))
+    assert shared.tables['income_account_mapping']['$150k+']
+    built = {**alias_tables(), **CompiledTables().alias_tables()}
+    assert set(shared.alias_tables) == set(built)
+    for name, table in built.items():
+        mapped = shared.alias_tables[name]
+        assert mapped.values == table.values
+        assert list(mapped.probabilities) == table.probabilities
+        assert list(mapped.aliases) == table.aliases
+        first, second = random.Random(7), random.Random(7)
+        assert [mapped.sample(first) for _ in range(200)] == [table.sample(second) for _ in range(200)]
+
+def test_workers_reading_shared_tables_match_a_serial_run(tmp_path):
+    serial = generate_records('medical', 40, seed=4, shard_size=10, output_format='jsonl',
+                              output_dir=str(tmp_path / 'serial'))
+    parallel = generate_records('medical', 40, seed=4, shard_size=10, workers=2, output_format='jsonl',
+                                output_dir=str(tmp_path / 'parallel'))
+    assert read_records(serial) == read_records(parallel)
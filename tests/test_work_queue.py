@@ -0,0 +1,41 @@
+import os
+import time
+
+from pipeline import read_records, run_record_shard, worker_temp_path
+from work_queue import ClaimHeartbeat, claim_task, complete_task, requeue_stale, run_worker, submit_job
+
+def test_temp_path_is_unique_to_the_worker(tmp_path):
+    path = str(tmp_path / 'shard.jsonl')
+    temp_path = worker_temp_path(path)
+    assert temp_path != path + '.part'
+    assert str(os.getpid()) in temp_path
+
+def test_heartbeat_keeps_a_slow_claim_from_going_stale(tmp_path):
+    queue = str(tmp_path / 'queue')
+    submit_job(queue, 'hr', 4, shard_size=2, output_format='jsonl', output_dir=str(tmp_path / 'out'))
+    task = claim_task(queue)
+    claimed_path = os.path.join(queue, 'claimed', f"{task[2]:05d}.json")
+    os.utime(claimed_path, (time.time() - 100, time.time() - 100))
+    with ClaimHeartbeat(claimed_path, interval=0.05):
+        time.sleep(0.3)
+        assert requeue_stale(queue, stale_after=10) == 0
+    os.utime(claimed_path, (time.time() - 100, time.time() - 100))
+    assert requeue_stale(queue, stale_after=10) == 1
+
+def test_a_shard_written_twice_is_complete(tmp_path):
+    queue = str(tmp_path / 'queue')
+    submit_job(queue, 'hr', 4, shard_size=2, output_format='jsonl', output_dir=str(tmp_path / 'out'))
+    task = claim_task(queue)
+    cwd = os.getcwd()
+    try:
+        # A second worker takes over the requeued claim and finishes the job
+        os.rename(os.path.join(queue, 'claimed', f"{task[2]:05d}.json"),
+                  os.path.join(queue, 'pending', f"{task[2]:05d}.json"))
+        assert run_worker(queue, poll_interval=0.01) == 2
+    finally:
+        os.chdir(cwd)
+    # The stalled first worker comes back and writes its copy over the finished shard
+    shard_index, path, stats = run_record_shard(task)
+    complete_task(queue, shard_index, stats, 'stalled')
+    assert len(read_records([path])) == 2
+    assert not [name for name in os.listdir(os.path.dirname(path)) if name.endswith('.part')]
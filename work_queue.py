@@ -0,0 +1,208 @@
+"""File-system work queue for spreading one record run across machines
+
+Every node mounts the same directory. The coordinator splits the run into
+shard tasks (the same tasks generate_records would run locally); workers on
+any node claim them, write the shard files and report per-shard statistics.
+When all shards are done the coordinator writes the run's checkpoint file,
+so the output directory ends up identical to a single-machine run.
+
+Queue directory layout:
+    job.json            run parameters, written once by the coordinator
+    pending/NNNNN.json  shard tasks waiting for a worker
+    claimed/NNNNN.json  shard tasks being generated
+    done/NNNNN.json     statistics of finished shards
+
+A worker claims a task by renaming it from pending/ to claimed/. Rename is
+atomic, so exactly one worker gets each task. While it generates the shard,
+the worker touches the claim every HEARTBEAT_INTERVAL seconds; claims not
+touched for ``stale_after`` seconds (their worker died or hangs) are moved
+back to pending/. If the original worker was only stalled, the shard is
+generated twice. That is harmless:
+- both copies are identical, because a shard depends only on
+  (seed, shard index);
+- each worker writes its own temporary file (pipeline.worker_temp_path)
+  and moves it over the shard path atomically.
+"""
+import json
+import os
+import socket
+import threading
+import time
+
+from pipeline import checkpoint_data, plan_record_run, run_record_shard, write_json_atomic
+
+# Seconds between touches of a claim by the worker generating it; stale_after must be well above it
+HEARTBEAT_INTERVAL = 30.0
+
+class ClaimHeartbeat:
+    """Context manager touching a claim file every ``interval`` seconds from a background thread"""
+
+    def __init__(self, claimed_path, interval=HEARTBEAT_INTERVAL):
+        self.claimed_path = claimed_path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.beat, daemon=True)
+
+    def beat(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                os.utime(self.claimed_path)
+            except FileNotFoundError:
+                pass  # requeued or completed elsewhere; the shard is still written safely
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+def task_name(shard_index):
+    return f"{shard_index:05d}.json"
+
+def queue_paths(queue_dir):
+    """(pending, claimed, done) directories of a queue"""
+    return tuple(os.path.join(queue_dir, name) for name in ('pending', 'claimed', 'done'))
+
+def load_job(queue_dir):
+    with open(os.path.join(queue_dir, 'job.json')) as f:
+        return json.load(f)
+
+def submit_job(queue_dir, domain, total, seed=42, shard_size=10000, output_format='json', output_dir='.',
+               prefix=None, population_path=None, constraints=None, noise=None, locales=None):
+    """Create (or resume) a queued record run and enqueue the shards not yet done
+
+    Relative paths are resolved against the coordinator's working directory,
+    which every worker switches to. Returns the job.
+    """
+    run, tasks, progress_path = plan_record_run(domain, total, seed, shard_size, output_format, output_dir, prefix,
+                                                population_path, constraints, noise, locales)
+    job = {'run': run, 'shards': len(tasks), 'base_dir': os.getcwd(), 'output_dir': output_dir,
+           'checkpoint': progress_path}
+    pending_dir, claimed_dir, done_dir = queue_paths(queue_dir)
+    for directory in (pending_dir, claimed_dir, done_dir):
+        os.makedirs(directory, exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
+
+    job_path = os.path.join(queue_dir, 'job.json')
+    if os.path.exists(job_path):
+        existing = load_job(queue_dir)
+        if existing['run'] != run or existing['base_dir'] != job['base_dir']:
+            raise ValueError(f"{queue_dir} holds a different job ({existing['run']}); use another queue directory")
+    else:
+        write_json_atomic(job, job_path)
+
+    queued = set()
+    for directory in (pending_dir, claimed_dir, done_dir):
+        queued.update(os.listdir(directory))
+    for task in tasks:
+        name = task_name(task[2])
+        if name not in queued:
+            write_json_atomic(list(task), os.path.join(pending_dir, name))
+    return job
+
+def claim_task(queue_dir):
+    """Claim one pending task, or return None when none is left"""
+    pending_dir, claimed_dir, done_dir = queue_paths(queue_dir)
+    for name in sorted(os.listdir(pending_dir)):
+        if not name.endswith('.json'):
+            continue
+        claimed_path = os.path.join(claimed_dir, name)
+        try:
+            os.rename(os.path.join(pending_dir, name), claimed_path)
+            if os.path.exists(os.path.join(done_dir, name)):
+                os.remove(claimed_path)  # a requeued shard whose first worker finished after all
+                continue
+            os.utime(claimed_path)  # the claim time, used to detect stale claims
+            with open(claimed_path) as f:
+                return tuple(json.load(f))
+        except FileNotFoundError:
+            continue  # another worker claimed it first
+    return None
+
+def complete_task(queue_dir, shard_index, stats, worker_id):
+    """Record a finished shard and release its claim"""
+    _, claimed_dir, done_dir = queue_paths(queue_dir)
+    write_json_atomic({'stats': stats, 'worker': worker_id}, os.path.join(done_dir, task_name(shard_index)))
+    try:
+        os.remove(os.path.join(claimed_dir, task_name(shard_index)))
+    except FileNotFoundError:
+        pass  # the claim went stale and was requeued; the shard is done regardless
+
+def requeue_stale(queue_dir, stale_after):
+    """Move tasks claimed more than ``stale_after`` seconds ago back to pending/"""
+    pending_dir, claimed_dir, done_dir = queue_paths(queue_dir)
+    done = set(os.listdir(done_dir))
+    requeued = 0
+    now = time.time()
+    for name in os.listdir(claimed_dir):
+        claimed_path = os.path.join(claimed_dir, name)
+        try:
+            if name in done:
+                os.remove(claimed_path)
+            elif now - os.path.getmtime(claimed_path) > stale_after:
+                os.rename(claimed_path, os.path.join(pending_dir, name))
+                requeued += 1
+        except FileNotFoundError:
+            continue
+    return requeued
+
+def completed_shards(queue_dir):
+    """{shard_index: stats} of the finished shards"""
+    _, _, done_dir = queue_paths(queue_dir)
+    completed = {}
+    for name in os.listdir(done_dir):
+        if name.endswith('.json'):
+            with open(os.path.join(done_dir, name)) as f:
+                completed[int(name[:-5])] = json.load(f)['stats']
+    return completed
+
+def run_worker(queue_dir, worker_id=None, poll_interval=1.0, heartbeat_interval=HEARTBEAT_INTERVAL):
+    """Claim and generate shards until every shard of the job is done; returns the shards generated here"""
+    queue_dir = os.path.abspath(queue_dir)
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    job = load_job(queue_dir)
+    os.chdir(job['base_dir'])
+    generated = 0
+    while True:
+        task = claim_task(queue_dir)
+        if task is None:
+            if len(completed_shards(queue_dir)) >= job['shards']:
+                break
+            time.sleep(poll_interval)  # remaining shards are claimed elsewhere and may be requeued
+            continue
+        _, claimed_dir, _ = queue_paths(queue_dir)
+        with ClaimHeartbeat(os.path.join(claimed_dir, task_name(task[2])), heartbeat_interval):
+            shard_index, path, stats = run_record_shard(task)
+        complete_task(queue_dir, shard_index, stats, worker_id)
+        generated += 1
+        print(f"[{worker_id}] shard {shard_index + 1}/{job['shards']} written: {path} ({stats['records']} records)")
+    return generated
+
+def wait_for_job(queue_dir, stale_after=600.0, poll_interval=2.0):
+    """Coordinator loop: requeue stale claims until all shards are done, then write the checkpoint
+
+    A claim is stale when its worker has not touched it for ``stale_after``
+    seconds, so a shard may take longer than that to generate.
+
+    Returns the merged checkpoint data.
+    """
+    job = load_job(queue_dir)
+    reported = -1
+    while True:
+        completed = completed_shards(queue_dir)
+        if len(completed) >= job['shards']:
+            break
+        if len(completed) != reported:
+            print(f"{len(completed)}/{job['shards']} shards done")
+            reported = len(completed)
+        requeued = requeue_stale(queue_dir, stale_after)
+        if requeued:
+            print(f"Requeued {requeued} stale shard(s)")
+        time.sleep(poll_interval)
+
+    requeue_stale(queue_dir, stale_after)  # clears claims left by shards that were generated twice
+    data = checkpoint_data(job['run'], job['shards'], completed)
+    write_json_atomic(data, os.path.join(job['base_dir'], job['checkpoint']))
+    return data